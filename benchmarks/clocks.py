@@ -0,0 +1,106 @@
+"""Clock read overhead, and a simulated multi-week run checking drift and frame jitter.
+
+    PYTHONPATH=. python benchmarks/clocks.py [--weeks 4] [--fps 59.94]
+"""
+
+import argparse
+import fractions
+import time
+import timeit
+
+from ensemble import timers
+
+DAY = 24*60*60
+SAMPLES = 1000
+
+
+def _read(label, function, number=200000):
+    best = min(timeit.repeat(function, number=number, repeat=5)) / number
+    print("{:<36} {:>8.1f} ns".format(label, best * 1e9))
+
+def overhead():
+    monotonic = timers.MonotonicClock()
+    synchronised = timers.SynchronisedClock(timers.MonotonicClock())
+    synchronised.adjust(1500000, drift=2e-5)
+    frame = timers.FrameClock()
+    timer = timers.Timer(timers.MonotonicClock())
+    timer.start()
+    
+    print("clock read overhead")
+    _read("time.time()", time.time)
+    _read("time.perf_counter_ns()", time.perf_counter_ns)
+    _read("SystemClock.time_ns", lambda: timers.SystemClock().time_ns)
+    _read("MonotonicClock.time_ns", lambda: monotonic.time_ns)
+    _read("SynchronisedClock.time_ns", lambda: synchronised.time_ns)
+    _read("FrameClock.time_ns", lambda: frame.time_ns)
+    _read("Timer.elapsed_ns", lambda: timer.elapsed_ns)
+    _read("Timer.elapsed", lambda: timer.elapsed)
+
+
+def _window(times, exact):
+    # Worst deviation from the exact elapsed time, and the spread of frame-to-frame deltas.
+    drift = float(max(abs(t - e) for t, e in zip(times, exact)))
+    deltas = [b - a for a, b in zip(times, times[1:])]
+    return drift, max(deltas) - min(deltas)
+
+def simulate(weeks, frames_per_second):
+    # A Timer over a virtual clock that advances one frame at a time, sampled for SAMPLES frames at
+    # the start of each day. The float columns redo the same arithmetic in float seconds since the
+    # Unix epoch, which is what Timer did before it moved to integer nanoseconds.
+    rate = fractions.Fraction(frames_per_second).limit_denominator(1001)
+    origin = time.time_ns()
+    
+    clock = timers.VirtualClock()
+    clock.time_ns = origin
+    timer = timers.Timer(clock)
+    timer.start()
+    
+    synchronised = timers.SynchronisedClock(timers.VirtualClock())
+    synchronised.clock.time_ns = origin
+    synchronised.adjust(0, drift=5e-5, local=origin)
+    
+    frame = timers.FrameClock(frames_per_second)
+    
+    print()
+    print("{} weeks at {} Hz, {} frames sampled per day".format(weeks, frames_per_second, SAMPLES))
+    print("{:>4} {:>14} {:>14} {:>14} {:>14} {:>14}".format("day", "drift ns", "jitter ns", "float drift", "float jitter", "sync jitter"))
+    for day in range(0, 7*weeks + 1, 7 if weeks > 4 else 1):
+        first = int(day * DAY * rate)
+        exact = [k * timers.NANOSECONDS_PER_SECOND / rate for k in range(first, first + SAMPLES)]
+        
+        # One nanosecond past the exact time, so truncation lands on the sampled frame.
+        frame.time_ns = int(exact[0]) + 1
+        
+        elapsed = []
+        frames = []
+        synced = []
+        floats = []
+        for value in exact:
+            now = origin + int(value)
+            clock.time_ns = now
+            elapsed.append(timer.elapsed_ns)
+            frames.append(frame.time_ns)
+            frame.tick()
+            synchronised.clock.time_ns = now
+            synced.append(synchronised.time_ns - origin)
+            floats.append(((origin / 1e9 + float(value) / 1e9) - origin / 1e9) * 1e9)
+        
+        drift, jitter = _window(elapsed, exact)
+        frame_drift, frame_jitter = _window(frames, exact)
+        float_drift, float_jitter = _window(floats, exact)
+        _, sync_jitter = _window(synced, exact)
+        print("{:>4} {:>14.1f} {:>14.1f} {:>14.1f} {:>14.1f} {:>14.1f}".format(day, max(drift, frame_drift), max(jitter, frame_jitter), float_drift, float_jitter, sync_jitter))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-w", "--weeks", type=int, default=4, help="simulated weeks")
+    parser.add_argument("-f", "--fps", type=float, default=59.94, help="frame rate")
+    options = parser.parse_args(argv)
+    
+    overhead()
+    simulate(options.weeks, options.fps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Command buffer replay against issuing the same commands through the state tracker every frame.
+
+    PYTHONPATH=. python benchmarks/commands.py [--frames 20000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ensemble import commands, states, uniforms
+
+POINTS = 0
+BLEND = 0x0BE2
+
+
+class _Backend(object):
+    # Accepts every call and does nothing, so only the cost of getting there is measured.
+    def bind(self, slot, value):
+        pass
+    
+    def unbind(self, slot):
+        pass
+    
+    def clear_color(self, value):
+        pass
+    
+    def clear(self):
+        pass
+    
+    def depth_mask(self, value):
+        pass
+    
+    def enable(self, capability):
+        pass
+    
+    def disable(self, capability):
+        pass
+    
+    def blend_func(self, source, destination):
+        pass
+    
+    def set_uniform(self, uniforms, name, value):
+        uniforms[name] = value
+    
+    def draw_arrays(self, mode, first, count):
+        pass
+
+
+class _Scene(object):
+    # The quad scene's frame, followed by draws textured objects each with their own transform.
+    def __init__(self, draws, buffer=None):
+        super().__init__()
+        
+        self.uniforms = uniforms.UniformCache({})
+        self.commands = buffer
+        self.program = object()
+        self.vertex_array = object()
+        self.textures = [object() for _ in range(draws)]
+        self.transforms = [np.eye(4, dtype=np.float32) for _ in range(draws)]
+    
+    def render(self, state, t):
+        self.uniforms.reset()
+        if self.commands is not None and self.commands.valid:
+            self.commands.replay(state, iTime=t)
+            return
+        if self.commands is not None:
+            self.commands.record(state)
+        
+        state.clear_color((0.1, 0.2, 0.3, 1.0))
+        state.clear()
+        state.use_program(self.program)
+        state.bind_vertex_array(self.vertex_array)
+        state.enable(BLEND)
+        state.set_uniform(self.uniforms, "iResolution", (1920.0, 1080.0, 1.0))
+        state.set_uniform(self.uniforms, "iTime", t)
+        if self.commands is not None:
+            self.commands.mark("iTime")
+        state.depth_mask(False)
+        for texture, transform in zip(self.textures, self.transforms):
+            state.bind_texture(0, texture)
+            state.set_uniform(self.uniforms, "model", transform)
+            state.draw_arrays(POINTS, 0, 1)
+        state.depth_mask(True)
+        
+        if self.commands is not None:
+            self.commands.end(state)
+
+
+def _run(scene, frames):
+    # Microseconds per frame, and the (calls, skipped) the tracker counted for the last frame.
+    state = states.StateTracker(_Backend())
+    scene.render(state, 0.0)
+    state.reset()
+    start = time.perf_counter_ns()
+    for frame in range(frames):
+        scene.render(state, frame / 60)
+        state.reset()
+    return (time.perf_counter_ns() - start) / frames / 1e3, state.last
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--frames", type=int, default=20000, help="frames per measurement")
+    options = parser.parse_args(argv)
+    
+    print("{:>6} {:>12} {:>12} {:>8} {:>14}".format("draws", "direct us", "replay us", "speedup", "calls/skipped"))
+    for draws in (1, 4, 16, 64):
+        direct, counts = _run(_Scene(draws), options.frames // draws)
+        replay, replayed = _run(_Scene(draws, commands.CommandBuffer()), options.frames // draws)
+        assert replayed == counts
+        print("{:>6} {:>12.2f} {:>12.2f} {:>7.2f}x {:>14}".format(draws, direct, replay, direct / replay, "{}/{}".format(*counts)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Scene graph world matrix updates for 10k to 100k nodes with a small fraction changing per frame.
+
+    PYTHONPATH=. python benchmarks/graphs.py [--fraction 0.01] [--branching 8]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ensemble import graphs
+from ensemble.mathematics import matrices
+
+
+def _tree(count, branching, rng):
+    # Breadth-first tree: node i hangs below node (i - 1) // branching, so parents come first.
+    indices = np.arange(count, dtype=np.int32)
+    parents = np.where(indices > 0, (indices - 1) // branching, -1).astype(np.int32)
+    graph = graphs.SceneGraph(capacity=count, n=3, dtype=np.float32)
+    graph.extend(parents, matrices.translate_batch(rng.normal(size=(count, 3)), n=3, dtype=np.float32))
+    graph.update()
+    return graph
+
+def _frames(graph, changed, frames, rng):
+    # Milliseconds per frame and nodes recomputed per frame, for a fresh random set of changes each frame.
+    count = len(graph)
+    updated = 0
+    elapsed = 0
+    for _ in range(frames):
+        indices = rng.choice(count, changed, replace=False)
+        graph.locals[indices, -1, :3] = rng.normal(size=(changed, 3))
+        start = time.perf_counter_ns()
+        graph.mark(indices)
+        updated += graph.update()
+        elapsed += time.perf_counter_ns() - start
+    return elapsed / frames / 1e6, updated / frames
+
+def _full(graph, frames):
+    count = len(graph)
+    start = time.perf_counter_ns()
+    for _ in range(frames):
+        graph.mark(np.arange(count))
+        graph.update()
+    return (time.perf_counter_ns() - start) / frames / 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-f", "--fraction", type=float, default=0.01, help="fraction of nodes changed per frame")
+    parser.add_argument("-b", "--branching", type=int, default=8, help="children per node")
+    parser.add_argument("-n", "--frames", type=int, default=50, help="frames per measurement")
+    options = parser.parse_args(argv)
+    
+    rng = np.random.default_rng(0)
+    print("{:>7} {:>8} {:>12} {:>12} {:>12}".format("nodes", "changed", "updated", "dirty ms", "full ms"))
+    for count in (10000, 20000, 50000, 100000):
+        graph = _tree(count, options.branching, rng)
+        changed = max(1, int(count * options.fraction))
+        dirty, updated = _frames(graph, changed, options.frames, rng)
+        full = _full(graph, options.frames)
+        print("{:>7} {:>8} {:>12.0f} {:>12.3f} {:>12.3f}".format(count, changed, updated, dirty, full))
+
+
+if __name__ == "__main__":
+    main()
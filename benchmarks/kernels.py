@@ -0,0 +1,87 @@
+"""Generated rotation kernels against the generic Givens path, for n = 2 to 8.
+
+    PYTHONPATH=. python benchmarks/kernels.py [--count 1000] [--dtype float32]
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from ensemble.mathematics import kernels, matrices, rotations, workspaces
+
+
+def _best(function, number):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+def _single(n, dtype, number):
+    rng = np.random.default_rng(n)
+    m = rng.normal(size=(n, n)).astype(dtype)
+    v = rng.normal(size=n).astype(dtype)
+    out = np.empty((n+1, n+1), dtype=dtype)
+    workspace = workspaces.Workspace(n=n, dtype=dtype)
+    matrix_kernel = kernels.matrix_kernel(n, dtype)
+    vector_kernel = kernels.vector_kernel(0, n, dtype)
+    
+    def generic_matrix():
+        result = matrices.identity(n=n, dtype=dtype, out=out)
+        sa = np.sin(m, out=workspace.sines)
+        ca = np.cos(m, out=workspace.cosines)
+        rotations.rotate(result, sa, ca, rotations.matrix_planes(n), workspace.rows)
+    
+    def kernel_matrix():
+        matrix_kernel(m, matrices.identity(n=n, dtype=dtype, out=out), workspace)
+    
+    def generic_vector():
+        result = matrices.identity(n=n, dtype=dtype, out=out)
+        sa = np.sin(v, out=workspace.sines[0])
+        ca = np.cos(v, out=workspace.cosines[0])
+        rotations.rotate(result, sa, ca, rotations.vector_planes(0, n), workspace.rows)
+    
+    def kernel_vector():
+        vector_kernel(v, matrices.identity(n=n, dtype=dtype, out=out), workspace)
+    
+    return [_best(f, number) for f in (generic_matrix, kernel_matrix, generic_vector, kernel_vector)]
+
+def _batch(n, dtype, count, number):
+    rng = np.random.default_rng(n)
+    m = rng.normal(size=(count, n, n)).astype(dtype)
+    out = np.empty((count, n+1, n+1), dtype=dtype)
+    workspace = workspaces.Workspace(n=n, dtype=dtype, count=count)
+    matrix_kernel = kernels.matrix_kernel(n, dtype)
+    
+    def generic_matrix():
+        result = matrices.identity_batch(count, n=n, dtype=dtype, out=out)
+        sa = np.sin(m, out=workspace.sines)
+        ca = np.cos(m, out=workspace.cosines)
+        rotations.rotate(result, sa, ca, rotations.matrix_planes(n), workspace.rows)
+    
+    def kernel_matrix():
+        matrix_kernel(m, matrices.identity_batch(count, n=n, dtype=dtype, out=out))
+    
+    return [_best(f, number) for f in (generic_matrix, kernel_matrix)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--count", type=int, default=1000, help="rotations per batch")
+    parser.add_argument("-d", "--dtype", default="float32", help="element type")
+    options = parser.parse_args(argv)
+    dtype = np.dtype(options.dtype).type
+    
+    print("single rotation, us per call")
+    print("{:>3} {:>10} {:>10} {:>7} {:>10} {:>10} {:>7}".format("n", "matrix", "kernel", "x", "vector", "kernel", "x"))
+    for n in range(2, kernels.MAX_N + 1):
+        gm, km, gv, kv = (t * 1e6 for t in _single(n, dtype, 2000))
+        print("{:>3} {:>10.2f} {:>10.2f} {:>7.1f} {:>10.2f} {:>10.2f} {:>7.1f}".format(n, gm, km, gm / km, gv, kv, gv / kv))
+    
+    print()
+    print("batch of {} matrix rotations, ms per batch".format(options.count))
+    print("{:>3} {:>10} {:>10} {:>7}".format("n", "generic", "kernel", "x"))
+    for n in range(2, kernels.MAX_N + 1):
+        gm, km = (t * 1e3 for t in _batch(n, dtype, options.count, 20))
+        print("{:>3} {:>10.3f} {:>10.3f} {:>7.1f}".format(n, gm, km, gm / km))
+
+
+if __name__ == "__main__":
+    main()
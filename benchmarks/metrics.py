@@ -0,0 +1,93 @@
+"""Network instrumentation overhead: per-message recording, stats snapshots and dumps.
+
+    PYTHONPATH=. python benchmarks/metrics.py [--peers 8] [--messages 100000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from ensemble import metrics, osc
+
+
+def _sequences(messages, pattern, rng):
+    sequences = np.arange(1, messages + 1)
+    if pattern == "lossy":
+        # 1% dropped.
+        sequences = sequences[rng.random(messages) >= 0.01]
+    elif pattern == "reordered":
+        # Neighbouring pairs swapped 5% of the time.
+        swaps = np.flatnonzero(rng.random(messages - 1) < 0.05)
+        sequences[swaps], sequences[swaps + 1] = sequences[swaps + 1], sequences[swaps].copy()
+    return sequences.tolist()
+
+def received(peers, messages, rng):
+    # Nanoseconds per Monitor.received, with messages round-robin over the peers as they would arrive.
+    print("{:<12} {:>12}".format("pattern", "ns/message"))
+    for pattern in ("in order", "lossy", "reordered"):
+        monitor = metrics.Monitor()
+        sequences = _sequences(messages // peers, pattern, rng)
+        sent = time.perf_counter_ns()
+        start = time.perf_counter_ns()
+        for sequence in sequences:
+            for peer in range(peers):
+                monitor.received(peer, 0, sequence, sent, sent + 150000)
+        elapsed = time.perf_counter_ns() - start
+        print("{:<12} {:>12.0f}".format(pattern, elapsed / (len(sequences) * peers)))
+    
+    # For scale: what the asyncio transport already spends decoding the /time heartbeat.
+    packet = osc.encode_message("/time", ('t', 12.5), ('h', 1234), ('i', 3), ('i', 1234567))
+    best = min(timeit.repeat(lambda: osc.decode_packet(packet), number=20000, repeat=5)) / 20000
+    print("{:<12} {:>12.0f}".format("osc decode", best * 1e9))
+
+def snapshots(peers, rng):
+    monitor = metrics.Monitor()
+    for sequence in _sequences(metrics.DEFAULT_WINDOW * 4, "lossy", rng):
+        for peer in range(peers):
+            monitor.received(peer, 0, sequence, 0, 150000)
+    
+    stats = min(timeit.repeat(monitor.stats, number=100, repeat=5)) / 100
+    path = os.path.join(tempfile.mkdtemp(), "stats.json")
+    snapshot = monitor.stats()
+    # Each dump replaces the previous file, which costs far more than the write on some filesystems.
+    dumps = []
+    for _ in range(20):
+        start = time.perf_counter_ns()
+        metrics.dump(path, snapshot)
+        dumps.append(time.perf_counter_ns() - start)
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    peer = metrics.Peer()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del peer
+    
+    print()
+    print("{} peers".format(peers))
+    print("{:<24} {:>10.1f} us".format("Monitor.stats", stats * 1e6))
+    print("{:<24} {:>10.1f} us".format("metrics.dump p50", np.percentile(dumps, 50) / 1e3))
+    print("{:<24} {:>10.1f} us".format("metrics.dump max", max(dumps) / 1e3))
+    print("{:<24} {:>10} bytes".format("memory per peer", after - before))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-p", "--peers", type=int, default=8, help="peers reporting")
+    parser.add_argument("-m", "--messages", type=int, default=100000, help="messages recorded per pattern")
+    options = parser.parse_args(argv)
+    
+    rng = np.random.default_rng(0)
+    received(options.peers, options.messages, rng)
+    snapshots(options.peers, rng)
+
+
+if __name__ == "__main__":
+    main()
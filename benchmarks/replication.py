@@ -0,0 +1,68 @@
+"""State replication bandwidth and latency for 100k floats over multicast loopback.
+
+    PYTHONPATH=. python benchmarks/replication.py [--size 100000] [--frames 120] [--port 47500]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ensemble import replication
+
+RATE = 60
+
+
+def _run(size, fraction, compression, frames, port, rng):
+    # Bytes on the wire per frame, and milliseconds from publish until the subscriber has applied it.
+    state = rng.normal(size=size).astype(np.float32)
+    publisher = replication.Publisher(state, port, compression=compression)
+    subscriber = replication.Subscriber(np.zeros_like(state), port)
+    changed = max(1, int(size * fraction))
+    
+    latencies = []
+    try:
+        for _ in range(frames):
+            state[rng.choice(size, changed, replace=False)] = rng.normal(size=changed)
+            start = time.perf_counter_ns()
+            frame = publisher.publish()
+            deadline = start + 1000000000
+            while subscriber.frame != frame and time.perf_counter_ns() < deadline:
+                subscriber.receive()
+            if subscriber.frame == frame:
+                latencies.append(time.perf_counter_ns() - start)
+        stats = publisher.stats()
+        correct = np.array_equal(subscriber.state, state)
+    finally:
+        publisher.close()
+        subscriber.close()
+    return stats, np.array(latencies, dtype=np.float64) / 1e6, correct
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-s", "--size", type=int, default=100000, help="replicated floats")
+    parser.add_argument("-n", "--frames", type=int, default=120, help="frames per measurement")
+    parser.add_argument("-p", "--port", type=int, default=47500, help="multicast port")
+    options = parser.parse_args(argv)
+    
+    compressions = [replication.ZLIB, None]
+    try:
+        replication._lz4()
+        compressions.insert(1, replication.LZ4)
+    except ImportError:
+        print("lz4 skipped: not installed")
+    
+    rng = np.random.default_rng(0)
+    print("{:>9} {:>6} {:>10} {:>10} {:>12} {:>10} {:>10} {:>7} {:>8}".format("changed", "codec", "p50 bytes", "max bytes", "MB/s at 60", "p50 ms", "p99 ms", "frames", "correct"))
+    for fraction in (0.001, 0.01, 0.1, 1.0):
+        for compression in compressions:
+            stats, latencies, correct = _run(options.size, fraction, compression, options.frames, options.port, rng)
+            p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (np.nan, np.nan)
+            print("{:>9.1%} {:>6} {:>10.0f} {:>10.0f} {:>12.2f} {:>10.3f} {:>10.3f} {:>7} {:>8}".format(
+                fraction, compression or "none", stats["bytes"]["p50"], stats["bytes"]["max"], stats["bytes"]["p50"] * RATE / 1e6,
+                p50, p99, len(latencies), "yes" if correct else "no"))
+
+
+if __name__ == "__main__":
+    main()
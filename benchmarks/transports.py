@@ -0,0 +1,112 @@
+"""OSC transport latency and throughput over multicast loopback, asyncio against liblo.
+
+    PYTHONPATH=. python benchmarks/transports.py [--messages 20000] [--port 47400]
+"""
+
+import argparse
+import threading
+import time
+import timeit
+
+import numpy as np
+
+from ensemble import osc, transports
+
+
+class _Receiver(object):
+    def __init__(self, expected):
+        super().__init__()
+        
+        self._expected = expected
+        self._done = threading.Event()
+        self.latencies = []
+        self.last = None
+    
+    def __call__(self, path, args, types, src):
+        # Immediate, so this runs on the network thread as each message arrives.
+        self.last = time.perf_counter_ns()
+        self.latencies.append(self.last - args[0])
+        if len(self.latencies) >= self._expected:
+            self._done.set()
+    
+    def wait(self, timeout):
+        return self._done.wait(timeout)
+
+
+def _create(name, port):
+    try:
+        return transports.AsyncioTransport(port) if name == transports.ASYNCIO else transports.LibloTransport(port)
+    except ImportError as e:
+        print("{:<8} skipped: {}".format(name, e))
+        return None
+
+def _latency(transport, messages, interval=0.0002):
+    # Spaced out, so the receive queue never backs up; sleeping rather than spinning leaves the
+    # GIL to the network thread, as an idle render thread would.
+    receiver = _Receiver(messages)
+    transport.add_method("/bench/latency", "h", receiver, immediate=True)
+    for _ in range(messages):
+        transport.send("/bench/latency", ('h', time.perf_counter_ns()))
+        time.sleep(interval)
+    receiver.wait(2.0)
+    return receiver.latencies
+
+def _throughput(transport, messages):
+    # Messages sent back to back, yielding while the (non-blocking) send buffer is full; those
+    # lost on the receiving side count as dropped.
+    receiver = _Receiver(messages)
+    transport.add_method("/bench/throughput", "h", receiver, immediate=True)
+    start = time.perf_counter_ns()
+    for _ in range(messages):
+        while True:
+            try:
+                transport.send("/bench/throughput", ('h', time.perf_counter_ns()))
+                break
+            except BlockingIOError:
+                time.sleep(0)
+    receiver.wait(5.0)
+    return len(receiver.latencies), (receiver.last or start) - start
+
+def compare(names, messages, port):
+    print("{:<8} {:>10} {:>10} {:>10} {:>10} {:>12} {:>10}".format("backend", "p50 us", "p90 us", "p99 us", "max us", "msgs/s", "dropped"))
+    for name in names:
+        transport = _create(name, port)
+        if transport is None:
+            continue
+        transport.start()
+        try:
+            latencies = np.array(_latency(transport, messages // 10), dtype=np.float64) / 1e3
+            received, elapsed = _throughput(transport, messages)
+        finally:
+            transport.stop()
+        p50, p90, p99, top = np.percentile(latencies, [50, 90, 99, 100]) if len(latencies) else (np.nan,) * 4
+        print("{:<8} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>12.0f} {:>10}".format(name, p50, p90, p99, top, received / max(elapsed, 1) * 1e9, messages - received))
+
+
+def codec():
+    # The pure Python encoding the asyncio transport does on every send and receive.
+    message = osc.encode_message("/time", ('d', 12.5), ('h', 1234567890123), ('i', 3))
+    bundle = osc.encode_bundle(12.5, ("/play", ('t', 12.5)), ("/seek", ('d', 3.0), ('t', 12.5)))
+    print()
+    print("osc codec")
+    for label, function in (
+        ("encode_message", lambda: osc.encode_message("/time", ('d', 12.5), ('h', 1234567890123), ('i', 3))),
+        ("decode_packet (message)", lambda: osc.decode_packet(message)),
+        ("decode_packet (bundle of 2)", lambda: osc.decode_packet(bundle)),
+    ):
+        best = min(timeit.repeat(function, number=20000, repeat=5)) / 20000
+        print("{:<36} {:>8.2f} us".format(label, best * 1e6))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-m", "--messages", type=int, default=20000, help="messages in the throughput burst")
+    parser.add_argument("-p", "--port", type=int, default=47400, help="multicast port")
+    options = parser.parse_args(argv)
+    
+    compare((transports.ASYNCIO, transports.LIBLO), options.messages, options.port)
+    codec()
+
+
+if __name__ == "__main__":
+    main()
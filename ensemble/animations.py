@@ -0,0 +1,178 @@
+import numpy as np
+
+STEP = "step"
+LINEAR = "linear"
+CUBIC = "cubic"
+SLERP = "slerp"
+
+
+def _pack(times, values):
+    counts = np.array([len(t) for t in times], dtype=np.intp)
+    if np.any(counts < 1):
+        raise ValueError("Every track needs at least one keyframe.")
+    offsets = np.zeros(len(counts) + 1, dtype=np.intp)
+    np.cumsum(counts, out=offsets[1:])
+    packed_times = np.concatenate([np.asarray(t, dtype=np.float64) for t in times])
+    packed_values = np.concatenate([np.asarray(v, dtype=np.float32).reshape(len(t), -1) for t, v in zip(times, values)])
+    for lower, upper in zip(offsets[:-1], offsets[1:]):
+        if np.any(np.diff(packed_times[lower:upper]) < 0):
+            raise ValueError("Keyframe times must be sorted.")
+    return offsets, packed_times, packed_values
+
+def _slerp(a, b, u):
+    dot = np.sum(a*b, axis=-1)
+    b = np.where((dot < 0)[:, np.newaxis], -b, b)
+    dot = np.abs(dot)
+    
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    near = sin_theta < 1e-6
+    safe = np.where(near, 1.0, sin_theta)
+    
+    wa = np.where(near, 1.0 - u, np.sin((1.0 - u)*theta)/safe)
+    wb = np.where(near, u, np.sin(u*theta)/safe)
+    
+    result = wa[:, np.newaxis]*a + wb[:, np.newaxis]*b
+    result /= np.linalg.norm(result, axis=-1, keepdims=True)
+    return result
+
+
+class Tracks(object):
+    def __init__(self, times, values, interpolation=LINEAR):
+        super().__init__()
+        
+        if interpolation not in (STEP, LINEAR, CUBIC, SLERP):
+            raise ValueError("Unknown interpolation: {}".format(interpolation))
+        
+        self._interpolation = interpolation
+        self._offsets, self._times, self._values = _pack(times, values)
+        
+        if interpolation == SLERP and self._values.shape[-1] != 4:
+            raise ValueError("Slerp tracks need quaternion (4-component) values.")
+        
+        self._first = self._offsets[:-1]
+        self._last = np.maximum(self._offsets[1:] - 2, self._first)
+        
+        self._cursors = self._first.copy()
+    
+    @property
+    def interpolation(self):
+        return self._interpolation
+    
+    @property
+    def width(self):
+        return self._values.shape[-1]
+    
+    def __len__(self):
+        return len(self._first)
+    
+    def _search(self, t, tracks):
+        # Vectorized bisection per track: the last keyframe at or before t, clamped to a valid segment.
+        lower = self._first[tracks].copy()
+        upper = self._last[tracks].copy()
+        times = self._times
+        while True:
+            active = lower < upper
+            if not np.any(active):
+                return lower
+            middle = (lower + upper + 1) // 2
+            ahead = times[middle] <= t
+            lower = np.where(active & ahead, middle, lower)
+            upper = np.where(active & ~ahead, middle - 1, upper)
+    
+    def _segments(self, t):
+        times = self._times
+        cursors = self._cursors
+        last = self._last
+        
+        # Sequential playback almost always stays in, or just after, the cached segment.
+        limit = np.minimum(cursors + 1, self._offsets[1:] - 1)
+        valid = ((times[cursors] <= t) | (cursors == self._first)) & ((t < times[limit]) | (cursors == last))
+        if not np.all(valid):
+            advanced = np.minimum(cursors + 1, last)
+            limit = np.minimum(advanced + 1, self._offsets[1:] - 1)
+            moved = ~valid & (times[advanced] <= t) & ((t < times[limit]) | (advanced == last))
+            cursors[moved] = advanced[moved]
+            valid |= moved
+            if not np.all(valid):
+                tracks = np.flatnonzero(~valid)
+                cursors[tracks] = self._search(t, tracks)
+        
+        return cursors
+    
+    def evaluate(self, t, out=None):
+        segments = self._segments(t)
+        following = np.minimum(segments + 1, self._offsets[1:] - 1)
+        
+        t0 = self._times[segments]
+        t1 = self._times[following]
+        span = t1 - t0
+        u = np.clip((t - t0)/np.where(span > 0, span, 1.0), 0.0, 1.0)
+        u = np.where(span > 0, u, (t >= t1).astype(np.float64))
+        
+        a = self._values[segments]
+        b = self._values[following]
+        
+        if self._interpolation == STEP:
+            result = np.where((u >= 1.0)[:, np.newaxis], b, a)
+        elif self._interpolation == LINEAR:
+            # Weighted rather than a + (b - a)*u, so the clamped ends reproduce the keyframe values exactly.
+            u = u[:, np.newaxis].astype(np.float32)
+            result = a*(1 - u) + b*u
+        elif self._interpolation == CUBIC:
+            result = self._cubic(segments, following, u, span)
+        else:
+            result = _slerp(a, b, u)
+        
+        if out is None:
+            return result.astype(np.float32, copy=False)
+        out[...] = result
+        return out
+    
+    def _cubic(self, segments, following, u, span):
+        # Hermite interpolation with finite-difference (Catmull-Rom style) tangents for uneven keyframe spacing.
+        times = self._times
+        values = self._values
+        
+        previous = np.maximum(segments - 1, self._first)
+        subsequent = np.minimum(following + 1, self._offsets[1:] - 1)
+        
+        def tangent(lower, upper):
+            dt = times[upper] - times[lower]
+            dt = np.where(dt > 0, dt, 1.0)
+            return (values[upper] - values[lower])/dt[:, np.newaxis]
+        
+        m0 = tangent(previous, following)*span[:, np.newaxis]
+        m1 = tangent(segments, subsequent)*span[:, np.newaxis]
+        
+        u = u[:, np.newaxis]
+        u2 = u*u
+        u3 = u2*u
+        
+        h00 = 2*u3 - 3*u2 + 1
+        h10 = u3 - 2*u2 + u
+        h01 = -2*u3 + 3*u2
+        h11 = u3 - u2
+        
+        return h00*values[segments] + h10*m0 + h01*values[following] + h11*m1
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, len(self), self._interpolation)
+
+
+class Animation(object):
+    def __init__(self, timer, tracks=None):
+        super().__init__()
+        
+        self._timer = timer
+        self._tracks = {} if tracks is None else dict(tracks)
+    
+    def __getitem__(self, name):
+        return self._tracks[name]
+    
+    def __setitem__(self, name, value):
+        self._tracks[name] = value
+    
+    def evaluate(self, t=None):
+        t = self._timer.elapsed if t is None else t
+        return {name: tracks.evaluate(t) for name, tracks in self._tracks.items()}
@@ -100,6 +100,10 @@ def get_config():
     from . import configurations
     
     def _get_config():
+        # A launcher passes each node its configuration directly.
+        value = os.environ.get("ENSEMBLE_CONFIG")
+        if value:
+            return json.loads(value)
         try:
             path = config_path()
             return load_json(path)
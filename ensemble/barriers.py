@@ -0,0 +1,149 @@
+import logging
+
+import collections
+import select
+import struct
+import time
+
+from . import metrics, transports
+
+_logger = logging.getLogger(__name__.split(".").pop())
+
+DEFAULT_GROUP = transports.DEFAULT_GROUP
+DEFAULT_TIMEOUT = 0.05
+DEFAULT_HISTORY = 600
+DEFAULT_RESEND = 0.005
+DEFAULT_REPEATS = 3
+
+READY = 1
+RELEASE = 2
+
+_MAGIC = b"ENSB"
+_MESSAGE = struct.Struct("!4sBHQq")
+
+
+class FrameBarrier(object):
+    def __init__(self, node, nodes, master=False, port=None, group=DEFAULT_GROUP, timeout=DEFAULT_TIMEOUT, history=DEFAULT_HISTORY, resend=DEFAULT_RESEND, repeats=DEFAULT_REPEATS, sock=None):
+        super().__init__()
+        
+        self._node = node
+        self._nodes = nodes
+        self._master = master
+        self._address = (group, port)
+        self._timeout = timeout
+        # A lost READY is sent again every resend seconds until released; RELEASE goes out repeats times.
+        self._resend = resend
+        self._repeats = repeats
+        
+        self._socket = transports.open_multicast_socket(group, port) if sock is None else sock
+        
+        self._frame = 0
+        self._released = -1
+        
+        self._arrivals = collections.defaultdict(dict)
+        
+        self._latencies = collections.deque(maxlen=history)
+        self._skews = collections.deque(maxlen=history)
+        self._timeouts = 0
+    
+    @property
+    def frame(self):
+        return self._frame
+    
+    @property
+    def master(self):
+        return self._master
+    
+    @property
+    def timeouts(self):
+        return self._timeouts
+    
+    def _send(self, kind, frame):
+        message = _MESSAGE.pack(_MAGIC, kind, self._node, frame, time.perf_counter_ns())
+        try:
+            self._socket.sendto(message, self._address)
+        except OSError as e:
+            _logger.warning("Failed to send barrier message: %s", e)
+    
+    def _receive(self, deadline):
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([self._socket], [], [], remaining)
+            if not readable:
+                return False
+            while True:
+                try:
+                    data, _ = self._socket.recvfrom(_MESSAGE.size)
+                except BlockingIOError:
+                    break
+                if len(data) != _MESSAGE.size:
+                    continue
+                magic, kind, node, frame, _ = _MESSAGE.unpack(data)
+                if magic != _MAGIC:
+                    continue
+                if kind == READY and self._master:
+                    if frame <= self._released:
+                        # Still waiting, so every copy of that RELEASE was lost.
+                        self._send(RELEASE, frame)
+                    else:
+                        self._arrivals[frame].setdefault(node, time.perf_counter_ns())
+                elif kind == RELEASE:
+                    self._released = max(self._released, frame)
+            return True
+    
+    def _complete(self, frame):
+        return len(self._arrivals.get(frame, ())) >= self._nodes
+    
+    def synchronise(self):
+        # Blocks until every node has reported this frame ready (or the timeout expires).
+        frame = self._frame
+        start = time.perf_counter_ns()
+        deadline = time.perf_counter() + self._timeout
+        
+        if self._master:
+            self._arrivals[frame].setdefault(self._node, start)
+            while not self._complete(frame) and self._receive(deadline):
+                pass
+            arrivals = self._arrivals.pop(frame, {})
+            for stale in [f for f in self._arrivals if f < frame]:
+                del self._arrivals[stale]
+            if len(arrivals) < self._nodes:
+                self._timeouts += 1
+            if arrivals:
+                self._skews.append(max(arrivals.values()) - min(arrivals.values()))
+            for _ in range(self._repeats):
+                self._send(RELEASE, frame)
+            self._released = frame
+        else:
+            resend = time.perf_counter()
+            while self._released < frame:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                if now >= resend:
+                    self._send(READY, frame)
+                    resend = now + self._resend
+                self._receive(min(deadline, resend))
+            if self._released < frame:
+                self._timeouts += 1
+        
+        self._latencies.append(time.perf_counter_ns() - start)
+        # Nodes that restarted or fell behind catch up with the furthest frame seen.
+        self._frame = max([frame, self._released] + list(self._arrivals)) + 1
+        return self._frame
+    
+    def stats(self):
+        return {
+            "frame": self._frame,
+            "timeouts": self._timeouts,
+            "latency_ns": metrics.percentiles(self._latencies),
+            "skew_ns": metrics.percentiles(self._skews),
+        }
+    
+    def close(self):
+        self._socket.close()
+    
+    def __str__(self):
+        return "{}({},{},{})".format(type(self).__name__, self._node, self._nodes, self._frame)
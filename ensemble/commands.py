@@ -0,0 +1,141 @@
+import numpy as np
+
+from . import states, uniforms
+
+_OPCODES = {name: opcode for opcode, name in enumerate(states.OPERATIONS)}
+
+
+class CommandBuffer(object):
+    def __init__(self):
+        super().__init__()
+        
+        # Opcodes in an array, arguments in a parallel list; dynamic slots are (command, argument)
+        # positions patched with new values on every replay.
+        self._opcodes = np.zeros(0, dtype=np.uint8)
+        self._arguments = []
+        self._dynamic = {}
+        
+        self._recording = None
+        self._valid = False
+        
+        # Compiled at end(): the backend calls left once redundant state changes are dropped, the
+        # tracked state they assume on entry, and what they add to the tracker's counts.
+        self._state = None
+        self._functions = None
+        self._compiled = []
+        self._entry = {}
+        self._calls = 0
+        self._skipped = 0
+        self._caches = ()
+    
+    @property
+    def valid(self):
+        return self._valid
+    
+    @property
+    def opcodes(self):
+        return self._opcodes
+    
+    def __len__(self):
+        return len(self._opcodes)
+    
+    def append(self, name, args):
+        self._recording.append(_OPCODES[name])
+        self._arguments.append(list(args))
+    
+    def record(self, state):
+        # The commands issued through state until end() are executed as usual and also recorded.
+        self._recording = []
+        self._arguments = []
+        self._dynamic = {}
+        self._valid = False
+        state.recorder = self
+    
+    def mark(self, name, position=-1):
+        # Marks an argument of the last recorded command (by default its value) as dynamic.
+        index = len(self._arguments) - 1
+        self._dynamic[name] = (index, position % len(self._arguments[index]))
+    
+    def end(self, state):
+        state.recorder = None
+        self._opcodes = np.array(self._recording, dtype=np.uint8)
+        self._recording = None
+        self._compile(state)
+        self._valid = True
+    
+    def invalidate(self):
+        self._valid = False
+    
+    def _compile(self, state):
+        names = [states.OPERATIONS[opcode] for opcode in self._opcodes.tolist()]
+        dynamic = {index for index, _ in self._dynamic.values()}
+        effects = [states.effect(name, args) for name, args in zip(names, self._arguments)]
+        
+        # Replayed back to back, the buffer starts from the state it left: the last value it sets per
+        # key. Keys a dynamic argument sets can hold anything, so nothing is assumed about them.
+        volatile = {effects[index][0] for index in dynamic if effects[index] is not None}
+        entry = {}
+        for effect in effects:
+            if effect is not None and effect[0] not in volatile:
+                entry[effect[0]] = effect[1]
+        
+        backend = state.backend
+        current = dict(entry)
+        compiled = []
+        calls = skipped = cached = 0
+        caches = []
+        for index, (name, args, effect) in enumerate(zip(names, self._arguments, effects)):
+            if effect is not None and index in dynamic:
+                # Through the tracker, which does its own counting.
+                compiled.append((getattr(state, name), args))
+                current.pop(effect[0], None)
+                continue
+            if effect is not None:
+                key, value = effect
+                if key in current and (current[key] is value or current[key] == value):
+                    skipped += 1
+                    continue
+                current[key] = value
+            if name == "set_uniform" and isinstance(args[0], uniforms.UniformCache):
+                # Counted on replay by the uploads the cache actually made.
+                cached += 1
+                if args[0] not in caches:
+                    caches.append(args[0])
+            else:
+                calls += 1
+            compiled.append((getattr(backend, name), args))
+        
+        self._state = state
+        self._functions = [getattr(state, name) for name in states.OPERATIONS]
+        self._compiled = compiled
+        self._entry = entry
+        self._calls = calls
+        self._skipped = skipped + cached
+        self._caches = tuple(caches)
+    
+    def replay(self, state, **values):
+        arguments = self._arguments
+        for name, value in values.items():
+            index, position = self._dynamic[name]
+            arguments[index][position] = value
+        
+        if state is not self._state:
+            self._compile(state)
+        
+        # Anything else changing the tracked state since (another buffer, invalidate()) means the
+        # dropped calls may be needed: that replay goes through the tracker and restores the state.
+        if not state.matches(self._entry):
+            functions = self._functions
+            for opcode, args in zip(self._opcodes.tolist(), arguments):
+                functions[opcode](*args)
+            return
+        
+        caches = self._caches
+        uploads = sum(cache.uploads for cache in caches)
+        for function, args in self._compiled:
+            function(*args)
+        uploaded = sum(cache.uploads for cache in caches) - uploads
+        state.count(self._calls + uploaded, self._skipped - uploaded)
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, len(self._opcodes), sorted(self._dynamic))
@@ -40,9 +40,19 @@ class Configuration(Object):
 
     class Video(Object):
         class Global(Object):
+            class Tile(Object):
+                _fields = [
+                    ("index", lambda data: as_ivector(data.get("index"), np.array([0, 0], dtype=np.int32))),
+                    ("resolution", lambda data: as_ivector(data.get("resolution"), None)),
+                    ("offset", lambda data: as_ivector(data.get("offset"), None)),
+                    ("viewport", lambda data: as_ivector(data.get("viewport"), None)),
+                ]
+            
             _fields = [
                 ("resolution", lambda data: as_ivector(data.get("resolution"), np.array([1280, 720], dtype=np.int32))),
                 ("shape", lambda data: as_ivector(data.get("shape"), np.array([1, 1], dtype=np.int32))),
+                ("bezel", lambda data: as_ivector(data.get("bezel"), np.array([0, 0], dtype=np.int32))),
+                ("tiles", lambda data: [Configuration.Video.Global.Tile(tile) for tile in data.get("tiles", [])]),
             ]
         class Format(Object):
             _fields = [
@@ -64,12 +74,19 @@ class Configuration(Object):
             ("stereo", lambda data: as_bscalar(data.get("stereo"), False)),
             ("samples", lambda data: as_iscalar(data.get("samples"), 4)),
             ("vsync", lambda data: as_iscalar(data.get("vsync"), 0)),
+            ("pacing", lambda data: as_bscalar(data.get("pacing"), False)),
+            ("binaries", lambda data: as_bscalar(data.get("binaries"), False)),
         ]
     
     class Network(Object):
         _fields = [
             ("timeserver", lambda data: as_bscalar(data.get("timeserver"), False)),
+            ("synchronise", lambda data: as_bscalar(data.get("synchronise"), False)),
             ("port", lambda data: as_iscalar(data.get("port"), 1234)),
+            ("node", lambda data: as_iscalar(data.get("node"), 0)),
+            ("nodes", lambda data: as_iscalar(data.get("nodes"), 1)),
+            ("transport", lambda data: str(data.get("transport", "liblo"))),
+            ("statistics", lambda data: str(data.get("statistics", ""))),
         ]
     
     _fields = [
@@ -0,0 +1,93 @@
+import numpy as np
+
+
+class Timeline(object):
+    def __init__(self, starts=(), ends=None, ids=None):
+        super().__init__()
+        
+        self._starts = np.zeros(0, dtype=np.float64)
+        self._ends = np.zeros(0, dtype=np.float64)
+        self._start_ids = np.zeros(0, dtype=np.int64)
+        self._end_ids = np.zeros(0, dtype=np.int64)
+        self._count = 0
+        
+        self.add(starts, ends, ids)
+    
+    def __len__(self):
+        return self._count
+    
+    def add(self, starts, ends=None, ids=None):
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1)
+        ends = starts if ends is None else np.asarray(ends, dtype=np.float64).reshape(-1)
+        ids = np.arange(self._count, self._count + len(starts)) if ids is None else np.asarray(ids, dtype=np.int64).reshape(-1)
+        
+        if not (len(starts) == len(ends) == len(ids)):
+            raise ValueError("Cue starts, ends and ids must have the same length.")
+        if np.any(ends < starts):
+            raise ValueError("Cues must not end before they start.")
+        
+        def merge(times, values, new_times, new_values):
+            times = np.concatenate([times, new_times])
+            values = np.concatenate([values, new_values])
+            order = np.argsort(times, kind="stable")
+            return times[order], values[order]
+        
+        self._starts, self._start_ids = merge(self._starts, self._start_ids, starts, ids)
+        self._ends, self._end_ids = merge(self._ends, self._end_ids, ends, ids)
+        self._count += len(starts)
+        
+        return ids
+    
+    def started(self, lower, upper):
+        # Cues starting in (lower, upper], in time order.
+        i, j = np.searchsorted(self._starts, (lower, upper), side="right")
+        return self._start_ids[i:j]
+    
+    def ended(self, lower, upper):
+        # Cues ending in (lower, upper], in time order.
+        i, j = np.searchsorted(self._ends, (lower, upper), side="right")
+        return self._end_ids[i:j]
+
+
+class Cues(object):
+    def __init__(self, timer, timeline=None):
+        super().__init__()
+        
+        self._timer = timer
+        self._timeline = Timeline() if timeline is None else timeline
+        
+        self._last = None
+        self._epoch = None
+    
+    @property
+    def timeline(self):
+        return self._timeline
+    
+    def reset(self):
+        self._last = None
+        self._epoch = None
+    
+    def _interval(self):
+        t = self._timer.elapsed
+        last, epoch = self._last, self._timer.epoch
+        
+        # Nothing fires while stopped; the first frame after play covers everything from t = 0.
+        if not self._timer.started:
+            self._last, self._epoch = np.nextafter(0.0, -np.inf), epoch
+            return t, t
+        
+        # Stops, seeks and backwards jumps are discontinuities: skipped cues are not replayed,
+        # but a cue landing exactly on the new position still fires.
+        if last is None or epoch != self._epoch or t < last:
+            last = np.nextafter(t, -np.inf)
+        
+        self._last, self._epoch = t, epoch
+        return last, t
+    
+    def poll(self):
+        lower, upper = self._interval()
+        return self._timeline.started(lower, upper)
+    
+    def poll_intervals(self):
+        lower, upper = self._interval()
+        return self._timeline.started(lower, upper), self._timeline.ended(lower, upper)
@@ -1,5 +1,6 @@
-import functools as ft
-import itertools as it
+import numpy as np
+
+from .mathematics import matrices
 
 
 def identity(x):
@@ -11,13 +12,109 @@ def constant(x):
     return _constant
 
 def compose(*args):
-    def _compose(f, g):
-        def __compose(t):
-            return f(g(t))
-        return __compose
-    return ft.reduce(_compose, args, identity)
+    return Pipeline(*reversed(args))
 
 def invertible(f, f_inv):
     f_inv.inv = f
     f.inv = f_inv
     return f
+
+
+class Affine(object):
+    def __init__(self, matrix, scalar=False):
+        super().__init__()
+        
+        # Maps row vectors (..., n) through an (n+1, n+1) matrix; a scalar map is a 2x2 matrix that
+        # takes arrays of plain numbers of any shape instead.
+        self._matrix = np.asarray(matrix)
+        self._scalar = scalar
+        
+        if scalar and self._matrix.shape != (2, 2):
+            raise ValueError("Scalar affine maps need a 2x2 matrix, not {}.".format(self._matrix.shape))
+    
+    @property
+    def matrix(self):
+        return self._matrix
+    
+    @property
+    def scalar(self):
+        return self._scalar
+    
+    @property
+    def linear(self):
+        return self._matrix[:-1, :-1]
+    
+    @property
+    def translation(self):
+        return self._matrix[-1, :-1]
+    
+    @property
+    def inv(self):
+        return Affine(matrices.inversed(self._matrix), scalar=self._scalar)
+    
+    def then(self, other):
+        return Affine(np.dot(self._matrix, other.matrix), scalar=self._scalar)
+    
+    def fuses(self, other):
+        return isinstance(other, Affine) and other.scalar == self._scalar and other.matrix.shape == self._matrix.shape
+    
+    def __call__(self, x):
+        if self._scalar:
+            return np.asarray(x)*self._matrix[0, 0] + self._matrix[1, 0]
+        return np.dot(x, self.linear) + self.translation
+    
+    def __str__(self):
+        return "{}({}x{},{})".format(type(self).__name__, *self._matrix.shape, self._scalar)
+
+def affine(matrix, scalar=False):
+    return Affine(matrix, scalar=scalar)
+
+
+class Pipeline(object):
+    def __init__(self, *stages):
+        super().__init__()
+        
+        self._stages = []
+        self._inv = None
+        for stage in stages:
+            self._append(stage)
+    
+    def _append(self, stage):
+        if stage is identity:
+            return
+        if isinstance(stage, Pipeline) and stage._inv is None:
+            for inner in stage._stages:
+                self._append(inner)
+            return
+        if self._stages and isinstance(stage, Affine) and stage.fuses(self._stages[-1]):
+            self._stages[-1] = self._stages[-1].then(stage)
+            return
+        self._stages.append(stage)
+    
+    @property
+    def stages(self):
+        return tuple(self._stages)
+    
+    @property
+    def inv(self):
+        if self._inv is not None:
+            return self._inv
+        try:
+            return Pipeline(*(stage.inv for stage in reversed(self._stages)))
+        except AttributeError:
+            raise AttributeError("Pipeline has a stage without an inverse.")
+    
+    @inv.setter
+    def inv(self, value):
+        self._inv = value
+    
+    def __call__(self, t):
+        for stage in self._stages:
+            t = stage(t)
+        return t
+    
+    def __len__(self):
+        return len(self._stages)
+    
+    def __str__(self):
+        return "{}({})".format(type(self).__name__, len(self._stages))
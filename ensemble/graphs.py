@@ -0,0 +1,169 @@
+import numpy as np
+
+from .mathematics import contexts, matrices
+
+DEFAULT_CAPACITY = 1024
+
+
+class SceneGraph(object):
+    def __init__(self, capacity=DEFAULT_CAPACITY, n=None, dtype=None):
+        super().__init__()
+        
+        self._n, self._dtype = contexts.resolve(n, dtype)
+        
+        self._count = 0
+        
+        self._parents = np.full(capacity, -1, dtype=np.int32)
+        self._depths = np.zeros(capacity, dtype=np.int32)
+        self._dirty = np.zeros(capacity, dtype=np.bool_)
+        
+        self._locals = matrices.identity_batch(capacity, n=self._n, dtype=self._dtype)
+        self._worlds = matrices.identity_batch(capacity, n=self._n, dtype=self._dtype)
+        
+        self._levels = None
+    
+    @property
+    def count(self):
+        return self._count
+    
+    @property
+    def parents(self):
+        return self._parents[:self._count]
+    
+    @property
+    def depths(self):
+        return self._depths[:self._count]
+    
+    @property
+    def locals(self):
+        return self._locals[:self._count]
+    
+    @property
+    def worlds(self):
+        return self._worlds[:self._count]
+    
+    @property
+    def dirty(self):
+        return self._dirty[:self._count]
+    
+    def _reserve(self, capacity):
+        if capacity <= len(self._parents):
+            return
+        
+        capacity = max(capacity, 2*len(self._parents))
+        
+        def grow(value, fill):
+            result = np.empty((capacity,) + value.shape[1:], dtype=value.dtype)
+            result[:len(value)] = value
+            result[len(value):] = fill
+            return result
+        
+        self._parents = grow(self._parents, -1)
+        self._depths = grow(self._depths, 0)
+        self._dirty = grow(self._dirty, False)
+        self._locals = grow(self._locals, matrices.identity(n=self._n, dtype=self._dtype))
+        self._worlds = grow(self._worlds, matrices.identity(n=self._n, dtype=self._dtype))
+    
+    def add(self, parent=-1, local=None):
+        return int(self.extend(np.array([parent], dtype=np.int32), None if local is None else local[np.newaxis])[0])
+    
+    def extend(self, parents, locals=None):
+        parents = np.asarray(parents, dtype=np.int32)
+        
+        first, count = self._count, len(parents)
+        indices = np.arange(first, first + count, dtype=np.int32)
+        
+        if np.any(parents >= indices):
+            raise ValueError("Parents must be added before their children.")
+        
+        self._reserve(first + count)
+        self._count += count
+        
+        self._parents[indices] = parents
+        if locals is not None:
+            self._locals[indices] = locals
+        self._dirty[indices] = True
+        
+        # Parents precede their children, so depths resolve in one pass per level of the batch.
+        depths = self._depths
+        depths[indices] = 0
+        pending = parents >= 0
+        while np.any(pending):
+            ready = pending & ~(np.isin(parents, indices[pending]))
+            depths[indices[ready]] = depths[parents[ready]] + 1
+            pending &= ~ready
+        
+        self._levels = None
+        return indices
+    
+    def reparent(self, index, parent):
+        # Refused before anything changes, so a failed reparent leaves the graph as it was.
+        ancestor = parent
+        while ancestor >= 0:
+            if ancestor == index:
+                raise ValueError("Reparenting {} under {} would create a cycle.".format(index, parent))
+            ancestor = self._parents[ancestor]
+        
+        self._parents[index] = parent
+        self._dirty[index] = True
+        self._depths[:self._count] = self._compute_depths()
+        self._levels = None
+    
+    def _compute_depths(self):
+        parents = self._parents[:self._count]
+        result = np.zeros(self._count, dtype=np.int32)
+        current = parents.copy()
+        for _ in range(self._count):
+            mask = current >= 0
+            if not np.any(mask):
+                return result
+            result[mask] += 1
+            current[mask] = parents[current[mask]]
+        raise ValueError("Scene graph contains a cycle.")
+    
+    def _compute_levels(self):
+        depths = self._depths[:self._count]
+        order = np.argsort(depths, kind="stable").astype(np.int32)
+        bounds = np.searchsorted(depths[order], np.arange(int(depths.max()) + 2 if self._count else 1))
+        return [order[lower:upper] for lower, upper in zip(bounds[:-1], bounds[1:])]
+    
+    def set_local(self, index, value):
+        self._locals[index] = value
+        self._dirty[index] = True
+    
+    def mark(self, indices):
+        self._dirty[indices] = True
+    
+    def update(self):
+        dirty = self._dirty[:self._count]
+        if not np.any(dirty):
+            return 0
+        
+        if self._levels is None:
+            self._levels = self._compute_levels()
+        
+        parents = self._parents
+        locals = self._locals
+        worlds = self._worlds
+        
+        result = 0
+        for depth, level in enumerate(self._levels):
+            if depth > 0:
+                dirty[level] |= dirty[parents[level]]
+            indices = level[dirty[level]]
+            if not len(indices):
+                continue
+            if depth > 0:
+                worlds[indices] = np.matmul(locals[indices], worlds[parents[indices]])
+            else:
+                worlds[indices] = locals[indices]
+            result += len(indices)
+        
+        dirty[...] = False
+        return result
+    
+    def __len__(self):
+        return self._count
+    
+    def __str__(self):
+        return "{}({})".format(type(self).__name__, self._count)
@@ -0,0 +1,331 @@
+import logging
+
+import argparse
+import copy
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+from . import osc, transports
+
+_logger = logging.getLogger(__name__.split(".").pop())
+
+DEFAULT_PORT = 9876
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_RESEND = 1.0
+
+CONFIG_VARIABLE = "ENSEMBLE_CONFIG"
+LAUNCHER_VARIABLE = "ENSEMBLE_LAUNCHER"
+
+# Startup phases a node reports, in order.
+CONFIG = "config"
+SHADERS = "shaders"
+CLOCK = "clock"
+READY = "ready"
+
+PHASES = (CONFIG, SHADERS, CLOCK, READY)
+
+_LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def _merge(base, override):
+    result = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = _merge(result[key], value)
+        else:
+            result[key] = copy.deepcopy(value)
+    return result
+
+def node_configs(wall):
+    # Every node gets the shared defaults, its own overrides, and its place in the wall.
+    nodes = wall.get("nodes", [])
+    result = []
+    for index, node in enumerate(nodes):
+        config = _merge(wall.get("defaults", {}), node.get("config", {}))
+        network = config.setdefault("network", {})
+        network.setdefault("node", index)
+        network["nodes"] = len(nodes)
+        network.setdefault("timeserver", index == 0)
+        network.setdefault("synchronise", index != 0)
+        result.append(config)
+    
+    # Reports are keyed by these ids, so two nodes sharing one would be indistinguishable.
+    identifiers = [config["network"]["node"] for config in result]
+    duplicates = sorted({identifier for identifier in identifiers if identifiers.count(identifier) > 1})
+    if duplicates:
+        raise ValueError("Duplicate node ids in the wall: {}".format(duplicates))
+    return result
+
+
+def report_address(hosts):
+    # The address of the interface that routes to the nodes, which the hostname often is not (it
+    # resolves to 127.0.1.1 on many distributions). Connecting a UDP socket sends nothing.
+    remote = [host for host in hosts if host not in _LOCAL_HOSTS]
+    if not remote:
+        return "127.0.0.1"
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.connect((remote[0], DEFAULT_PORT))
+        return sock.getsockname()[0]
+    except OSError as e:
+        _logger.warning("No route to %s (%s); set \"launcher\" in the wall if nodes cannot report back.", remote[0], e)
+        return socket.gethostbyname(socket.gethostname())
+    finally:
+        sock.close()
+
+
+class LocalSpawner(object):
+    def spawn(self, host, command, environment):
+        return subprocess.Popen(command, env=dict(os.environ, **environment))
+
+class SSHSpawner(object):
+    def __init__(self, user=None, options=()):
+        super().__init__()
+        
+        self._user = user
+        self._options = list(options)
+    
+    def spawn(self, host, command, environment):
+        target = host if self._user is None else "{}@{}".format(self._user, host)
+        assignments = ["{}={}".format(key, shlex.quote(value)) for key, value in environment.items()]
+        remote = " ".join(["env"] + assignments + [shlex.quote(arg) for arg in command])
+        return subprocess.Popen(["ssh"] + self._options + [target, remote])
+
+SPAWNERS = {
+    "local": LocalSpawner,
+    "ssh": SSHSpawner,
+}
+
+
+class Reporter(object):
+    def __init__(self, address, node, resend=DEFAULT_RESEND):
+        super().__init__()
+        
+        self._address = address
+        self._node = node
+        self._start = time.perf_counter_ns()
+        self._reported = set()
+        
+        # Reports are datagrams; each is sent again every resend seconds until the launcher acknowledges it.
+        self._resend = resend
+        self._unacknowledged = {}
+        self._next = None
+        
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+    
+    @property
+    def unacknowledged(self):
+        return tuple(self._unacknowledged)
+    
+    def reported(self, phase):
+        return phase in self._reported
+    
+    def _send(self, phase):
+        message = osc.encode_message("/launch/phase", ('i', self._node), ('s', phase), ('h', self._unacknowledged[phase]))
+        try:
+            self._socket.sendto(message, self._address)
+        except OSError as e:
+            _logger.warning("Failed to report %s: %s", phase, e)
+    
+    def report(self, phase):
+        if phase in self._reported:
+            return
+        self._reported.add(phase)
+        self._unacknowledged[phase] = time.perf_counter_ns() - self._start
+        self._send(phase)
+        self._next = time.perf_counter() + self._resend
+    
+    def poll(self):
+        # Called every frame: takes the launcher's acknowledgements, and resends the rest when due.
+        while True:
+            try:
+                data, _ = self._socket.recvfrom(65536)
+            except OSError:
+                break
+            try:
+                path, types, args = osc.decode_message(data)
+            except osc.DecodeError:
+                continue
+            if path == "/launch/ack" and types == "is" and args[0] == self._node:
+                self._unacknowledged.pop(args[1], None)
+        
+        if self._unacknowledged and time.perf_counter() >= self._next:
+            for phase in self._unacknowledged:
+                self._send(phase)
+            self._next = time.perf_counter() + self._resend
+    
+    def finish(self):
+        # Playback has started, so the launcher has stopped waiting for reports.
+        self._unacknowledged.clear()
+    
+    def close(self):
+        self._socket.close()
+
+def reporter(node):
+    # Only nodes started by a launcher report their startup.
+    value = os.environ.get(LAUNCHER_VARIABLE)
+    if not value:
+        return None
+    host, port = value.rsplit(":", 1)
+    return Reporter((host, int(port)), node)
+
+
+class Launcher(object):
+    def __init__(self, wall, spawner=None, host=None, port=DEFAULT_PORT):
+        super().__init__()
+        
+        self._wall = wall
+        self._configs = node_configs(wall)
+        self._spawner = spawner or SPAWNERS[wall.get("spawner", "local")]()
+        self._address = (host or wall.get("launcher") or report_address([node.get("host", "localhost") for node in wall.get("nodes", [])]), port)
+        
+        # Nodes are known by their configured id (network.node), which need not be their index.
+        self._nodes = []
+        self._processes = []
+        self._spawned = {}
+        self._phases = {}
+        
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(("", port))
+    
+    @property
+    def address(self):
+        return self._address
+    
+    @property
+    def processes(self):
+        return self._processes
+    
+    def spawn(self):
+        # Processes start in parallel; Popen returns as soon as each one is running.
+        command = self._wall["command"]
+        for node, config in zip(self._wall["nodes"], self._configs):
+            environment = {
+                CONFIG_VARIABLE: json.dumps(config),
+                LAUNCHER_VARIABLE: "{}:{}".format(*self._address),
+            }
+            environment.update(node.get("environment", {}))
+            identifier = config["network"]["node"]
+            self._nodes.append(identifier)
+            self._spawned[identifier] = time.perf_counter_ns()
+            self._processes.append(self._spawner.spawn(node.get("host", "localhost"), command, environment))
+            self._phases[identifier] = {}
+    
+    def _receive(self, timeout):
+        self._socket.settimeout(timeout)
+        try:
+            data, source = self._socket.recvfrom(65536)
+        except socket.timeout:
+            return
+        arrival = time.perf_counter_ns()
+        try:
+            path, types, args = osc.decode_message(data)
+        except osc.DecodeError:
+            return
+        if path != "/launch/phase" or types != "ish" or args[0] not in self._phases:
+            return
+        node, phase, elapsed = args
+        # Resent reports keep the first arrival; every copy is acknowledged, in case an ack was lost.
+        self._phases[node].setdefault(phase, (elapsed, arrival - self._spawned[node]))
+        try:
+            self._socket.sendto(osc.encode_message("/launch/ack", ('i', node), ('s', phase)), source)
+        except OSError as e:
+            _logger.warning("Failed to acknowledge %s from node %s: %s", phase, node, e)
+    
+    def ready(self):
+        return all(READY in phases for phases in self._phases.values())
+    
+    def wait(self, timeout=DEFAULT_TIMEOUT):
+        deadline = time.perf_counter() + timeout
+        while not self.ready():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            failed = [node for node, process in zip(self._nodes, self._processes) if process.poll() is not None]
+            if failed:
+                _logger.error("Nodes %s exited during startup.", failed)
+                return False
+            self._receive(min(remaining, 0.1))
+        return True
+    
+    def play(self):
+        # The timeserver turns this into a timetagged /play for the whole wall.
+        network = self._configs[0].get("network", {}) if self._configs else {}
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, transports.DEFAULT_TTL)
+        try:
+            sock.sendto(osc.encode_message("/launch/play"), (transports.DEFAULT_GROUP, network.get("port", 1234)))
+        finally:
+            sock.close()
+    
+    def report(self):
+        # Per node: seconds from spawn to the first report, then the duration of each phase.
+        result = {}
+        for node, phases in self._phases.items():
+            timings = {}
+            if CONFIG in phases:
+                timings["process"] = (phases[CONFIG][1] - phases[CONFIG][0]) / 1e9
+            previous = 0
+            for phase in PHASES:
+                if phase not in phases:
+                    break
+                elapsed, arrival = phases[phase]
+                timings[phase] = (elapsed - previous) / 1e9
+                previous = elapsed
+            result[node] = timings
+        return result
+    
+    def terminate(self):
+        for process in self._processes:
+            if process.poll() is None:
+                process.terminate()
+    
+    def close(self):
+        self._socket.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Start every node of a wall and wait until all are ready.")
+    parser.add_argument("wall", help="wall description (JSON)")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT, help="port for readiness reports")
+    parser.add_argument("-t", "--timeout", type=float, default=DEFAULT_TIMEOUT, help="seconds to wait for readiness")
+    parser.add_argument("--no-play", action="store_true", help="do not start playback once ready")
+    options = parser.parse_args(argv)
+    
+    with open(options.wall, "r") as f:
+        wall = json.load(f)
+    
+    launcher = Launcher(wall, port=options.port)
+    launcher.spawn()
+    ready = launcher.wait(options.timeout)
+    
+    for node, timings in sorted(launcher.report().items()):
+        print("node {}: {}".format(node, ", ".join("{} {:.3f}s".format(phase, value) for phase, value in timings.items())))
+    
+    if not ready:
+        print("Wall did not become ready.", file=sys.stderr)
+        launcher.terminate()
+        launcher.close()
+        return 1
+    
+    if not options.no_play:
+        launcher.play()
+    
+    try:
+        for process in launcher.processes:
+            process.wait()
+    except KeyboardInterrupt:
+        launcher.terminate()
+    finally:
+        launcher.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,4 @@
-from . import defaults
+from . import contexts, defaults
 
 def configure(n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    defaults.DEFAULT_DTYPE = dtype
-    defaults.DEFAULT_BASIS = tuple(range(n))
-    defaults.DEFAULT_N = n
+    return contexts.configure(n=n, dtype=dtype)
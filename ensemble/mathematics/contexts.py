@@ -0,0 +1,89 @@
+import threading
+
+import numpy as np
+
+from . import defaults, kernels
+
+_local = threading.local()
+
+
+class Context(object):
+    def __init__(self, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
+        super().__init__()
+        
+        self.n = n
+        self.dtype = np.dtype(dtype).type
+        
+        self._workspace = None
+        self._vector_kernels = {}
+        self._matrix_kernel = None
+    
+    @property
+    def basis(self):
+        return tuple(range(self.n))
+    
+    @property
+    def workspace(self):
+        from . import workspaces
+        if self._workspace is None:
+            self._workspace = workspaces.Workspace(n=self.n, dtype=self.dtype)
+        return self._workspace
+    
+    @property
+    def matrix_kernel(self):
+        if self._matrix_kernel is None:
+            self._matrix_kernel = kernels.matrix_kernel(self.n, self.dtype)
+        return self._matrix_kernel
+    
+    def vector_kernel(self, i):
+        try:
+            return self._vector_kernels[i]
+        except KeyError:
+            result = self._vector_kernels[i] = kernels.vector_kernel(i, self.n, self.dtype)
+            return result
+    
+    def matches(self, n, dtype):
+        return n == self.n and dtype is self.dtype
+    
+    def __enter__(self):
+        _stack().append(self)
+        return self
+    
+    def __exit__(self, *args):
+        _stack().pop()
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, self.n, np.dtype(self.dtype).name)
+
+def _stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+def _default():
+    # Each thread has its own default, so neither configure() nor the workspace is shared between threads.
+    try:
+        return _local.default
+    except AttributeError:
+        _local.default = Context()
+        return _local.default
+
+def configure(n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
+    _local.default = Context(n=n, dtype=dtype)
+    return _local.default
+
+def current():
+    stack = _stack()
+    return stack[-1] if stack else _default()
+
+def resolve(n=None, dtype=None, context=None):
+    if n is None or dtype is None:
+        if context is None:
+            context = current()
+        if n is None:
+            n = context.n
+        if dtype is None:
+            dtype = context.dtype
+    return n, dtype
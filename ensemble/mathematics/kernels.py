@@ -0,0 +1,176 @@
+import os
+import logging
+
+import hashlib
+import importlib.util
+import marshal
+import threading
+
+import numpy as np
+
+from . import rotations
+
+_logger = logging.getLogger(__name__.split(".").pop())
+
+VERSION = 1
+
+MAX_N = 8
+
+CACHE_PATH = os.environ.get("ENSEMBLE_KERNEL_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "ensemble", "kernels"))
+
+_kernels = {}
+_lock = threading.Lock()
+
+
+def _generate(name, planes, n):
+    # Unrolls the Givens updates of rotations.rotate into straight-line scalar code,
+    # folding the zeros and ones of the identity the rotation starts from.
+    lines = []
+    m = [[1 if r == c else 0 for c in range(n)] for r in range(n)]
+    
+    def term(x, y):
+        if x == 0 or y == 0:
+            return None
+        if x == 1:
+            return y
+        if y == 1:
+            return x
+        return "{}*{}".format(x, y)
+    
+    def assign(expression):
+        name = "t{}".format(len(lines))
+        lines.append("    {} = {}".format(name, expression))
+        return name
+    
+    def combine(a, b, sign):
+        if a is None and b is None:
+            return 0
+        if b is None:
+            return a if "*" not in a else assign(a)
+        if a is None:
+            return assign(("-" if sign < 0 else "") + b)
+        return assign("{} {} {}".format(a, "-" if sign < 0 else "+", b))
+    
+    for k, (i, j, _) in reversed(list(enumerate(planes))):
+        s, c = "s{}".format(k), "c{}".format(k)
+        mi, mj = m[i], m[j]
+        m[i] = [combine(term(c, x), term(s, y), +1) for x, y in zip(mi, mj)]
+        m[j] = [combine(term(c, y), term(s, x), -1) for x, y in zip(mi, mj)]
+    
+    rows = ", ".join("({},)".format(", ".join(str(value) for value in row)) for row in m)
+    header = ["def {}(s, c):".format(name)]
+    if planes:
+        header.append("    {}, = s".format(", ".join("s{}".format(k) for k in range(len(planes)))))
+        header.append("    {}, = c".format(", ".join("c{}".format(k) for k in range(len(planes)))))
+    return "\n".join(header + lines + ["    return ({},)".format(rows), ""])
+
+def _cache_file(name, source):
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_PATH, "{}-{}.bin".format(name, digest))
+
+def _header():
+    return importlib.util.MAGIC_NUMBER + VERSION.to_bytes(4, "little")
+
+def _load_code(path):
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    header = _header()
+    if not data.startswith(header):
+        return None
+    try:
+        return marshal.loads(data[len(header):])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+def _save_code(path, code):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp, "wb") as f:
+            f.write(_header() + marshal.dumps(code))
+        os.replace(temp, path)
+    except OSError as e:
+        _logger.warning("Failed to cache kernel %s: %s", path, e)
+
+def _compile(name, planes, n):
+    source = _generate(name, planes, n)
+    path = _cache_file(name, source)
+    code = _load_code(path)
+    if code is None:
+        code = compile(source, "<{}>".format(name), "exec")
+        _save_code(path, code)
+    namespace = {}
+    exec(code, namespace)
+    return namespace[name]
+
+def _get(key, name, planes, n, indices, dtype):
+    try:
+        return _kernels[key]
+    except KeyError:
+        pass
+    with _lock:
+        if key not in _kernels:
+            _kernels[key] = Kernel(_compile(name, planes, n), indices, n, dtype)
+        return _kernels[key]
+
+
+class Kernel(object):
+    def __init__(self, function, indices, n, dtype):
+        super().__init__()
+        
+        self._function = function
+        self._indices = indices
+        
+        # The same angles as positions in the flattened angle vector or matrix, which lets a single
+        # rotation gather them into a workspace without temporaries.
+        self._dims = len(indices) - 1
+        self._flat = np.ravel_multi_index(indices[1:], (n, n)) if self._dims == 2 else indices[1]
+        
+        self.n = n
+        self.dtype = dtype
+    
+    def __call__(self, angles, out, workspace=None):
+        n = self.n
+        if workspace is not None and angles.ndim == self._dims:
+            # The unrolled code still creates (and frees) Python floats; no arrays are allocated.
+            # Batches take the path below, which allocates its intermediate arrays.
+            k = len(self._flat)
+            values = workspace.cosines.reshape(-1)[:k]
+            sines = workspace.sines.reshape(-1)[:k]
+            np.take(angles.reshape(-1), self._flat, out=values, mode="clip")
+            np.sin(values, out=sines)
+            np.cos(values, out=values)
+            out[:n, :n] = self._function(sines.tolist(), values.tolist())
+            return out
+        values = angles[self._indices]
+        if values.ndim == 1:
+            out[:n, :n] = self._function(np.sin(values).tolist(), np.cos(values).tolist())
+        else:
+            values = np.moveaxis(values, -1, 0).astype(self.dtype, copy=False)
+            rows = self._function(np.sin(values), np.cos(values))
+            for r, row in enumerate(rows):
+                for c, value in enumerate(row):
+                    out[..., r, c] = value
+        return out
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, self.n, np.dtype(self.dtype).name)
+
+def vector_kernel(i, n, dtype):
+    key = ("vector", i, n, np.dtype(dtype).name)
+    if key in _kernels:
+        return _kernels[key]
+    planes = rotations.vector_planes(i, n)
+    indices = (Ellipsis, np.array([k[0] for _, _, k in planes], dtype=np.intp))
+    return _get(key, "rotate_euler_angles_vector_{}_{}".format(i, n), planes, n, indices, dtype)
+
+def matrix_kernel(n, dtype):
+    key = ("matrix", n, np.dtype(dtype).name)
+    if key in _kernels:
+        return _kernels[key]
+    planes = rotations.matrix_planes(n)
+    indices = (Ellipsis,) + np.triu_indices(n, 1)
+    return _get(key, "rotate_euler_angles_matrix_{}".format(n), planes, n, indices, dtype)
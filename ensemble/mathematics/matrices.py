@@ -1,24 +1,35 @@
 from __future__ import print_function
 
-import functools as ft
-import itertools as it
-
 import numpy as np
 
-from . import defaults
+from . import contexts, kernels, rotations, workspaces
 
 
-def zeros(n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    return np.zeros((n,n), dtype=dtype)
+def zeros(n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    if out is None:
+        return np.zeros((n,n), dtype=dtype)
+    out[...] = 0
+    return out
 
-def ones(n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    return np.ones((n,n), dtype=dtype)
+def ones(n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    if out is None:
+        return np.ones((n,n), dtype=dtype)
+    out[...] = 1
+    return out
 
-def identity(n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    return np.identity(n+1, dtype=dtype)
+def identity(n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    if out is None:
+        return np.identity(n+1, dtype=dtype)
+    out[...] = 0
+    np.fill_diagonal(out, 1)
+    return out
 
-def matrix(m, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    result = np.zeros(n, dtype=dtype)
+def matrix(m, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    result = zeros(n=n, dtype=dtype, out=out)
     l0, u0 = 0, min(n, m.shape[0])
     l1, u1 = 0, min(n, m.shape[1])
     result[l0:u0, l1:u1] = m[l0:u0, l1:u1]
@@ -36,20 +47,23 @@ def direct_sum(m0, m1):
     result[m0.shape[0]:,m0.shape[1]:] = m1
     return result
 
-def translate(v, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    result = identity(n=n, dtype=dtype)
+def translate(v, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    result = identity(n=n, dtype=dtype, out=out)
     for i in range(min(n, len(v))):
         result[-1, i] = v[i]
     return result
 
-def scale(v, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    result = identity(n=n, dtype=dtype)
+def scale(v, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    result = identity(n=n, dtype=dtype, out=out)
     for i in range(min(n, len(v))):
         result[i, i] = v[i]
     return result
 
-def rotate_sa_ca_i_j(sa, ca, i, j, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    result = identity(n=n, dtype=dtype)
+def rotate_sa_ca_i_j(sa, ca, i, j, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    result = identity(n=n, dtype=dtype, out=out)
     
     if i != j:
         result[i, i] = ca
@@ -59,32 +73,140 @@ def rotate_sa_ca_i_j(sa, ca, i, j, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_
     
     return result
 
-def rotate_a_i_j(a, i, j, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
+def rotate_a_i_j(a, i, j, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
     sa = np.sin(a)
     ca = np.cos(a)
-    return rotate_sa_ca_i_j(sa, ca, i, j, n=n, dtype=dtype)
+    return rotate_sa_ca_i_j(sa, ca, i, j, n=n, dtype=dtype, out=out)
+
+def product(ms, out=None, work=None):
+    ms = iter(ms)
+    first = next(ms)
+    if work is None:
+        work = np.empty((2,) + first.shape, dtype=first.dtype)
+    current, other = work[0], work[1]
+    current[...] = first
+    for m in ms:
+        np.dot(current, m, out=other)
+        current, other = other, current
+    if out is None:
+        return current.copy()
+    out[...] = current
+    return out
+
+def _identity(shape, n, dtype, out=None):
+    if shape:
+        return identity_batch(shape[0], n=n, dtype=dtype, out=out)
+    return identity(n=n, dtype=dtype, out=out)
+
+def _workspace(shape, n, dtype, workspace, context, create=True):
+    if workspace is not None:
+        return workspace
+    if not shape and context is not None and context.matches(n, dtype):
+        return context.workspace
+    if not create:
+        return None
+    return workspaces.Workspace(n=n, dtype=dtype, count=(shape[0] if shape else None))
+
+def _vector_kernel(i, n, dtype, context):
+    if context is not None and context.matches(n, dtype):
+        return context.vector_kernel(i)
+    return kernels.vector_kernel(i, n, dtype)
+
+def _matrix_kernel(n, dtype, context):
+    if context is not None and context.matches(n, dtype):
+        return context.matrix_kernel
+    return kernels.matrix_kernel(n, dtype)
 
-def rotate_euler_angles_vector(v, i=0, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    sa = np.sin(v)
-    ca = np.cos(v)
-    ms = (rotate_sa_ca_i_j(sa[j], ca[j], i, j, n=n, dtype=dtype) for j in range(n))
-    #ms = (rotate_sa_ca_i_j(sa[i], ca[i], index[0], index[1], n=n, dtype=dtype) for i, index in enumerate(it.combinations(range(n), 2)))
-    return ft.reduce(np.dot, ms)
+def rotate_euler_angles_vector(v, i=0, n=None, dtype=None, out=None, workspace=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    result = _identity(v.shape[:-1], n, dtype, out=out)
+    if n <= kernels.MAX_N:
+        return _vector_kernel(i, n, dtype, context)(v, result, _workspace(v.shape[:-1], n, dtype, workspace, context, create=False))
+    workspace = _workspace(v.shape[:-1], n, dtype, workspace, context)
+    sa = np.sin(v, out=workspace.sines[..., 0, :])
+    ca = np.cos(v, out=workspace.cosines[..., 0, :])
+    return rotations.rotate(result, sa, ca, rotations.vector_planes(i, n), workspace.rows)
 
-def _rotate_euler_angles_matrix(m, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    sa = np.sin(m)
-    ca = np.cos(m)
-    ms = (rotate_sa_ca_i_j(sa[i,j], ca[i,j], i, j, n=n, dtype=dtype) for i, j in it.combinations(range(n), 2))
-    return ft.reduce(np.dot, ms)
+def _rotate_euler_angles_matrix(m, n=None, dtype=None, out=None, workspace=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    result = _identity(m.shape[:-2], n, dtype, out=out)
+    if n <= kernels.MAX_N:
+        return _matrix_kernel(n, dtype, context)(m, result, _workspace(m.shape[:-2], n, dtype, workspace, context, create=False))
+    workspace = _workspace(m.shape[:-2], n, dtype, workspace, context)
+    sa = np.sin(m, out=workspace.sines)
+    ca = np.cos(m, out=workspace.cosines)
+    return rotations.rotate(result, sa, ca, rotations.matrix_planes(n), workspace.rows)
 
-def rotate_euler_angles_matrix_upper(m, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    return _rotate_euler_angles_matrix(m, n=n, dtype=dtype)
+def rotate_euler_angles_matrix_upper(m, n=None, dtype=None, out=None, workspace=None, context=None):
+    return _rotate_euler_angles_matrix(m, n=n, dtype=dtype, out=out, workspace=workspace, context=context)
 
-def rotate_euler_angles_matrix_lower(m, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    return _rotate_euler_angles_matrix(-m.T, n=n, dtype=dtype)
+def rotate_euler_angles_matrix_lower(m, n=None, dtype=None, out=None, workspace=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    if workspace is None and context is None:
+        return _rotate_euler_angles_matrix(-transposed(m), n=n, dtype=dtype, out=out)
+    workspace = _workspace(m.shape[:-2], n, dtype, workspace, context)
+    # Ufuncs buffer strided (transposed) operands; copying the transpose first avoids that.
+    angles = workspace.angles
+    np.copyto(angles, transposed(m))
+    np.negative(angles, out=angles)
+    return _rotate_euler_angles_matrix(angles, n=n, dtype=dtype, out=out, workspace=workspace, context=context)
 
-def rotate_euler_angles_matrix(m, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    return _rotate_euler_angles_matrix(m - m.T, n=n, dtype=dtype)
+def rotate_euler_angles_matrix(m, n=None, dtype=None, out=None, workspace=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    if workspace is None and context is None:
+        return _rotate_euler_angles_matrix(m - transposed(m), n=n, dtype=dtype, out=out)
+    workspace = _workspace(m.shape[:-2], n, dtype, workspace, context)
+    angles = workspace.angles
+    np.copyto(angles, transposed(m))
+    np.subtract(m, angles, out=angles)
+    return _rotate_euler_angles_matrix(angles, n=n, dtype=dtype, out=out, workspace=workspace, context=context)
+
+
+def identity_batch(count, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    result = np.empty((count, n+1, n+1), dtype=dtype) if out is None else out
+    result[...] = 0
+    diagonal = np.arange(n+1)
+    result[:, diagonal, diagonal] = 1
+    return result
+
+def translate_batch(vs, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    vs = np.asarray(vs)
+    result = identity_batch(vs.shape[0], n=n, dtype=dtype, out=out)
+    k = min(n, vs.shape[1])
+    result[:, -1, :k] = vs[:, :k]
+    return result
+
+def scale_batch(vs, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    vs = np.asarray(vs)
+    result = identity_batch(vs.shape[0], n=n, dtype=dtype, out=out)
+    k = min(n, vs.shape[1])
+    diagonal = np.arange(k)
+    result[:, diagonal, diagonal] = vs[:, :k]
+    return result
+
+def rotate_sa_ca_i_j_batch(sa, ca, i, j, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    sa = np.asarray(sa)
+    ca = np.asarray(ca)
+    result = identity_batch(sa.shape[0], n=n, dtype=dtype, out=out)
+    
+    if i != j:
+        result[:, i, i] = ca
+        result[:, i, j] = +sa
+        result[:, j, i] = -sa
+        result[:, j, j] = ca
+    
+    return result
+
+def rotate_a_i_j_batch(a, i, j, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    sa = np.sin(a)
+    ca = np.cos(a)
+    return rotate_sa_ca_i_j_batch(sa, ca, i, j, n=n, dtype=dtype, out=out)
 
 
 def inversed(m):
@@ -94,7 +216,7 @@ def inversed(m):
         return np.zeros_like(m)
 
 def transposed(m):
-    return np.transpose(m)
+    return np.swapaxes(m, -1, -2)
 
 
 '''
@@ -0,0 +1,37 @@
+import functools as ft
+import itertools as it
+
+import numpy as np
+
+
+@ft.lru_cache(maxsize=None)
+def vector_planes(i, n):
+    return tuple((i, j, (j,)) for j in range(n) if j != i)
+
+@ft.lru_cache(maxsize=None)
+def matrix_planes(n):
+    return tuple((i, j, (i, j)) for i, j in it.combinations(range(n), 2))
+
+def givens(m, sa, ca, i, j, rows):
+    # Left-multiplies m by the plane rotation (i, j) in place, touching rows i and j only.
+    mi = m[..., i, :]
+    mj = m[..., j, :]
+    ri, rj = rows[0], rows[1]
+    
+    np.multiply(mi, ca, out=ri)
+    np.multiply(mj, sa, out=rj)
+    np.add(ri, rj, out=ri)
+    
+    np.multiply(mj, ca, out=rj)
+    np.multiply(mi, sa, out=mi)
+    np.subtract(rj, mi, out=mj)
+    
+    mi[...] = ri
+    return m
+
+def rotate(m, sa, ca, planes, rows):
+    # Accumulates R(p0) R(p1) ... R(pk) into m by applying the planes right to left.
+    for i, j, k in reversed(planes):
+        k = (Ellipsis,) + k + (None,)
+        givens(m, sa[k], ca[k], i, j, rows)
+    return m
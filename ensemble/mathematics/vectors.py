@@ -5,22 +5,32 @@ import itertools as it
 
 import numpy as np
 
-from . import defaults
-
-
-def zeros(n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    return np.zeros(n, dtype=dtype)
-
-def ones(n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    return np.ones(n, dtype=dtype)
-
-def unit(i, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    result = np.zeros(n, dtype=dtype)
+from . import contexts
+
+
+def zeros(n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    if out is None:
+        return np.zeros(n, dtype=dtype)
+    out[...] = 0
+    return out
+
+def ones(n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    if out is None:
+        return np.ones(n, dtype=dtype)
+    out[...] = 1
+    return out
+
+def unit(i, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    result = zeros(n=n, dtype=dtype, out=out)
     result[i] = 1
     return result
 
-def vector(v, n=defaults.DEFAULT_N, dtype=defaults.DEFAULT_DTYPE):
-    result = np.zeros(n, dtype=dtype)
+def vector(v, n=None, dtype=None, out=None, context=None):
+    n, dtype = contexts.resolve(n, dtype, context)
+    result = zeros(n=n, dtype=dtype, out=out)
     l0, u0 = 0, min(n, v.shape[0])
     result[l0:u0] = v[l0:u0]
     return result
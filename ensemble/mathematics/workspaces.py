@@ -0,0 +1,25 @@
+import numpy as np
+
+from . import contexts
+
+
+class Workspace(object):
+    def __init__(self, n=None, dtype=None, count=None):
+        super().__init__()
+        
+        n, dtype = contexts.resolve(n, dtype)
+        
+        self.n = n
+        self.dtype = dtype
+        self.count = count
+        
+        shape = () if count is None else (count,)
+        
+        self.angles = np.empty(shape + (n, n), dtype=dtype)
+        self.sines = np.empty(shape + (n, n), dtype=dtype)
+        self.cosines = np.empty(shape + (n, n), dtype=dtype)
+        
+        self.rows = np.empty((2,) + shape + (n+1,), dtype=dtype)
+    
+    def __str__(self):
+        return "{}({},{},{})".format(type(self).__name__, self.n, np.dtype(self.dtype).name, self.count)
@@ -0,0 +1,158 @@
+import logging
+
+import json
+import os
+import random
+import threading
+
+import numpy as np
+
+_logger = logging.getLogger(__name__.split(".").pop())
+
+DEFAULT_WINDOW = 256
+DEFAULT_PERCENTILES = (50, 95, 99, 100)
+
+
+def percentiles(values, quantiles=DEFAULT_PERCENTILES):
+    # Summary of a history for stats(): {"p50": ..., "max": ...}, or None while it is empty.
+    if not len(values):
+        return None
+    names = ["max" if q == 100 else "p{}".format(q) for q in quantiles]
+    return dict(zip(names, np.percentile(np.array(values, dtype=np.float64), quantiles).tolist()))
+
+
+class Peer(object):
+    def __init__(self, window=DEFAULT_WINDOW, session=None):
+        super().__init__()
+        
+        # Fixed-size rings, so the cost per message and the memory per peer are bounded.
+        self._window = window
+        self._seen = np.zeros(window, dtype=np.bool_)
+        self._delays = np.zeros(window, dtype=np.int64)
+        
+        self._restarts = 0
+        self._reset(session)
+    
+    @property
+    def session(self):
+        return self._session
+    
+    def _reset(self, session):
+        self._session = session
+        self._seen[...] = False
+        
+        self._first = None
+        self._highest = None
+        self._count = 0
+        self._late = 0
+        self._duplicates = 0
+        
+        self._transit = None
+        self._jitter = 0.0
+        
+        self._received_ns = None
+    
+    def restart(self, session):
+        # The peer restarted and numbers its messages from 1 again, so nothing recorded before compares.
+        self._restarts += 1
+        self._reset(session)
+    
+    def received(self, sequence, sent_ns, received_ns):
+        window = self._window
+        
+        if self._highest is None:
+            self._first = self._highest = sequence
+        elif sequence > self._highest:
+            # Slots between the previous and the new highest sequence are now expected but unseen.
+            gap = min(sequence - self._highest, window)
+            indices = np.arange(sequence - gap + 1, sequence + 1) % window
+            self._seen[indices] = False
+            self._highest = sequence
+        elif sequence <= self._highest - window:
+            self._late += 1
+            return
+        elif self._seen[sequence % window]:
+            self._duplicates += 1
+            return
+        else:
+            self._late += 1
+        
+        self._seen[sequence % window] = True
+        self._delays[self._count % window] = received_ns - sent_ns
+        self._count += 1
+        self._received_ns = received_ns
+        
+        # Interarrival jitter as in RFC 3550, smoothed over 16 packets.
+        transit = received_ns - sent_ns
+        if self._transit is not None:
+            self._jitter += (abs(transit - self._transit) - self._jitter) / 16.0
+        self._transit = transit
+    
+    def stats(self):
+        expected = min(self._highest - self._first + 1, self._window) if self._highest is not None else 0
+        received = int(np.count_nonzero(self._seen)) if expected else 0
+        delays = self._delays[:min(self._count, self._window)]
+        return {
+            "sequence": self._highest,
+            "received": self._count,
+            "late": self._late,
+            "duplicates": self._duplicates,
+            "restarts": self._restarts,
+            "loss": (1.0 - received / expected) if expected else 0.0,
+            "jitter_ns": self._jitter,
+            "delay_ns": percentiles(delays, (50, 95, 100)),
+            "last_ns": self._received_ns,
+        }
+
+
+class Monitor(object):
+    def __init__(self, window=DEFAULT_WINDOW):
+        super().__init__()
+        
+        # Messages are recorded on the network thread and read on the render thread.
+        self._window = window
+        
+        self._lock = threading.Lock()
+        self._peers = {}
+        self._sequence = 0
+        # Sent with every message, so peers can tell a restart from a burst of late messages.
+        self._session = random.getrandbits(31)
+    
+    @property
+    def session(self):
+        return self._session
+    
+    def sequence(self):
+        # Sequence number for the next outgoing message.
+        self._sequence += 1
+        return self._sequence
+    
+    def received(self, peer, session, sequence, sent_ns, received_ns):
+        # One-way delay assumes the sender's clock is synchronised with ours.
+        with self._lock:
+            try:
+                metrics = self._peers[peer]
+            except KeyError:
+                metrics = self._peers[peer] = Peer(self._window, session)
+            if metrics.session != session:
+                metrics.restart(session)
+            metrics.received(sequence, sent_ns, received_ns)
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "sent": self._sequence,
+                "peers": {str(peer): metrics.stats() for peer, metrics in self._peers.items()},
+            }
+    
+    def reset(self):
+        with self._lock:
+            self._peers.clear()
+
+
+def dump(path, stats):
+    # Written to a temporary file and renamed, so readers never see a partial file.
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(stats, f, indent=2, sort_keys=True)
+    os.replace(temporary, path)
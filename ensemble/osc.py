@@ -0,0 +1,153 @@
+import struct
+
+_INT32 = struct.Struct(">i")
+_INT64 = struct.Struct(">q")
+_FLOAT32 = struct.Struct(">f")
+_FLOAT64 = struct.Struct(">d")
+_TIMETAG = struct.Struct(">II")
+
+_FRACTION = 4294967296.0
+
+_BUNDLE = b"#bundle\0"
+
+
+class DecodeError(ValueError):
+    pass
+
+
+def _pad(data):
+    return data + b"\0" * (-len(data) % 4)
+
+def _string(value):
+    return _pad(value.encode("utf-8") + b"\0")
+
+def _blob(value):
+    return _INT32.pack(len(value)) + _pad(bytes(value))
+
+def encode_timetag(value):
+    # Seconds as a float, split into the 32.32 fixed point of an OSC timetag (as liblo does).
+    if value is None:
+        return _TIMETAG.pack(0, 1)
+    seconds = int(value // 1)
+    fraction = int((value - seconds) * _FRACTION)
+    return _TIMETAG.pack(seconds & 0xFFFFFFFF, min(fraction, 0xFFFFFFFF))
+
+def decode_timetag(data, offset=0):
+    seconds, fraction = _TIMETAG.unpack_from(data, offset)
+    if seconds == 0 and fraction == 1:
+        return None
+    return seconds + fraction / _FRACTION
+
+def _infer(value):
+    if isinstance(value, bool):
+        return "T" if value else "F"
+    if isinstance(value, int):
+        return "i" if -2**31 <= value < 2**31 else "h"
+    if isinstance(value, float):
+        return "f"
+    if isinstance(value, str):
+        return "s"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "b"
+    if value is None:
+        return "N"
+    raise TypeError("Cannot infer OSC type for {!r}".format(value))
+
+_ENCODERS = {
+    "i": lambda value: _INT32.pack(int(value)),
+    "h": lambda value: _INT64.pack(int(value)),
+    "f": lambda value: _FLOAT32.pack(float(value)),
+    "d": lambda value: _FLOAT64.pack(float(value)),
+    "s": _string,
+    "S": _string,
+    "b": _blob,
+    "t": encode_timetag,
+    "T": lambda value: b"",
+    "F": lambda value: b"",
+    "N": lambda value: b"",
+    "I": lambda value: b"",
+}
+
+def encode_message(path, *args):
+    # Arguments are either plain values or liblo-style (typetag, value) tuples.
+    types = [","]
+    payload = []
+    for arg in args:
+        if isinstance(arg, tuple) and len(arg) == 2 and isinstance(arg[0], str):
+            typetag, value = arg
+        else:
+            typetag, value = _infer(arg), arg
+        types.append(typetag)
+        payload.append(_ENCODERS[typetag](value))
+    return b"".join([_string(path), _string("".join(types))] + payload)
+
+def encode_bundle(timetag, *messages):
+    # Messages are either encoded packets or (path, *args) tuples; a timetag of None means immediately.
+    payload = [_BUNDLE, encode_timetag(timetag)]
+    for message in messages:
+        if not isinstance(message, (bytes, bytearray)):
+            message = encode_message(*message)
+        payload.append(_INT32.pack(len(message)))
+        payload.append(bytes(message))
+    return b"".join(payload)
+
+def _read_string(data, offset):
+    end = data.find(b"\0", offset)
+    if end < 0:
+        raise DecodeError("Unterminated OSC string.")
+    value = bytes(data[offset:end]).decode("utf-8")
+    return value, (end + 4) & ~3
+
+def _read_blob(data, offset):
+    size, = _INT32.unpack_from(data, offset)
+    offset += 4
+    return bytes(data[offset:offset + size]), offset + ((size + 3) & ~3)
+
+_DECODERS = {
+    "i": lambda data, offset: (_INT32.unpack_from(data, offset)[0], offset + 4),
+    "h": lambda data, offset: (_INT64.unpack_from(data, offset)[0], offset + 8),
+    "f": lambda data, offset: (_FLOAT32.unpack_from(data, offset)[0], offset + 4),
+    "d": lambda data, offset: (_FLOAT64.unpack_from(data, offset)[0], offset + 8),
+    "s": _read_string,
+    "S": _read_string,
+    "b": _read_blob,
+    "t": lambda data, offset: (decode_timetag(data, offset), offset + 8),
+    "T": lambda data, offset: (True, offset),
+    "F": lambda data, offset: (False, offset),
+    "N": lambda data, offset: (None, offset),
+    "I": lambda data, offset: (float("inf"), offset),
+}
+
+def decode_message(data):
+    try:
+        path, offset = _read_string(data, 0)
+        types, offset = _read_string(data, offset)
+        if not types.startswith(","):
+            raise DecodeError("Missing OSC typetag string.")
+        types = types[1:]
+        args = []
+        for typetag in types:
+            value, offset = _DECODERS[typetag](data, offset)
+            args.append(value)
+    except (KeyError, struct.error, UnicodeDecodeError) as e:
+        raise DecodeError(str(e))
+    return path, types, args
+
+def decode_packet(data, timetag=None):
+    # Flattens (possibly nested) bundles into a list of (timetag, path, types, args).
+    if bytes(data[:8]) != _BUNDLE:
+        return [(timetag,) + decode_message(data)]
+    try:
+        timetag = decode_timetag(data, 8)
+        result = []
+        offset = 16
+        while offset < len(data):
+            size, = _INT32.unpack_from(data, offset)
+            offset += 4
+            if size < 0 or offset + size > len(data):
+                raise DecodeError("Truncated OSC bundle element.")
+            result.extend(decode_packet(data[offset:offset + size], timetag))
+            offset += size
+    except struct.error as e:
+        raise DecodeError(str(e))
+    return result
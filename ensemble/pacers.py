@@ -0,0 +1,126 @@
+import collections
+import math
+
+import numpy as np
+
+from . import timers
+
+DEFAULT_HISTORY = 120
+DEFAULT_MARGIN = 1500000
+DEFAULT_PERCENTILE = 95
+
+
+class FramePacer(object):
+    def __init__(self, clock, frames_per_second=timers.DEFAULT_FRAMES_PER_SECOND, history=DEFAULT_HISTORY, margin=DEFAULT_MARGIN, percentile=DEFAULT_PERCENTILE):
+        super().__init__()
+        
+        self._clock = clock
+        
+        self._period = timers.NANOSECONDS_PER_SECOND / frames_per_second
+        self._phase = None
+        
+        self._margin = margin
+        self._percentile = percentile
+        
+        self._presents = collections.deque(maxlen=history)
+        self._durations = collections.deque(maxlen=history)
+        
+        self._begin = None
+        self._predicted = None
+    
+    @property
+    def clock(self):
+        return self._clock
+    
+    @property
+    def period_ns(self):
+        return self._period
+    
+    @property
+    def phase_ns(self):
+        return self._phase
+    
+    @property
+    def predicted_ns(self):
+        return self._predicted
+    
+    @property
+    def estimate_ns(self):
+        # A high percentile of recent update+render durations, so occasional spikes do not miss the deadline.
+        if not self._durations:
+            return 0
+        return int(np.percentile(np.array(self._durations, dtype=np.float64), self._percentile))
+    
+    def _fit(self):
+        # Least-squares fit of present times to t = phase + period*k over integer refresh counts k.
+        presents = np.array(self._presents, dtype=np.int64)
+        relative = (presents - presents[-1]).astype(np.float64)
+        counts = np.round(relative / self._period)
+        if len(presents) >= 3 and np.ptp(counts) > 0:
+            count_mean = counts.mean()
+            time_mean = relative.mean()
+            variance = np.dot(counts - count_mean, counts - count_mean)
+            self._period = float(np.dot(counts - count_mean, relative - time_mean) / variance)
+            offset = time_mean - self._period*count_mean
+        else:
+            offset = 0.0
+        self._phase = int(presents[-1] + offset)
+    
+    def presented(self, time=None):
+        time = self._clock.time_ns if time is None else time
+        if self._presents and time <= self._presents[-1]:
+            return
+        self._presents.append(time)
+        self._fit()
+    
+    def deadline(self, time):
+        # The first refresh that a frame starting at time can make, given the render estimate.
+        ready = time + self.estimate_ns + self._margin
+        if self._phase is None:
+            return ready
+        count = math.ceil((ready - self._phase) / self._period)
+        return self._phase + int(count*self._period)
+    
+    def delay(self, time=None):
+        time = self._clock.time_ns if time is None else time
+        if self._phase is None:
+            return 0
+        start = self.deadline(time) - self.estimate_ns - self._margin
+        return max(0, start - time)
+    
+    def begin(self, time=None):
+        time = self._clock.time_ns if time is None else time
+        self._begin = time
+        self._predicted = self.deadline(time)
+        return self._predicted
+    
+    def end(self, time=None):
+        time = self._clock.time_ns if time is None else time
+        if self._begin is not None:
+            self._durations.append(time - self._begin)
+            self._begin = None
+    
+    def __str__(self):
+        return "{}({:.3f},{})".format(type(self).__name__, self._period / 1e6, self.estimate_ns)
+
+
+class PacedClock(object):
+    def __init__(self, pacer):
+        super().__init__()
+        
+        self._pacer = pacer
+    
+    @property
+    def time_ns(self):
+        predicted = self._pacer.predicted_ns
+        return self._pacer.clock.time_ns if predicted is None else predicted
+    
+    @property
+    def time(self):
+        return timers.to_seconds(self.time_ns)
+    
+    def tick(self):
+        self._pacer.clock.tick()
+    
+    def __str__(self):
+        return "{}({})".format(type(self).__name__, self.time)
@@ -0,0 +1,274 @@
+import logging
+
+import hashlib
+import os
+import struct
+import threading
+
+import numpy as np
+
+from . import applications
+
+_logger = logging.getLogger(__name__.split(".").pop())
+
+EXTENSION = ".bin"
+
+_HEADER = struct.Struct("<4sI")
+_MAGIC = b"ENSP"
+
+_caches = {}
+
+
+def cache_path(*paths):
+    return applications.data_path("cache", "programs", *paths)
+
+def key(sources, driver=""):
+    # Everything that decides whether a stored binary still matches: the sources and the driver
+    # that produced the binary.
+    result = hashlib.sha256()
+    for source in sources:
+        result.update(source.encode("utf-8") if isinstance(source, str) else source)
+        result.update(b"\0")
+    result.update(driver.encode("utf-8"))
+    return result.hexdigest()
+
+
+class GLBackend(object):
+    def __init__(self):
+        super().__init__()
+        
+        from glue import gl
+        from glue.gl import GL, utilities
+        
+        self._gl = gl
+        self._GL = GL
+        self._utilities = utilities
+    
+    def driver(self):
+        GL = self._GL
+        return "\n".join(GL.glGetString(name).decode("utf-8", "replace") for name in (GL.GL_VENDOR, GL.GL_RENDERER, GL.GL_VERSION))
+    
+    # Compiling goes through glue's load_program, as scenes always did. The binary path assumes
+    # glue programs expose their GL name as .handle and that gl.Program(uniforms=...) sets up the
+    # same uniforms mapping load_program does; neither could be confirmed against glue, so
+    # ProgramCache falls back to compiling from source whenever it fails.
+    def compile(self, paths, uniforms):
+        return self._utilities.load_program(paths, uniforms=uniforms)
+    
+    def binary(self, program):
+        # glue links compiled programs itself, so the retrievable hint cannot be set before that
+        # link; drivers that need it report a zero length and nothing is stored.
+        GL = self._GL
+        length = GL.glGetProgramiv(program.handle, GL.GL_PROGRAM_BINARY_LENGTH)
+        if not length:
+            return None
+        data = np.empty(length, dtype=np.uint8)
+        written = GL.GLsizei(0)
+        format = GL.GLenum(0)
+        GL.glGetProgramBinary(program.handle, length, written, format, data)
+        return int(format.value), data[:written.value].tobytes()
+    
+    def link(self, format, binary, uniforms):
+        GL = self._GL
+        program = self._gl.Program(uniforms=uniforms).create()
+        # Set before linking, so a program linked from a binary can hand its binary back in turn.
+        GL.glProgramParameteri(program.handle, GL.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL.GL_TRUE)
+        GL.glProgramBinary(program.handle, format, binary, len(binary))
+        # A binary that links but lacks a declared uniform is as good as rejected.
+        if GL.glGetProgramiv(program.handle, GL.GL_LINK_STATUS) != GL.GL_TRUE or any(GL.glGetUniformLocation(program.handle, name) < 0 for name in (uniforms or {})):
+            program.delete()
+            return None
+        return program
+
+class NullBackend(object):
+    def __init__(self, driver="null"):
+        super().__init__()
+        
+        # Produces fake binaries and rejects any made under a different driver string.
+        self._driver = driver
+        self.compiled = []
+        self.linked = []
+    
+    def driver(self):
+        return self._driver
+    
+    def compile(self, paths, uniforms):
+        program = ("compiled", tuple(paths))
+        self.compiled.append(program)
+        return program
+    
+    def binary(self, program):
+        return 1, "{}:{}".format(self._driver, ",".join(program[1])).encode("utf-8")
+    
+    def link(self, format, binary, uniforms):
+        driver, _, paths = binary.decode("utf-8").partition(":")
+        if format != 1 or driver != self._driver:
+            return None
+        program = ("linked", tuple(paths.split(",")))
+        self.linked.append(program)
+        return program
+
+
+class ProgramCache(object):
+    def __init__(self, path=None, backend=None, binaries=False):
+        super().__init__()
+        
+        self._path = cache_path() if path is None else path
+        self._backend = backend
+        
+        # Binaries read ahead by warm(), by key; filled on a background thread.
+        self._lock = threading.Lock()
+        self._binaries = {}
+        self._thread = None
+        
+        self._driver = None
+        # Off unless configured (video.binaries), since GLBackend's binary path is unverified against
+        # glue. Cleared the first time the backend fails to produce or link a binary (rather than
+        # reject one), after which every program is compiled from source.
+        self._enabled = binaries
+        
+        self._hits = 0
+        self._misses = 0
+        self._rejected = 0
+    
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = GLBackend()
+        return self._backend
+    
+    @property
+    def enabled(self):
+        return self._enabled
+    
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = bool(value)
+    
+    def stats(self):
+        return {
+            "enabled": self._enabled,
+            "hits": self._hits,
+            "misses": self._misses,
+            "rejected": self._rejected,
+        }
+    
+    def _file(self, value):
+        return os.path.join(self._path, value + EXTENSION)
+    
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < _HEADER.size:
+            return None
+        magic, format = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            return None
+        return format, data[_HEADER.size:]
+    
+    def _write(self, path, format, binary):
+        # Written to a temporary file and renamed, so nodes sharing the directory never read half a file.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = "{}.{}.tmp".format(path, os.getpid())
+        with open(temporary, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, format))
+            f.write(binary)
+        os.replace(temporary, path)
+    
+    def _warm(self):
+        try:
+            names = os.listdir(self._path)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(EXTENSION):
+                continue
+            entry = self._read(os.path.join(self._path, name))
+            if entry is not None:
+                with self._lock:
+                    self._binaries.setdefault(name[:-len(EXTENSION)], entry)
+    
+    def warm(self):
+        # Reads stored binaries ahead of time, so the first load() does not wait on the disk.
+        if self._enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._warm, name="ProgramCache", daemon=True)
+            self._thread.start()
+        return self._thread
+    
+    def _entry(self, value):
+        with self._lock:
+            entry = self._binaries.pop(value, None)
+        return entry if entry is not None else self._read(self._file(value))
+    
+    def _disable(self, message, *args):
+        _logger.warning(message + " Program binaries are disabled, compiling from source.", *args, exc_info=True)
+        self._enabled = False
+    
+    def _link(self, value, uniforms):
+        entry = self._entry(value)
+        if entry is None:
+            self._misses += 1
+            return None
+        try:
+            program = self.backend.link(entry[0], entry[1], uniforms)
+        except Exception:
+            self._disable("Failed to link program binary %s.", value)
+            return None
+        if program is None:
+            # Drivers may reject binaries (e.g. after an update that kept the version string).
+            self._rejected += 1
+            _logger.info("Program binary %s rejected, compiling from source.", value)
+            return None
+        self._hits += 1
+        return program
+    
+    def _store(self, value, program):
+        try:
+            binary = self.backend.binary(program)
+        except Exception:
+            self._disable("Failed to retrieve program binary %s.", value)
+            return
+        if binary is None:
+            return
+        try:
+            self._write(self._file(value), *binary)
+        except OSError as e:
+            _logger.warning("Failed to store program binary: %s", e)
+    
+    def load(self, paths, uniforms=None):
+        backend = self.backend
+        if not self._enabled:
+            return backend.compile(paths, uniforms)
+        
+        if self._driver is None:
+            try:
+                self._driver = backend.driver()
+            except Exception:
+                self._disable("Failed to query the driver.")
+                return backend.compile(paths, uniforms)
+        
+        sources = []
+        for path in paths:
+            with open(path, "rb") as f:
+                sources.append(f.read())
+        value = key(sources, self._driver)
+        
+        program = self._link(value, uniforms)
+        if program is not None:
+            return program
+        
+        program = backend.compile(paths, uniforms)
+        if self._enabled:
+            self._store(value, program)
+        return program
+
+
+def cache(path=None):
+    try:
+        return _caches[path]
+    except KeyError:
+        result = _caches[path] = ProgramCache(path)
+        return result
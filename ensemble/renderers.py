@@ -1,6 +1,6 @@
 import logging
 
-from . import applications, configurations, timers
+from . import applications, configurations, states, textures, timers
 
 _logger = logging.getLogger(__name__.split(".").pop())
 
@@ -11,8 +11,11 @@ class SceneRenderer(object):
         
         self._configuration = configuration
         
-        self._timer = timers.Timer(timers.SystemClock())
-        
+        self._timer = timers.Timer(timers.MonotonicClock())
+        self._state = states.StateTracker()
+        # Textures belong to this renderer's GL context, so the renderer has a cache of its own.
+        self._textures = textures.TextureCache()
+    
     @property
     def audio(self):
         return self._configuration.audio
@@ -28,7 +31,15 @@ class SceneRenderer(object):
     @property
     def timer(self):
         return self._timer
-        
+    
+    @property
+    def state(self):
+        return self._state
+    
+    @property
+    def textures(self):
+        return self._textures
+    
     def create(self, scene):
         if self._timer:
             self._timer.update()
@@ -36,19 +47,37 @@ class SceneRenderer(object):
         if scene:
             scene.create(self)
         
+        # Loading resources binds objects behind the tracker's back.
+        self._state.invalidate()
+        
         _logger.info(str(self._timer._clock))
     
     def update(self, scene):
         if self._timer:
             self._timer.update()
         
+        self._state.reset()
+        
+        # Images decoded in the background are uploaded within a per-frame budget.
+        self._textures.update()
+        
         if scene:
             scene.update(self)
             scene.render(self)
     
+    def stats(self):
+        # Of the last complete frame.
+        calls, skipped = self._state.last
+        return {
+            "calls": calls,
+            "skipped": skipped,
+        }
+    
     def delete(self, scene):
         if self._timer:
             self._timer.update()
         
         if scene:
             scene.delete(self)
+        
+        self._textures.close()
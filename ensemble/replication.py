@@ -0,0 +1,359 @@
+import logging
+
+import collections
+import random
+import select
+import socket
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from . import metrics, transports
+
+_logger = logging.getLogger(__name__.split(".").pop())
+
+DEFAULT_GROUP = transports.DEFAULT_GROUP
+DEFAULT_BLOCK_SIZE = 64
+DEFAULT_KEYFRAME_INTERVAL = 60
+DEFAULT_FRAGMENT_SIZE = 1400
+DEFAULT_BUFFER_SIZE = 4*1024*1024
+DEFAULT_HISTORY = 600
+DEFAULT_PENDING = 8
+DEFAULT_TIMEOUT = 0.05
+
+ZLIB = "zlib"
+LZ4 = "lz4"
+
+KEYFRAME = 1
+COMPRESSED_ZLIB = 2
+COMPRESSED_LZ4 = 4
+
+_MAGIC = b"ENSR"
+# Publishers pick a random session id, so subscribers can tell a restarted publisher (whose frames
+# count up from scratch again) from stale packets of the old one.
+_HEADER = struct.Struct("!4sBIQQI")
+_FRAGMENT = struct.Struct("!4sIQHH")
+_COUNT = struct.Struct("!I")
+
+
+class DecodeError(ValueError):
+    pass
+
+
+def _lz4():
+    import lz4.frame
+    return lz4.frame
+
+def _compress(compression, data, level):
+    if compression == ZLIB:
+        return COMPRESSED_ZLIB, zlib.compress(data, level)
+    if compression == LZ4:
+        return COMPRESSED_LZ4, _lz4().compress(data)
+    return 0, data
+
+def _decompress(flags, data):
+    if flags & COMPRESSED_ZLIB:
+        return zlib.decompress(data)
+    if flags & COMPRESSED_LZ4:
+        return _lz4().decompress(bytes(data))
+    return data
+
+def _bytes(array):
+    if not array.flags.c_contiguous:
+        raise ValueError("Replicated state must be contiguous.")
+    return array.reshape(-1).view(np.uint8)
+
+
+class Encoder(object):
+    def __init__(self, state, block_size=DEFAULT_BLOCK_SIZE, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, compression=ZLIB, level=1, session=None):
+        super().__init__()
+        
+        self._state = state
+        self._session = random.getrandbits(32) if session is None else session
+        self._bytes = _bytes(state)
+        
+        self._block_size = block_size
+        self._keyframe_interval = keyframe_interval
+        self._compression = compression
+        self._level = level
+        
+        if compression == LZ4:
+            _lz4()
+        
+        size = self._bytes.size
+        self._previous = self._bytes.copy()
+        self._changed = np.empty(size, dtype=np.bool_)
+        self._blocks = np.arange(0, size, block_size)
+        
+        self._frame = 0
+    
+    @property
+    def state(self):
+        return self._state
+    
+    @property
+    def frame(self):
+        return self._frame
+    
+    @property
+    def session(self):
+        return self._session
+    
+    def _dirty(self):
+        # Block-aligned byte ranges [start, stop) that changed since the last encoded frame.
+        np.not_equal(self._bytes, self._previous, out=self._changed)
+        dirty = np.logical_or.reduceat(self._changed, self._blocks)
+        edges = np.concatenate(([False], dirty, [False]))
+        boundaries = np.flatnonzero(edges[1:] != edges[:-1])
+        ranges = (boundaries * self._block_size).reshape(-1, 2)
+        np.minimum(ranges, self._bytes.size, out=ranges)
+        return dirty, ranges
+    
+    def encode(self, keyframe=False):
+        base = self._frame
+        self._frame += 1
+        keyframe = keyframe or base == 0 or self._frame % self._keyframe_interval == 0
+        
+        if keyframe:
+            flags = KEYFRAME
+            payload = self._bytes.tobytes()
+        else:
+            flags = 0
+            dirty, ranges = self._dirty()
+            mask = np.repeat(dirty, self._block_size)[:self._bytes.size]
+            payload = b"".join([_COUNT.pack(len(ranges)), ranges.astype(">u4").tobytes(), self._bytes[mask].tobytes()])
+        
+        np.copyto(self._previous, self._bytes)
+        
+        compressed, payload = _compress(self._compression, payload, self._level)
+        return _HEADER.pack(_MAGIC, flags | compressed, self._session, self._frame, base, self._bytes.size) + payload
+
+
+class Decoder(object):
+    def __init__(self, state):
+        super().__init__()
+        
+        self._state = state
+        self._bytes = _bytes(state)
+        
+        self._session = None
+        self._frame = None
+        self._missed = 0
+    
+    @property
+    def state(self):
+        return self._state
+    
+    @property
+    def frame(self):
+        return self._frame
+    
+    @property
+    def session(self):
+        return self._session
+    
+    @property
+    def missed(self):
+        return self._missed
+    
+    def decode(self, packet):
+        # Deltas only apply on top of the frame they were made against; after a loss, or once the
+        # publisher restarts as a new session, wait for a keyframe.
+        packet = memoryview(packet)
+        try:
+            magic, flags, session, frame, base, size = _HEADER.unpack_from(packet)
+        except struct.error as e:
+            raise DecodeError(str(e))
+        if magic != _MAGIC:
+            raise DecodeError("Not a replication packet.")
+        if size != self._bytes.size:
+            raise DecodeError("State size mismatch ({} != {}).".format(size, self._bytes.size))
+        current = self._frame if session == self._session else None
+        if current is not None and frame <= current:
+            return False
+        if not flags & KEYFRAME and base != current:
+            self._missed += 1
+            return False
+        
+        try:
+            payload = _decompress(flags, packet[_HEADER.size:])
+        except zlib.error as e:
+            raise DecodeError(str(e))
+        
+        if flags & KEYFRAME:
+            if len(payload) != size:
+                raise DecodeError("Truncated keyframe.")
+            self._bytes[:] = np.frombuffer(payload, dtype=np.uint8)
+        else:
+            count, = _COUNT.unpack_from(payload)
+            ranges = np.frombuffer(payload, dtype=">u4", count=2*count, offset=_COUNT.size).reshape(-1, 2).tolist()
+            data = np.frombuffer(payload, dtype=np.uint8, offset=_COUNT.size + 8*count)
+            position = 0
+            for start, stop in ranges:
+                self._bytes[start:stop] = data[position:position + stop - start]
+                position += stop - start
+        
+        self._session = session
+        self._frame = frame
+        return True
+
+
+class Publisher(object):
+    def __init__(self, state, port, group=DEFAULT_GROUP, fragment_size=DEFAULT_FRAGMENT_SIZE, buffer_size=DEFAULT_BUFFER_SIZE, timeout=DEFAULT_TIMEOUT, history=DEFAULT_HISTORY, sock=None, **kwargs):
+        super().__init__()
+        
+        self._encoder = Encoder(state, **kwargs)
+        self._address = (group, port)
+        self._fragment_size = fragment_size
+        self._timeout = timeout
+        
+        self._socket = transports.open_multicast_socket(group, port) if sock is None else sock
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, buffer_size)
+        
+        self._sizes = collections.deque(maxlen=history)
+        self._latencies = collections.deque(maxlen=history)
+        self._dropped = 0
+    
+    @property
+    def state(self):
+        return self._encoder.state
+    
+    def _send(self, fragment):
+        # Keyframes are bursts of hundreds of fragments, so wait for the send buffer rather than drop them.
+        while True:
+            try:
+                return self._socket.sendto(fragment, self._address)
+            except BlockingIOError:
+                _, writable, _ = select.select([], [self._socket], [], self._timeout)
+                if not writable:
+                    raise
+    
+    def publish(self, keyframe=False):
+        start = time.perf_counter_ns()
+        packet = self._encoder.encode(keyframe)
+        frame = self._encoder.frame
+        
+        size = self._fragment_size
+        count = (len(packet) + size - 1) // size
+        for index in range(count):
+            fragment = _FRAGMENT.pack(_MAGIC, self._encoder.session, frame, index, count) + packet[index*size:(index + 1)*size]
+            try:
+                self._send(fragment)
+            except OSError as e:
+                self._dropped += 1
+                _logger.warning("Failed to send replication fragment: %s", e)
+                break
+        
+        self._sizes.append(len(packet))
+        self._latencies.append(time.perf_counter_ns() - start)
+        return frame
+    
+    def stats(self):
+        return {
+            "frame": self._encoder.frame,
+            "dropped": self._dropped,
+            "bytes": metrics.percentiles(self._sizes),
+            "latency_ns": metrics.percentiles(self._latencies),
+        }
+    
+    def close(self):
+        self._socket.close()
+
+
+class Subscriber(object):
+    def __init__(self, state, port, group=DEFAULT_GROUP, buffer_size=DEFAULT_BUFFER_SIZE, pending=DEFAULT_PENDING, history=DEFAULT_HISTORY, sock=None):
+        super().__init__()
+        
+        self._decoder = Decoder(state)
+        
+        self._socket = transports.open_multicast_socket(group, port) if sock is None else sock
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+        
+        # Fragments are keyed by (session, frame); sessions left behind are never returned to.
+        self._session = None
+        self._retired = set()
+        self._fragments = {}
+        self._pending = pending
+        
+        self._latencies = collections.deque(maxlen=history)
+        self._errors = 0
+    
+    @property
+    def state(self):
+        return self._decoder.state
+    
+    @property
+    def frame(self):
+        return self._decoder.frame
+    
+    def _reassemble(self, data):
+        magic, session, frame, index, count = _FRAGMENT.unpack_from(data)
+        if magic != _MAGIC or index >= count or session in self._retired:
+            return None
+        parts = self._fragments.setdefault((session, frame), [None] * count)
+        if len(parts) != count:
+            return None
+        parts[index] = data[_FRAGMENT.size:]
+        if any(part is None for part in parts):
+            return None
+        del self._fragments[(session, frame)]
+        if session != self._session:
+            # A restarted publisher, followed once one of its frames is complete, so a late fragment
+            # of the previous session neither discards the new frames nor switches back.
+            if self._session is not None:
+                self._retired.add(self._session)
+            self._session = session
+            self._fragments = {key: parts for key, parts in self._fragments.items() if key[0] == session}
+        return session, frame, b"".join(parts)
+    
+    def receive(self):
+        # Drains the socket without blocking and applies every completed frame in order.
+        packets = []
+        while True:
+            try:
+                data, _ = self._socket.recvfrom(65536)
+            except BlockingIOError:
+                break
+            if len(data) < _FRAGMENT.size:
+                continue
+            packet = self._reassemble(data)
+            if packet is not None:
+                packets.append(packet)
+        
+        # Frames completed before a switch in this same drain belong to the retired session.
+        packets = sorted((frame, packet) for session, frame, packet in packets if session == self._session)
+        
+        applied = 0
+        start = time.perf_counter_ns()
+        for frame, packet in packets:
+            try:
+                applied += self._decoder.decode(packet)
+            except DecodeError as e:
+                self._errors += 1
+                _logger.warning("Dropped replication frame %s: %s", frame, e)
+        if applied:
+            self._latencies.append(time.perf_counter_ns() - start)
+        
+        # Incomplete frames older than anything completed since have lost a fragment and are discarded.
+        decoded = self._decoder.frame if self._decoder.session == self._session else None
+        latest = max([frame for frame, _ in packets] + [decoded or 0])
+        stale = [key for key in self._fragments if key[0] == self._session and key[1] <= latest]
+        stale.extend(sorted((key for key in self._fragments if key not in stale), key=lambda key: key[1])[:-self._pending])
+        for key in stale:
+            del self._fragments[key]
+        
+        return applied
+    
+    def stats(self):
+        return {
+            "frame": self._decoder.frame,
+            "missed": self._decoder.missed,
+            "errors": self._errors,
+            "pending": len(self._fragments),
+            "latency_ns": metrics.percentiles(self._latencies),
+        }
+    
+    def close(self):
+        self._socket.close()
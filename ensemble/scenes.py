@@ -4,7 +4,7 @@ from glue import gl, wgl
 from glue.gl import GL
 from glue.wgl import WGL
 
-from .mathematics import matrices, vectors
+from . import commands, graphs, programs, replication, sharing, uniforms, walls
 
 
 class Scene(object):
@@ -24,6 +24,107 @@ class Scene(object):
         pass
 
 
+class SceneGraphScene(Scene):
+    def __init__(self, graph=None):
+        super().__init__()
+        
+        self._graph = graphs.SceneGraph() if graph is None else graph
+    
+    @property
+    def graph(self):
+        return self._graph
+    
+    def update(self, context):
+        self._graph.update()
+
+
+class ReplicatedScene(Scene):
+    def __init__(self, scene, state, port=None):
+        super().__init__()
+        
+        # The timeserver updates the wrapped scene and publishes state; other nodes only apply it.
+        # Within a host, only the leading process uses the network and shares the state with the rest.
+        self._scene = scene
+        self._state = state
+        self._port = port
+        
+        self._master = False
+        self._replicator = None
+        self._shared = None
+    
+    @property
+    def scene(self):
+        return self._scene
+    
+    @property
+    def state(self):
+        return self._state
+    
+    @property
+    def replicator(self):
+        return self._replicator
+    
+    def _lead(self, context):
+        port = context.network.port + 2 if self._port is None else self._port
+        self._master = context.network.timeserver
+        if self._master:
+            self._replicator = replication.Publisher(self._state, port)
+        else:
+            self._replicator = replication.Subscriber(self._state, port)
+        # Replacing the block of a leader this process took over from, if it is still there.
+        self._shared = sharing.create(sharing.name(port, "state"), self._state.dtype, self._state.shape, replace=True)
+    
+    def _release(self, replaced=False):
+        if self._replicator:
+            self._replicator.close()
+            self._replicator = None
+        if self._shared:
+            if replaced:
+                # Taken over from: the block under the name is (or will be) the new leader's.
+                self._shared.disown()
+            self._shared.close()
+            self._shared = None
+    
+    def create(self, context):
+        if sharing.host(context.network.port).leader:
+            self._lead(context)
+        self._scene.create(context)
+    
+    def _attach(self, context):
+        port = context.network.port + 2 if self._port is None else self._port
+        try:
+            self._shared = sharing.attach(sharing.name(port, "state"), self._state.dtype, self._state.shape)
+        except FileNotFoundError:
+            pass
+    
+    def update(self, context):
+        if sharing.host(context.network.port).leader != (self._replicator is not None):
+            # Leadership of the host moved to or from this process (see sharing.Host.takeover).
+            self._release(replaced=True)
+            if sharing.host(context.network.port).leader:
+                self._lead(context)
+        
+        if self._replicator is None:
+            if self._shared is None:
+                self._attach(context)
+            if self._shared is not None:
+                self._shared.read(self._state)
+            return
+        
+        if self._master:
+            self._scene.update(context)
+            self._replicator.publish()
+        else:
+            self._replicator.receive()
+        self._shared.write(self._state)
+    
+    def render(self, context):
+        self._scene.render(context)
+    
+    def delete(self, context):
+        self._scene.delete(context)
+        self._release()
+
 class ShaderToyScene(Scene):
     def __init__(self):
         super().__init__()
@@ -33,9 +134,8 @@ class ShaderToyScene(Scene):
     
     def create(self, context):
         from . import applications
-        from glue.gl import utilities
         
-        self._program = utilities.load_program([
+        self._program = programs.cache().load([
             applications.data_path("shaders/noop.vs"),
             applications.data_path("shaders/quad.gs"),
             applications.data_path("shaders/quad.fs"),
@@ -50,11 +150,15 @@ class ShaderToyScene(Scene):
             "tex_coord_transform": gl.Mat4Type,
         })
         
-        self._texture = utilities.load_texture(applications.data_path("images/smile.png"))
+        self._uniforms = uniforms.UniformCache(self._program.uniforms)
+        
+        self._texture = context.textures.acquire(applications.data_path("images/smile.png"))
         
         self._vao = gl.VertexArray().create()
         
-        self._tex_coord_transform = np.dot(matrices.translate(context.video.index), matrices.scale(1.0/context.video.global_.shape))
+        self._commands = commands.CommandBuffer()
+        
+        self._tex_coord_transform = walls.from_configuration(context.video).tex_coord_transform(context.video.index)
     
     def render(self, context):
         t = context.timer.elapsed
@@ -64,19 +168,38 @@ class ShaderToyScene(Scene):
         #projection = transforms.identity()
         #tex_coord_transform = transforms.identity()
         
-        gl.clear_color(self._background)
-        gl.clear()
-        
-        with gl.bound(self._program), gl.bound(self._vao):
-            self._program.uniforms["iResolution"] = context.video.global_.resolution
-            self._program.uniforms["iTime"] = t
-            '''
-            self._program.uniforms["model"] = model
-            self._program.uniforms["view"] = view
-            self._program.uniforms["projection"] = projection
-            '''
-            self._program.uniforms["tex_coord_transform"] = self._tex_coord_transform
-            
-            gl.depth_mask(False)
-            GL.glDrawArrays(GL.GL_POINTS, 0, 1)
-            gl.depth_mask(True)
+        state = context.state
+        
+        self._uniforms.reset()
+        
+        # Only the time changes from frame to frame, so the recorded commands are replayed with it.
+        if self._commands.valid:
+            self._commands.replay(state, iTime=t)
+            return
+        
+        self._commands.record(state)
+        
+        state.clear_color(self._background)
+        state.clear()
+        
+        state.use_program(self._program)
+        state.bind_vertex_array(self._vao)
+        
+        state.set_uniform(self._uniforms, "iResolution", context.video.global_.resolution)
+        state.set_uniform(self._uniforms, "iTime", t)
+        self._commands.mark("iTime")
+        '''
+        state.set_uniform(self._uniforms, "model", model)
+        state.set_uniform(self._uniforms, "view", view)
+        state.set_uniform(self._uniforms, "projection", projection)
+        '''
+        state.set_uniform(self._uniforms, "tex_coord_transform", self._tex_coord_transform)
+        
+        state.depth_mask(False)
+        state.draw_arrays(GL.GL_POINTS, 0, 1)
+        state.depth_mask(True)
+        
+        self._commands.end(state)
+    
+    def delete(self, context):
+        self._texture.release()
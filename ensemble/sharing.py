@@ -0,0 +1,337 @@
+import logging
+
+import os
+import random
+import time
+
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+_logger = logging.getLogger(__name__.split(".").pop())
+
+DEFAULT_RETRIES = 1000
+DEFAULT_TIMEOUT = 5.0
+
+STARTED = 1
+PAUSED = 2
+CONVERGED = 4
+
+_HEADER_SIZE = 16
+
+_HOST = np.dtype([
+    ("offset", "<i8"),
+    ("start", "<i8"),
+    ("pause", "<i8"),
+    ("epoch", "<u8"),
+    ("heartbeat", "<i8"),
+    ("generation", "<u4"),
+    ("flags", "<u4"),
+    ("retired", "<u4"),
+])
+
+_hosts = {}
+
+
+def name(port, key):
+    return "ensemble_{}_{}".format(port, key)
+
+def _size(dtype, shape):
+    return _HEADER_SIZE + max(1, int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize)
+
+def _alive(pid):
+    if os.name != "posix":
+        # Windows frees the block with its last handle, so a block that exists has a live owner.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _attach(name):
+    memory = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        # Attaching also registers the block with the resource tracker, which would unlink it when
+        # this process exits; only the owner should do that.
+        resource_tracker.unregister(memory._name, "shared_memory")
+    return memory
+
+def _owner(name):
+    # The pid in a block's header, or None if there is no such block.
+    try:
+        memory = _attach(name)
+    except FileNotFoundError:
+        return None
+    pid = int(np.ndarray((), dtype=np.uint64, buffer=memory.buf, offset=8))
+    memory.close()
+    return pid
+
+def _unlink(name):
+    # Opened (and so registered) again just to unlink it, which keeps the resource tracker balanced.
+    try:
+        memory = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    memory.unlink()
+    memory.close()
+
+
+class SeqLock(object):
+    def __init__(self, memory, dtype, shape=(), owner=False):
+        super().__init__()
+        
+        self._memory = memory
+        self._owner = owner
+        
+        # Header: the sequence (odd while a write is in progress) and the owner's pid.
+        self._sequence = np.ndarray((), dtype=np.uint64, buffer=memory.buf, offset=0)
+        self._pid = np.ndarray((), dtype=np.uint64, buffer=memory.buf, offset=8)
+        self._values = np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=_HEADER_SIZE)
+        
+        if owner:
+            self._pid[...] = os.getpid()
+    
+    @property
+    def name(self):
+        return self._memory.name
+    
+    @property
+    def owner(self):
+        return self._owner
+    
+    @property
+    def pid(self):
+        return int(self._pid)
+    
+    @property
+    def sequence(self):
+        return int(self._sequence)
+    
+    @property
+    def values(self):
+        return self._values
+    
+    def begin(self):
+        self._sequence += 1
+    
+    def end(self):
+        self._sequence += 1
+    
+    def write(self, values):
+        self.begin()
+        self._values[...] = values
+        self.end()
+    
+    def read(self, out, retries=DEFAULT_RETRIES):
+        # Retries until a copy was taken with no write in progress or in between; there is a single
+        # writer, and the header and values are plain stores, so this relies on the CPU's store order.
+        for _ in range(retries):
+            before = int(self._sequence)
+            if before & 1:
+                continue
+            np.copyto(out, self._values)
+            if int(self._sequence) == before:
+                return before
+        return None
+    
+    def disown(self):
+        # Leaves the block to the process that replaced this owner: closing no longer unlinks it.
+        if self._owner and os.name == "posix":
+            resource_tracker.unregister(self._memory._name, "shared_memory")
+        self._owner = False
+    
+    def close(self):
+        self._sequence = self._pid = self._values = None
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, self._memory.name, self.sequence)
+
+
+def create(name, dtype, shape=(), replace=False):
+    size = _size(dtype, shape)
+    try:
+        memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        # A block left behind by a process that crashed is taken over; one with a live owner only
+        # when replacing it (a leader that was taken over from).
+        pid = _owner(name)
+        if pid is not None and _alive(pid) and not replace:
+            raise
+        _logger.warning("Replacing shared memory %s of process %s.", name, pid)
+        _unlink(name)
+        memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+    return SeqLock(memory, dtype, shape, owner=True)
+
+def attach(name, dtype, shape=()):
+    memory = _attach(name)
+    if memory.size < _size(dtype, shape):
+        memory.close()
+        raise ValueError("Shared memory {} is too small.".format(name))
+    return SeqLock(memory, dtype, shape)
+
+
+class Host(object):
+    def __init__(self, port, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        
+        # The first process on a host to claim the port leads: it alone talks to the network and
+        # publishes its clock and transport state for the other processes on the same host.
+        self._port = port
+        self._timeout = timeout
+        try:
+            self._lock = create(name(port, "host"), _HOST)
+        except FileExistsError:
+            self._lock = attach(name(port, "host"), _HOST)
+        
+        self._value = np.zeros((), dtype=_HOST)
+        self._claim = None
+        
+        if self.leader:
+            # Generations start at random, so claims left behind by an earlier run never match.
+            self._value["generation"] = random.getrandbits(31)
+            self._value["heartbeat"] = time.perf_counter_ns()
+            self._lock.write(self._value)
+        else:
+            self._lock.read(self._value)
+    
+    @property
+    def port(self):
+        return self._port
+    
+    @property
+    def leader(self):
+        return self._lock.owner
+    
+    @property
+    def generation(self):
+        return int(self._value["generation"])
+    
+    @property
+    def offset_ns(self):
+        # Leader clock time minus this host's monotonic counter, which every process shares.
+        self._read()
+        return int(self._value["offset"])
+    
+    @property
+    def converged(self):
+        # Whether the leader's clock has converged with the network's (or needs no synchronisation).
+        self._read()
+        return bool(int(self._value["flags"]) & CONVERGED)
+    
+    @property
+    def lost(self):
+        # The leader exited, or has not published for longer than the timeout (hung, or stopped
+        # half way through a write); either way the followers would no longer move.
+        if self.leader:
+            return False
+        self._read()
+        if not _alive(self._lock.pid):
+            return True
+        heartbeat = int(self._value["heartbeat"])
+        return heartbeat != 0 and time.perf_counter_ns() - heartbeat > self._timeout * 1e9
+    
+    def _follow(self, lock):
+        self._lock.close()
+        self._lock = lock
+        self._lock.read(self._value)
+    
+    def _read(self):
+        if self._lock.read(self._value) is None:
+            return False
+        if self._value["retired"] and not self.leader:
+            # The block was replaced by the follower that took over; the new one has the same name.
+            try:
+                self._follow(attach(self._lock.name, _HOST))
+            except FileNotFoundError:
+                pass
+        return True
+    
+    def publish(self, clock, timer, converged=True):
+        values = self._lock.values
+        if values["retired"]:
+            # Taken over from while it was not publishing: this process follows from now on.
+            _logger.warning("Port %d was taken over by process %s.", self._port, _owner(self._lock.name))
+            self._lock.disown()
+            self._follow(attach(self._lock.name, _HOST))
+            return False
+        
+        start, pause, epoch = timer.state
+        self._lock.begin()
+        values["offset"] = clock.time_ns - time.perf_counter_ns()
+        values["start"] = start or 0
+        values["pause"] = pause or 0
+        values["epoch"] = epoch
+        values["heartbeat"] = time.perf_counter_ns()
+        values["flags"] = (STARTED if start is not None else 0) | (PAUSED if pause is not None else 0) | (CONVERGED if converged else 0)
+        self._lock.end()
+        return True
+    
+    def apply(self, timer):
+        if not self._read():
+            return False
+        flags = int(self._value["flags"])
+        start = int(self._value["start"]) if flags & STARTED else None
+        pause = int(self._value["pause"]) if flags & PAUSED else None
+        timer.state = (start, pause, int(self._value["epoch"]))
+        return True
+    
+    def takeover(self):
+        # Of the followers noticing a lost leader, only the first to claim its generation replaces the
+        # block, starting from the last state the leader published; the others move to it once the
+        # old block is marked retired.
+        if self.leader:
+            return True
+        if os.name != "posix":
+            # Windows keeps a block under its name while any follower still maps it.
+            return False
+        
+        try:
+            claim = shared_memory.SharedMemory(name=name(self._port, "claim_{}".format(self.generation)), create=True, size=1)
+        except FileExistsError:
+            return False
+        
+        lost = self._lock.pid
+        pid = _owner(self._lock.name)
+        if pid is not None and pid != lost and _alive(pid):
+            # A process started since has claimed the port (the lost leader's block went with it).
+            claim.unlink()
+            claim.close()
+            self._follow(attach(self._lock.name, _HOST))
+            return False
+        
+        _logger.warning("Taking over port %d from process %s.", self._port, lost)
+        lock = create(self._lock.name, _HOST, replace=True)
+        self._value["generation"] += 1
+        self._value["heartbeat"] = time.perf_counter_ns()
+        lock.write(self._value)
+        # Set outside the sequence, as the old block may still have a (hung) writer; only ever set,
+        # and only by the one process holding the claim.
+        self._lock.values["retired"] = 1
+        self._lock.close()
+        self._lock = lock
+        self._claim = claim
+        return True
+    
+    def close(self):
+        self._lock.close()
+        if self._claim is not None:
+            self._claim.close()
+            self._claim.unlink()
+            self._claim = None
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, self._port, "leader" if self.leader else "follower")
+
+
+def host(port):
+    try:
+        return _hosts[port]
+    except KeyError:
+        result = _hosts[port] = Host(port)
+        return result
@@ -0,0 +1,294 @@
+import logging
+
+import numpy as np
+
+from .uniforms import UniformCache
+
+_logger = logging.getLogger(__name__.split(".").pop())
+
+PROGRAM = "program"
+VERTEX_ARRAY = "vertex_array"
+TEXTURE = "texture"
+
+# Operations a command buffer can record, by opcode.
+OPERATIONS = ("bind", "clear_color", "clear", "depth_mask", "enable", "disable", "blend_func", "set_uniform", "draw_arrays")
+
+_MISSING = object()
+
+
+def _key(value):
+    if isinstance(value, (np.ndarray, list, tuple)):
+        return tuple(np.asarray(value).ravel().tolist())
+    return value
+
+def effect(name, args):
+    # The tracked (key, value) a recorded operation sets, as StateTracker keys it, or None for
+    # operations that always reach GL.
+    if name == "bind":
+        return args[0], args[1]
+    if name == "clear_color":
+        return "clear_color", _key(args[0])
+    if name == "depth_mask":
+        return "depth_mask", bool(args[0])
+    if name == "enable":
+        return ("capability", args[0]), True
+    if name == "disable":
+        return ("capability", args[0]), False
+    if name == "blend_func":
+        return "blend_func", _key((args[0], args[1]))
+    return None
+
+
+class GLBackend(object):
+    def __init__(self):
+        super().__init__()
+        
+        from glue import gl
+        from glue.gl import GL
+        
+        self._gl = gl
+        self._GL = GL
+        
+        # Objects stay bound through glue's own context managers, so leaving one restores glue's state.
+        self._bindings = {}
+    
+    def _activate(self, slot):
+        if isinstance(slot, tuple):
+            self._GL.glActiveTexture(self._GL.GL_TEXTURE0 + slot[1])
+    
+    def bind(self, slot, value):
+        self.unbind(slot)
+        if value is None:
+            return
+        self._activate(slot)
+        binding = self._gl.bound(value)
+        binding.__enter__()
+        self._bindings[slot] = binding
+    
+    def unbind(self, slot):
+        binding = self._bindings.pop(slot, None)
+        if binding is not None:
+            self._activate(slot)
+            binding.__exit__(None, None, None)
+    
+    def clear_color(self, value):
+        self._gl.clear_color(np.asarray(value, dtype=np.float32))
+    
+    def clear(self):
+        self._gl.clear()
+    
+    def depth_mask(self, value):
+        self._gl.depth_mask(value)
+    
+    def enable(self, capability):
+        self._GL.glEnable(capability)
+    
+    def disable(self, capability):
+        self._GL.glDisable(capability)
+    
+    def blend_func(self, source, destination):
+        self._GL.glBlendFunc(source, destination)
+    
+    def set_uniform(self, uniforms, name, value):
+        uniforms[name] = value
+    
+    def draw_arrays(self, mode, first, count):
+        self._GL.glDrawArrays(mode, first, count)
+
+class NullBackend(object):
+    def __init__(self):
+        super().__init__()
+        
+        # Records every call that would have reached GL, for checking what the tracker lets through.
+        self.calls = []
+    
+    def bind(self, slot, value):
+        self.calls.append(("bind", slot, value))
+    
+    def unbind(self, slot):
+        self.calls.append(("unbind", slot))
+    
+    def clear_color(self, value):
+        self.calls.append(("clear_color", _key(value)))
+    
+    def clear(self):
+        self.calls.append(("clear",))
+    
+    def depth_mask(self, value):
+        self.calls.append(("depth_mask", value))
+    
+    def enable(self, capability):
+        self.calls.append(("enable", capability))
+    
+    def disable(self, capability):
+        self.calls.append(("disable", capability))
+    
+    def blend_func(self, source, destination):
+        self.calls.append(("blend_func", source, destination))
+    
+    def set_uniform(self, uniforms, name, value):
+        # Forwarded as GLBackend does, so a UniformCache in front of the uniforms still elides values.
+        self.calls.append(("set_uniform", name, _key(value)))
+        uniforms[name] = value
+    
+    def draw_arrays(self, mode, first, count):
+        self.calls.append(("draw_arrays", mode, first, count))
+
+
+class StateTracker(object):
+    def __init__(self, backend=None):
+        super().__init__()
+        
+        # Shadows the GL state set through it and drops calls that would not change it. Code that
+        # changes GL state behind its back must call invalidate().
+        self._backend = GLBackend() if backend is None else backend
+        self._state = {}
+        self._recorder = None
+        
+        # Calls that reached GL and calls dropped, this frame and over the last complete one.
+        self._calls = 0
+        self._skipped = 0
+        self._last = (0, 0)
+    
+    @property
+    def backend(self):
+        return self._backend
+    
+    @property
+    def recorder(self):
+        return self._recorder
+    
+    @recorder.setter
+    def recorder(self, value):
+        # Every call made while a recorder is set is also appended to it (see commands.CommandBuffer).
+        self._recorder = value
+    
+    @property
+    def calls(self):
+        return self._calls
+    
+    @property
+    def skipped(self):
+        return self._skipped
+    
+    @property
+    def last(self):
+        return self._last
+    
+    def _changed(self, key, value):
+        value = _key(value)
+        if key in self._state and self._state[key] == value:
+            self._skipped += 1
+            return False
+        self._state[key] = value
+        self._calls += 1
+        return True
+    
+    def bind(self, slot, value):
+        if self._recorder is not None:
+            self._recorder.append("bind", (slot, value))
+        # Compared by identity, so distinct objects that happen to compare equal still rebind.
+        if self._state.get(slot, False) is value:
+            self._skipped += 1
+            return
+        self._state[slot] = value
+        self._calls += 1
+        self._backend.bind(slot, value)
+    
+    def use_program(self, program):
+        self.bind(PROGRAM, program)
+    
+    def bind_vertex_array(self, vertex_array):
+        self.bind(VERTEX_ARRAY, vertex_array)
+    
+    def bind_texture(self, unit, texture):
+        self.bind((TEXTURE, unit), texture)
+    
+    def clear_color(self, value):
+        if self._recorder is not None:
+            self._recorder.append("clear_color", (value,))
+        if self._changed("clear_color", value):
+            self._backend.clear_color(value)
+    
+    def clear(self):
+        if self._recorder is not None:
+            self._recorder.append("clear", ())
+        self._calls += 1
+        self._backend.clear()
+    
+    def depth_mask(self, value):
+        if self._recorder is not None:
+            self._recorder.append("depth_mask", (value,))
+        if self._changed("depth_mask", bool(value)):
+            self._backend.depth_mask(value)
+    
+    def enable(self, capability):
+        if self._recorder is not None:
+            self._recorder.append("enable", (capability,))
+        if self._changed(("capability", capability), True):
+            self._backend.enable(capability)
+    
+    def disable(self, capability):
+        if self._recorder is not None:
+            self._recorder.append("disable", (capability,))
+        if self._changed(("capability", capability), False):
+            self._backend.disable(capability)
+    
+    def blend_func(self, source, destination):
+        if self._recorder is not None:
+            self._recorder.append("blend_func", (source, destination))
+        if self._changed("blend_func", (source, destination)):
+            self._backend.blend_func(source, destination)
+    
+    def set_uniform(self, uniforms, name, value):
+        if self._recorder is not None:
+            self._recorder.append("set_uniform", (uniforms, name, value))
+        # A UniformCache in front of the program drops unchanged values; only its uploads reach GL.
+        if isinstance(uniforms, UniformCache):
+            uploads = uniforms.uploads
+            self._backend.set_uniform(uniforms, name, value)
+            if uniforms.uploads == uploads:
+                self._skipped += 1
+                return
+        else:
+            self._backend.set_uniform(uniforms, name, value)
+        self._calls += 1
+    
+    def draw_arrays(self, mode, first, count):
+        if self._recorder is not None:
+            self._recorder.append("draw_arrays", (mode, first, count))
+        self._calls += 1
+        self._backend.draw_arrays(mode, first, count)
+    
+    def matches(self, values):
+        # Whether every (key, value) given is the tracked state, e.g. the state a command buffer expects.
+        for key, value in values.items():
+            current = self._state.get(key, _MISSING)
+            if current is not value and current != value:
+                return False
+        return True
+    
+    def count(self, calls, skipped):
+        # Calls made to the backend around the tracker, e.g. by a replayed command buffer.
+        self._calls += calls
+        self._skipped += skipped
+    
+    def release(self):
+        # Unbinds everything bound through the tracker, e.g. before handing GL to other code.
+        for slot in [key for key in self._state if key in (PROGRAM, VERTEX_ARRAY) or (isinstance(key, tuple) and key[0] == TEXTURE)]:
+            if self._state.pop(slot) is not None:
+                self._backend.unbind(slot)
+    
+    def invalidate(self):
+        self.release()
+        self._state.clear()
+    
+    def reset(self):
+        # Counters are per frame: keeps and returns the last frame's (calls, skipped) and starts over.
+        self._last = (self._calls, self._skipped)
+        self._calls = 0
+        self._skipped = 0
+        return self._last
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, self._calls, self._skipped)
@@ -0,0 +1,109 @@
+import collections
+
+import numpy as np
+
+DEFAULT_WINDOW = 8
+DEFAULT_HISTORY = 32
+
+# Drift is only estimated over at least this span of samples, and never beyond what crystal
+# oscillators plausibly do; over shorter spans the estimate mostly fits the delay jitter.
+DEFAULT_DRIFT_SPAN = 4000000000
+DEFAULT_MAX_DRIFT = 0.0002
+
+# Converged once successive estimates, and what is left to slew, are within this many nanoseconds.
+DEFAULT_CONVERGENCE = 1000000
+
+
+Sample = collections.namedtuple("Sample", ["offset", "delay", "local"])
+
+def sample(t0, t1, t2, t3):
+    # t0/t3: request sent/reply received on the local clock; t1/t2: request received/reply sent on the server.
+    offset = ((t1 - t0) + (t2 - t3)) // 2
+    delay = (t3 - t0) - (t2 - t1)
+    return Sample(offset, delay, (t0 + t3) // 2)
+
+
+class ClockSynchroniser(object):
+    def __init__(self, clock, window=DEFAULT_WINDOW, history=DEFAULT_HISTORY, drift_span=DEFAULT_DRIFT_SPAN, max_drift=DEFAULT_MAX_DRIFT, convergence=DEFAULT_CONVERGENCE):
+        super().__init__()
+        
+        self._clock = clock
+        self._drift_span = drift_span
+        self._max_drift = max_drift
+        self._convergence = convergence
+        
+        self._samples = collections.deque(maxlen=window)
+        self._history = collections.deque(maxlen=history)
+        
+        self._offset = None
+        self._drift = 0.0
+        self._correction = None
+    
+    @property
+    def clock(self):
+        return self._clock
+    
+    @property
+    def offset(self):
+        return self._offset
+    
+    @property
+    def drift(self):
+        return self._drift
+    
+    @property
+    def delay(self):
+        return min(s.delay for s in self._samples) if self._samples else None
+    
+    @property
+    def converged(self):
+        # Past the stepped estimates, with the last one close to the one before and little left to slew.
+        if len(self._samples) < self._samples.maxlen or self._correction is None:
+            return False
+        return self._correction < self._convergence and abs(self._clock.residual_ns) < self._convergence
+    
+    def _estimate_drift(self):
+        if len(self._history) < 4 or self._history[-1][0] - self._history[0][0] < self._drift_span:
+            return 0.0
+        values = np.array(self._history, dtype=np.float64)
+        x = values[:, 0] - values[0, 0]
+        y = values[:, 1] - values[0, 1]
+        x -= x.mean()
+        y -= y.mean()
+        variance = np.dot(x, x)
+        drift = float(np.dot(x, y) / variance) if variance > 0 else 0.0
+        return min(max(drift, -self._max_drift), self._max_drift)
+    
+    def add(self, t0, t1, t2, t3):
+        current = sample(t0, t1, t2, t3)
+        if current.delay < 0:
+            return None
+        
+        self._samples.append(current)
+        
+        # Minimum-delay filter: the sample with the least queuing has the least asymmetric error.
+        best = min(self._samples, key=lambda s: s.delay)
+        if not self._history or self._history[-1][0] != best.local:
+            self._history.append((best.local, best.offset))
+        
+        # Estimates are stepped to until the window is full, as there is nothing to be continuous
+        # with yet and the first samples are the noisiest; only later corrections are slewed.
+        step = len(self._samples) < self._samples.maxlen
+        
+        previous = self._offset
+        self._drift = self._estimate_drift()
+        self._offset = best.offset + int(self._drift * (t3 - best.local))
+        self._correction = None if previous is None else abs(self._offset - previous)
+        
+        self._clock.adjust(self._offset, self._drift, local=t3, step=step)
+        return current
+    
+    def reset(self):
+        self._samples.clear()
+        self._history.clear()
+        self._offset = None
+        self._drift = 0.0
+        self._correction = None
+    
+    def __str__(self):
+        return "{}({},{},{})".format(type(self).__name__, self._offset, self.delay, self._drift)
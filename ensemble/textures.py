@@ -0,0 +1,315 @@
+import logging
+
+import collections
+import concurrent.futures
+import time
+
+import numpy as np
+
+_logger = logging.getLogger(__name__.split(".").pop())
+
+DEFAULT_CAPACITY = 512 * 1024 * 1024
+DEFAULT_UPLOAD_BUDGET = 16 * 1024 * 1024
+DEFAULT_WORKERS = 4
+DEFAULT_RETRY = 1.0
+DEFAULT_MAX_RETRY = 60.0
+
+PLACEHOLDER = np.array([[[128, 128, 128, 255]]], dtype=np.uint8)
+
+
+def decode(path):
+    # Runs on a worker; module level so process pools can pickle it.
+    from PIL import Image
+    
+    with Image.open(path) as image:
+        pixels = np.asarray(image.convert("RGBA"), dtype=np.uint8)
+    # Rows bottom to top, as GL expects them.
+    return np.ascontiguousarray(pixels[::-1])
+
+
+class GLBackend(object):
+    def __init__(self):
+        super().__init__()
+        
+        from glue.gl import GL
+        
+        self._GL = GL
+    
+    def create(self, pixels):
+        GL = self._GL
+        height, width = pixels.shape[:2]
+        # Restores the previous binding, so the renderer's state tracker stays valid.
+        previous = GL.glGetIntegerv(GL.GL_TEXTURE_BINDING_2D)
+        handle = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, handle)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, GL.GL_RGBA8, width, height, 0, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, pixels)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR_MIPMAP_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+        GL.glGenerateMipmap(GL.GL_TEXTURE_2D)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, previous)
+        return Texture(handle, width, height)
+    
+    def delete(self, texture):
+        self._GL.glDeleteTextures([texture.handle])
+
+class NullBackend(object):
+    def __init__(self):
+        super().__init__()
+        
+        # Hands out fake textures and records what was created and deleted.
+        self._handle = 0
+        self.created = []
+        self.deleted = []
+    
+    def create(self, pixels):
+        self._handle += 1
+        height, width = pixels.shape[:2]
+        texture = Texture(self._handle, width, height)
+        self.created.append(texture)
+        return texture
+    
+    def delete(self, texture):
+        self.deleted.append(texture)
+
+
+class Texture(object):
+    def __init__(self, handle, width, height):
+        super().__init__()
+        
+        self._handle = handle
+        self._width = width
+        self._height = height
+    
+    @property
+    def handle(self):
+        return self._handle
+    
+    @property
+    def width(self):
+        return self._width
+    
+    @property
+    def height(self):
+        return self._height
+    
+    @property
+    def nbytes(self):
+        return self._width * self._height * 4
+    
+    def __str__(self):
+        return "{}({},{}x{})".format(type(self).__name__, self._handle, self._width, self._height)
+
+class Entry(object):
+    def __init__(self, cache, path):
+        super().__init__()
+        
+        self._cache = cache
+        self._path = path
+        
+        self._texture = None
+        self._references = 0
+        self._failed = False
+        # Failed decodes are retried from this time (time.monotonic()), backing off after each attempt.
+        self._attempts = 0
+        self._retry = None
+    
+    @property
+    def path(self):
+        return self._path
+    
+    @property
+    def texture(self):
+        # The shared placeholder until the image has been decoded and uploaded.
+        return self._cache.placeholder if self._texture is None else self._texture
+    
+    @property
+    def ready(self):
+        return self._texture is not None
+    
+    @property
+    def failed(self):
+        return self._failed
+    
+    @property
+    def references(self):
+        return self._references
+    
+    def release(self):
+        self._cache.release(self)
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, self._path, self._references)
+
+
+class TextureCache(object):
+    def __init__(self, capacity=DEFAULT_CAPACITY, budget=DEFAULT_UPLOAD_BUDGET, workers=DEFAULT_WORKERS, processes=False, backend=None, decoder=decode, retry=DEFAULT_RETRY, max_retry=DEFAULT_MAX_RETRY):
+        super().__init__()
+        
+        self._capacity = capacity
+        self._budget = budget
+        self._workers = workers
+        self._processes = processes
+        self._backend = backend
+        self._decoder = decoder
+        self._retry = retry
+        self._max_retry = max_retry
+        
+        self._executor = None
+        self._placeholder = None
+        
+        # Entries by path; those nobody references are also kept in least recently used order,
+        # and are the only ones evicted once the uploaded textures exceed the capacity.
+        self._entries = {}
+        self._unused = collections.OrderedDict()
+        self._size = 0
+        
+        # Decoded images, appended by worker callbacks and uploaded on the GL thread.
+        self._decoded = collections.deque()
+        self._pending = 0
+        # Entries whose decode failed, by path, until they are decoded again.
+        self._retries = {}
+        
+        self._hits = 0
+        self._misses = 0
+        self._uploads = 0
+        self._evictions = 0
+    
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = GLBackend()
+        return self._backend
+    
+    @property
+    def placeholder(self):
+        if self._placeholder is None:
+            self._placeholder = self.backend.create(PLACEHOLDER)
+        return self._placeholder
+    
+    @property
+    def size(self):
+        return self._size
+    
+    @property
+    def pending(self):
+        # Images requested but not yet uploaded.
+        return self._pending
+    
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "size": self._size,
+            "pending": self.pending,
+            "failed": len(self._retries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "uploads": self._uploads,
+            "evictions": self._evictions,
+        }
+    
+    def _submit(self, entry):
+        if self._executor is None:
+            if self._processes:
+                self._executor = concurrent.futures.ProcessPoolExecutor(self._workers)
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(self._workers, thread_name_prefix="TextureCache")
+        self._pending += 1
+        future = self._executor.submit(self._decoder, entry.path)
+        future.add_done_callback(lambda future: self._decoded.append((entry, future)))
+    
+    def acquire(self, path):
+        # Returns at once; the entry shows the placeholder until update() has uploaded the image.
+        entry = self._entries.get(path)
+        if entry is None:
+            self._misses += 1
+            entry = self._entries[path] = Entry(self, path)
+            self._submit(entry)
+        else:
+            self._hits += 1
+            self._unused.pop(path, None)
+        entry._references += 1
+        return entry
+    
+    def release(self, entry):
+        if entry._references <= 0:
+            raise ValueError("Texture {} released more often than acquired.".format(entry.path))
+        entry._references -= 1
+        if entry._references == 0 and self._entries.get(entry.path) is entry:
+            self._unused[entry.path] = entry
+            self._evict()
+    
+    def _remove(self, entry):
+        self._entries.pop(entry.path, None)
+        self._unused.pop(entry.path, None)
+        self._retries.pop(entry.path, None)
+        if entry._texture is not None:
+            self._size -= entry._texture.nbytes
+            self.backend.delete(entry._texture)
+            entry._texture = None
+    
+    def _evict(self):
+        while self._size > self._capacity and self._unused:
+            path, entry = self._unused.popitem(last=False)
+            self._remove(entry)
+            self._evictions += 1
+    
+    def update(self, budget=None):
+        # Called once per frame on the GL thread. Uploads stop once the frame's budget (in bytes) is
+        # spent, but at least one image is uploaded per frame so larger ones are not held back forever.
+        budget = self._budget if budget is None else budget
+        spent = 0
+        uploads = 0
+        
+        if self._retries:
+            now = time.monotonic()
+            # Only images still in use; one acquired again later is retried then.
+            for entry in [entry for entry in self._retries.values() if entry._references and entry._retry <= now]:
+                del self._retries[entry.path]
+                self._submit(entry)
+        
+        while self._decoded and (uploads == 0 or spent < budget):
+            entry, future = self._decoded.popleft()
+            self._pending -= 1
+            # Dropped while decoding, e.g. by clear().
+            if self._entries.get(entry.path) is not entry:
+                continue
+            try:
+                pixels = future.result()
+            except Exception as e:
+                # The file may still be being written or copied into place.
+                delay = min(self._retry * 2**entry._attempts, self._max_retry)
+                entry._failed = True
+                entry._attempts += 1
+                entry._retry = time.monotonic() + delay
+                self._retries[entry.path] = entry
+                _logger.warning("Failed to decode %s, retrying in %.1f s: %s", entry.path, delay, e)
+                continue
+            entry._failed = False
+            entry._attempts = 0
+            entry._texture = self.backend.create(pixels)
+            self._size += entry._texture.nbytes
+            spent += entry._texture.nbytes
+            uploads += 1
+        self._uploads += uploads
+        if uploads:
+            self._evict()
+        return uploads
+    
+    def clear(self):
+        # Deletes every texture, e.g. before the GL context goes away. Entries still held keep showing
+        # the placeholder; acquiring the path again loads it anew.
+        for entry in list(self._entries.values()):
+            self._remove(entry)
+        if self._placeholder is not None:
+            self.backend.delete(self._placeholder)
+            self._placeholder = None
+    
+    def close(self):
+        self.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, len(self._entries), self._size)
@@ -1,21 +1,44 @@
+import fractions
 import time
 
-from glue import gl, wgl
-
 DEFAULT_FRAMES_PER_SECOND = 60
 
+NANOSECONDS_PER_SECOND = 1000000000
+
+DEFAULT_SLEW_RATE = 0.0005
+DEFAULT_STEP_THRESHOLD = 125000000
+
+
+def to_nanoseconds(value):
+    return int(round(value * NANOSECONDS_PER_SECOND))
+
+def to_seconds(value):
+    return value / NANOSECONDS_PER_SECOND
+
+def _frame_rate(frames_per_second):
+    # Rational frame rate, so frame times stay exact integers (e.g. 59.94 Hz -> 2997/50).
+    return fractions.Fraction(frames_per_second).limit_denominator(1001)
+
 
 class VirtualClock(object):
     def __init__(self):
-        self._time = 0.0
+        self._time = 0
     
     @property
-    def time(self):
+    def time_ns(self):
         return self._time
     
+    @time_ns.setter
+    def time_ns(self, value):
+        self._time = int(value)
+    
+    @property
+    def time(self):
+        return to_seconds(self._time)
+    
     @time.setter
     def time(self, value):
-        self._time = value
+        self._time = to_nanoseconds(value)
     
     def tick(self):
         pass
@@ -24,9 +47,52 @@ class VirtualClock(object):
         return "{}({})".format(type(self).__name__, self.time)
 
 class SystemClock(object):
+    @property
+    def time_ns(self):
+        return time.time_ns()
+    
     @property
     def time(self):
-        return time.time()
+        return to_seconds(self.time_ns)
+    
+    def tick(self):
+        pass
+    
+    def __str__(self):
+        return "{}({})".format(type(self).__name__, self.time)
+
+class MonotonicClock(object):
+    def __init__(self, origin=None):
+        # Anchored to wall time once, so readings stay comparable across nodes but never jump; or to
+        # a given origin, to carry on from another clock over the same counter (see SharedClock).
+        self._origin = time.time_ns() - time.perf_counter_ns() if origin is None else origin
+    
+    @property
+    def time_ns(self):
+        return self._origin + time.perf_counter_ns()
+    
+    @property
+    def time(self):
+        return to_seconds(self.time_ns)
+    
+    def tick(self):
+        pass
+    
+    def __str__(self):
+        return "{}({})".format(type(self).__name__, self.time)
+
+class SharedClock(object):
+    def __init__(self, host):
+        # Follows the clock of the process leading this host (see sharing.Host).
+        self._host = host
+    
+    @property
+    def time_ns(self):
+        return time.perf_counter_ns() + self._host.offset_ns
+    
+    @property
+    def time(self):
+        return to_seconds(self.time_ns)
     
     def tick(self):
         pass
@@ -35,17 +101,68 @@ class SystemClock(object):
         return "{}({})".format(type(self).__name__, self.time)
 
 class SynchronisedClock(object):
-    def __init__(self, clock):
+    def __init__(self, clock, slew_rate=DEFAULT_SLEW_RATE, step_threshold=DEFAULT_STEP_THRESHOLD):
         self._clock = clock
-        self._delta = 0.0
+        
+        self._slew_rate = slew_rate
+        self._step_threshold = step_threshold
+        
+        # (reference, delta, remaining, drift): the offset at the reference time, the part of the
+        # last correction still to be slewed in, and the estimated rate difference.
+        self._state = (0, 0, 0, 0.0)
+    
+    @property
+    def clock(self):
+        return self._clock
+    
+    @property
+    def drift(self):
+        return self._state[3]
+    
+    def _delta(self, local):
+        reference, delta, remaining, drift = self._state
+        elapsed = local - reference
+        slewed = min(abs(remaining), int(elapsed * self._slew_rate))
+        return delta + int(drift * elapsed) + (slewed if remaining >= 0 else -slewed)
+    
+    @property
+    def delta_ns(self):
+        return self._delta(self._clock.time_ns)
+    
+    @property
+    def time_ns(self):
+        local = self._clock.time_ns
+        return local + self._delta(local)
+    
+    @time_ns.setter
+    def time_ns(self, value):
+        local = self._clock.time_ns
+        self._state = (local, int(value) - local, 0, 0.0)
     
     @property
     def time(self):
-        return self._clock.time + self._delta
+        return to_seconds(self.time_ns)
     
     @time.setter
     def time(self, value):
-        self._delta = value - self._clock.time
+        self.time_ns = to_nanoseconds(value)
+    
+    def adjust(self, delta, drift=0.0, local=None, step=False):
+        # Slews towards the new offset instead of stepping, unless asked to step (e.g. for a first
+        # estimate, which there is nothing to be continuous with) or the error is too large.
+        local = self._clock.time_ns if local is None else local
+        current = self._delta(local)
+        error = int(delta) - current
+        if step or abs(error) > self._step_threshold:
+            current, error = int(delta), 0
+        self._state = (local, current, error, drift)
+    
+    @property
+    def residual_ns(self):
+        # The part of the last correction still to be slewed in.
+        reference, delta, remaining, drift = self._state
+        slewed = min(abs(remaining), int((self._clock.time_ns - reference) * self._slew_rate))
+        return remaining - slewed if remaining >= 0 else remaining + slewed
     
     def tick(self):
         self._clock.tick()
@@ -58,17 +175,25 @@ class FrameClock(object):
         super().__init__()
         
         self._frames_per_second = frames_per_second
-        self._seconds_per_frame = 1.0/frames_per_second
+        self._frame_rate = _frame_rate(frames_per_second)
         
         self._frame = 0
     
+    @property
+    def time_ns(self):
+        return self._frame * NANOSECONDS_PER_SECOND * self._frame_rate.denominator // self._frame_rate.numerator
+    
+    @time_ns.setter
+    def time_ns(self, value):
+        self._frame = int(value) * self._frame_rate.numerator // (NANOSECONDS_PER_SECOND * self._frame_rate.denominator)
+    
     @property
     def time(self):
-        return self._frame * self._seconds_per_frame
+        return to_seconds(self.time_ns)
     
     @time.setter
     def time(self, value):
-        self._frame = int(value * self._frames_per_second)
+        self.time_ns = to_nanoseconds(value)
     
     def tick(self):
         self._frame += 1
@@ -81,29 +206,61 @@ class SwapGroupClock(object):
         super().__init__()
         
         self._frames_per_second = frames_per_second
-        self._seconds_per_frame = 1.0/frames_per_second
+        self._frame_rate = _frame_rate(frames_per_second)
         
         self._frame = 0
         
+        from glue import wgl
+        
+        self._wgl = wgl
         self._hdc = wgl.get_current_dc()
     
+    @property
+    def time_ns(self):
+        return self._frame * NANOSECONDS_PER_SECOND * self._frame_rate.denominator // self._frame_rate.numerator
+    
     @property
     def time(self):
-        return self._frame * self._seconds_per_frame
+        return to_seconds(self.time_ns)
     
     def tick(self):
-        self._frame = wgl.query_frame_count(self._hdc)
+        self._frame = self._wgl.query_frame_count(self._hdc)
     
     def reset(self):
         try:
             # TODO: This only succeeds on master.
-            wgl.reset_frame_count(self._hdc)
+            self._wgl.reset_frame_count(self._hdc)
         except RuntimeError:
             pass
     
     def __str__(self):
         return "{}({},{})".format(type(self).__name__, self._frame, self.time)
 
+class BarrierClock(object):
+    def __init__(self, barrier, frames_per_second=DEFAULT_FRAMES_PER_SECOND):
+        super().__init__()
+        
+        self._barrier = barrier
+        
+        self._frames_per_second = frames_per_second
+        self._frame_rate = _frame_rate(frames_per_second)
+        
+        self._frame = 0
+    
+    @property
+    def time_ns(self):
+        return self._frame * NANOSECONDS_PER_SECOND * self._frame_rate.denominator // self._frame_rate.numerator
+    
+    @property
+    def time(self):
+        return to_seconds(self.time_ns)
+    
+    def tick(self):
+        self._frame = self._barrier.frame
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, self._frame, self.time)
+
 
 class Timer(object):
     def __init__(self, clock=None):
@@ -113,6 +270,12 @@ class Timer(object):
         
         self._start = None
         self._pause = None
+        
+        self._epoch = 0
+    
+    @property
+    def epoch(self):
+        return self._epoch
     
     @property
     def started(self):
@@ -122,38 +285,58 @@ class Timer(object):
     def paused(self):
         return not self._pause is None
     
+    @property
+    def state(self):
+        return (self._start, self._pause, self._epoch)
+    
+    @state.setter
+    def state(self, value):
+        self._start, self._pause, self._epoch = value
+    
+    def _time(self, time):
+        return self._clock.time_ns if time is None else to_nanoseconds(time)
+    
+    @property
+    def current_ns(self):
+        return self._pause if self.paused else self._clock.time_ns
+    
     @property
     def current(self):
-        #return self._clock.time % (24.0*60.0*60.0)
-        return self._pause if self.paused else self._clock.time
+        return to_seconds(self.current_ns)
     
     @property
-    def elapsed(self):
+    def elapsed_ns(self):
         if self.started:
-            return self.current - self._start
-        return 0.0
+            return self.current_ns - self._start
+        return 0
+    
+    @property
+    def elapsed(self):
+        return to_seconds(self.elapsed_ns)
     
     def start(self, time=None):
         value = (self._pause - self._start) if self.started and self.paused else 0
-        time = self._clock.time if time is None else time
+        time = self._time(time)
         self._start = time - value
         self._pause = None
     
     def pause(self, time=None):
-        time = self._clock.time if time is None else time
+        time = self._time(time)
         self._pause = time
     
     def stop(self, time=None):
-        time = self._clock.time if time is None else time
+        time = self._time(time)
         self._start = None
         self._pause = None
+        self._epoch += 1
     
     def seek(self, value, time=None):
-        time = self._clock.time if time is None else time
+        time = self._time(time)
         if self.started:
-            self._start = time - value
+            self._start = time - to_nanoseconds(value)
         if self.paused:
             self._pause = time
+        self._epoch += 1
     
     def toggle(self, time=None):
         if not self.started or self.paused:
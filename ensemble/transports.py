@@ -0,0 +1,244 @@
+import logging
+
+import asyncio
+import collections
+import heapq
+import itertools
+import socket
+import struct
+import threading
+
+from . import osc
+
+_logger = logging.getLogger(__name__.split(".").pop())
+
+DEFAULT_GROUP = "224.0.0.1"
+DEFAULT_TTL = 1
+
+LIBLO = "liblo"
+ASYNCIO = "asyncio"
+
+
+def open_multicast_socket(group, port, ttl=DEFAULT_TTL, loopback=True):
+    result = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    result.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        result.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    result.bind(("", port))
+    membership = struct.pack("4sl", socket.inet_aton(group), socket.INADDR_ANY)
+    result.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    result.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+    result.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1 if loopback else 0)
+    result.setblocking(False)
+    return result
+
+
+class Transport(object):
+    def __init__(self, port, group=DEFAULT_GROUP):
+        super().__init__()
+        
+        self._port = port
+        self._group = group
+        
+        self._methods = {}
+        # Appends and pops on a deque are atomic, so the network thread only ever enqueues and
+        # callbacks run on whichever thread calls drain(), normally the render thread at frame start.
+        self._queue = collections.deque()
+        
+        # Timetagged commands waiting for their frame, ordered by (timetag, arrival).
+        self._scheduled = []
+        self._sequence = itertools.count()
+    
+    @property
+    def port(self):
+        return self._port
+    
+    @property
+    def group(self):
+        return self._group
+    
+    def add_method(self, path, typespec, callback, immediate=False):
+        # Immediate callbacks run on the network thread as messages arrive (for receive timestamps);
+        # they must be cheap and thread-safe, and ignore timetags.
+        self._methods[(path, typespec)] = (callback, immediate)
+    
+    def _received(self, path, types, args, src, timetag=None):
+        method = self._methods.get((path, types)) or self._methods.get((path, None))
+        if method is None:
+            _logger.debug("Ignored %s,%s from %s", path, types, src)
+            return
+        callback, immediate = method
+        if immediate:
+            self._dispatch(callback, path, args, types, src)
+        else:
+            self._queue.append((timetag, callback, path, args, types, src))
+    
+    def _dispatch(self, callback, path, args, types, src):
+        try:
+            callback(path, args, types, src)
+        except Exception:
+            _logger.exception("Failed to handle %s", path)
+    
+    def drain(self, time=None):
+        # Immediate messages run now; timetagged ones run on the first drain whose frame time
+        # (in seconds, like the timetags) has reached them, so every node applies them on the same frame.
+        count = 0
+        queue = self._queue
+        scheduled = self._scheduled
+        while queue:
+            timetag, callback, path, args, types, src = queue.popleft()
+            if timetag is None:
+                self._dispatch(callback, path, args, types, src)
+                count += 1
+            else:
+                heapq.heappush(scheduled, (timetag, next(self._sequence), callback, path, args, types, src))
+        while scheduled and (time is None or scheduled[0][0] <= time):
+            _, _, callback, path, args, types, src = heapq.heappop(scheduled)
+            self._dispatch(callback, path, args, types, src)
+            count += 1
+        return count
+    
+    @property
+    def pending(self):
+        return len(self._scheduled)
+    
+    def send(self, path, *args):
+        self.send_to((self._group, self._port), path, *args)
+    
+    def send_to(self, address, path, *args):
+        raise NotImplementedError()
+    
+    def send_bundle(self, timetag, *messages):
+        self.send_bundle_to((self._group, self._port), timetag, *messages)
+    
+    def send_bundle_to(self, address, timetag, *messages):
+        raise NotImplementedError()
+    
+    def start(self):
+        pass
+    
+    def stop(self):
+        pass
+
+
+class LibloTransport(Transport):
+    def __init__(self, port, group=DEFAULT_GROUP, ttl=DEFAULT_TTL):
+        super().__init__(port, group)
+        
+        import liblo
+        
+        self._liblo = liblo
+        
+        self._server = liblo.ServerThread(port, group=group)
+        self._server.add_method(None, None, self._on_message)
+        # liblo reports each bundle's timetag around the messages it contains, all on the server thread;
+        # nested bundles nest these calls, and their messages take the innermost timetag.
+        self._server.add_bundle_handlers(self._on_bundle_start, self._on_bundle_end)
+        self._timetags = [None]
+        
+        self._broadcast = liblo.Address(group, port, liblo.UDP)
+        self._broadcast.ttl = ttl
+        
+        self._addresses = {}
+    
+    def _on_bundle_start(self, timetag, user_data):
+        # The "immediately" timetag (0, 1) arrives as 1/2**32 seconds.
+        self._timetags.append(timetag if timetag >= 1.0 else None)
+    
+    def _on_bundle_end(self, user_data):
+        if len(self._timetags) > 1:
+            self._timetags.pop()
+    
+    def _on_message(self, path, args, types, src):
+        self._received(path, types, args, (src.hostname, src.port), self._timetags[-1])
+    
+    def _address(self, address):
+        if address == (self._group, self._port):
+            return self._broadcast
+        try:
+            return self._addresses[address]
+        except KeyError:
+            result = self._addresses[address] = self._liblo.Address(address[0], address[1], self._liblo.UDP)
+            return result
+    
+    def send_to(self, address, path, *args):
+        self._server.send(self._address(address), path, *args)
+    
+    def send_bundle_to(self, address, timetag, *messages):
+        bundle = self._liblo.Bundle(timetag, *[self._liblo.Message(*message) for message in messages])
+        self._server.send(self._address(address), bundle)
+    
+    def start(self):
+        self._server.start()
+    
+    def stop(self):
+        self._server.stop()
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, transport):
+        super().__init__()
+        
+        self._transport = transport
+    
+    def datagram_received(self, data, address):
+        try:
+            messages = osc.decode_packet(data)
+        except osc.DecodeError as e:
+            _logger.warning("Dropped malformed packet from %s: %s", address, e)
+            return
+        for timetag, path, types, args in messages:
+            self._transport._received(path, types, args, address, timetag)
+
+class AsyncioTransport(Transport):
+    def __init__(self, port, group=DEFAULT_GROUP, ttl=DEFAULT_TTL):
+        super().__init__(port, group)
+        
+        self._ttl = ttl
+        
+        self._socket = None
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+    
+    def _run(self):
+        loop = self._loop
+        asyncio.set_event_loop(loop)
+        endpoint = loop.create_datagram_endpoint(lambda: _DatagramProtocol(self), sock=self._socket)
+        transport, _ = loop.run_until_complete(endpoint)
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            transport.close()
+            loop.run_until_complete(asyncio.sleep(0))
+            loop.close()
+    
+    def send_to(self, address, path, *args):
+        self._socket.sendto(osc.encode_message(path, *args), address)
+    
+    def send_bundle_to(self, address, timetag, *messages):
+        self._socket.sendto(osc.encode_bundle(timetag, *messages), address)
+    
+    def start(self):
+        self._socket = open_multicast_socket(self._group, self._port, ttl=self._ttl)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="AsyncioTransport", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+    
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+        self._thread = None
+        self._socket = None
+        self._ready.clear()
+
+
+def create(network):
+    if network.transport == ASYNCIO:
+        return AsyncioTransport(network.port)
+    return LibloTransport(network.port)
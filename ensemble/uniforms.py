@@ -0,0 +1,65 @@
+import numpy as np
+
+
+def _key(value):
+    # Small arrays compare by dtype, shape and raw bytes; this is cheaper than an elementwise
+    # comparison at these sizes and treats identical NaNs as unchanged.
+    if isinstance(value, np.ndarray):
+        return (value.dtype.str, value.shape, value.tobytes())
+    if isinstance(value, (list, tuple)):
+        return _key(np.asarray(value))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class UniformCache(object):
+    def __init__(self, uniforms):
+        super().__init__()
+        
+        # Wraps a program's uniforms mapping; the values a program holds persist across binds,
+        # so one cache per program stays valid until the program is relinked.
+        self._uniforms = uniforms
+        self._values = {}
+        
+        self._uploads = 0
+        self._skipped = 0
+    
+    @property
+    def uploads(self):
+        return self._uploads
+    
+    @property
+    def skipped(self):
+        return self._skipped
+    
+    def __getitem__(self, name):
+        return self._uniforms[name]
+    
+    def __setitem__(self, name, value):
+        key = _key(value)
+        try:
+            if self._values[name] == key:
+                self._skipped += 1
+                return
+        except KeyError:
+            pass
+        self._uniforms[name] = value
+        self._values[name] = key
+        self._uploads += 1
+    
+    def invalidate(self, name=None):
+        if name is None:
+            self._values.clear()
+        else:
+            self._values.pop(name, None)
+    
+    def reset(self):
+        # Counters are per frame: call once before setting the frame's uniforms.
+        uploads, skipped = self._uploads, self._skipped
+        self._uploads = 0
+        self._skipped = 0
+        return uploads, skipped
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, self._uploads, self._skipped)
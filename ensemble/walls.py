@@ -0,0 +1,131 @@
+import functools as ft
+
+import numpy as np
+
+DEFAULT_NEAR = 0.1
+DEFAULT_FAR = 100.0
+DEFAULT_FIELD_OF_VIEW = 60.0
+
+
+def _readonly(value):
+    value.flags.writeable = False
+    return value
+
+def _frustums(left, right, bottom, top, near, far, dtype=np.float32):
+    # Batched glFrustum, transposed to the row-vector convention of mathematics.matrices.
+    result = np.zeros((len(left), 4, 4), dtype=dtype)
+    result[:, 0, 0] = 2.0*near/(right - left)
+    result[:, 1, 1] = 2.0*near/(top - bottom)
+    result[:, 2, 0] = (right + left)/(right - left)
+    result[:, 2, 1] = (top + bottom)/(top - bottom)
+    result[:, 2, 2] = -(far + near)/(far - near)
+    result[:, 2, 3] = -1.0
+    result[:, 3, 2] = -2.0*far*near/(far - near)
+    return result
+
+def _tex_coord_transforms(origins, sizes, dtype=np.float32):
+    # Equivalent to translate(origin)*scale(size) per tile, in texture coordinates.
+    result = np.zeros((len(origins), 4, 4), dtype=dtype)
+    result[:, 0, 0] = sizes[:, 0]
+    result[:, 1, 1] = sizes[:, 1]
+    result[:, 2, 2] = 1
+    result[:, 3, 3] = 1
+    result[:, 3, :2] = origins
+    return result
+
+
+class Wall(object):
+    def __init__(self, shape, canvas, origins, sizes, viewports, projections, tex_coord_transforms):
+        super().__init__()
+        
+        self.shape = shape
+        self.canvas = canvas
+        self.origins = origins
+        self.sizes = sizes
+        self.viewports = viewports
+        self.projections = projections
+        self.tex_coord_transforms = tex_coord_transforms
+    
+    def tile(self, index):
+        return int(index[0]) + int(index[1])*int(self.shape[0])
+    
+    def viewport(self, index):
+        return self.viewports[self.tile(index)]
+    
+    def projection(self, index):
+        return self.projections[self.tile(index)]
+    
+    def tex_coord_transform(self, index):
+        return self.tex_coord_transforms[self.tile(index)]
+    
+    def __len__(self):
+        return len(self.viewports)
+    
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, self.shape.tolist(), self.canvas.tolist())
+
+
+@ft.lru_cache(maxsize=32)
+def _solve(resolution, shape, bezel, tiles, near, far, field_of_view):
+    resolution = np.array(resolution, dtype=np.int64)
+    shape = np.array(shape, dtype=np.int64)
+    bezel = np.array(bezel, dtype=np.int64)
+    
+    count = int(np.prod(shape))
+    
+    ys, xs = np.divmod(np.arange(count), shape[0])
+    indices = np.stack([xs, ys], axis=-1)
+    
+    sizes = np.empty((count, 2), dtype=np.int64)
+    sizes[...] = resolution // shape
+    offsets = np.zeros((count, 2), dtype=np.int64)
+    viewports = np.zeros((count, 4), dtype=np.int64)
+    viewports[:, 2:] = sizes
+    
+    for index, size, offset, viewport in tiles:
+        tile = index[0] + index[1]*shape[0]
+        if not 0 <= tile < count:
+            continue
+        if size is not None:
+            sizes[tile] = size
+            viewports[tile, 2:] = size
+        if offset is not None:
+            offsets[tile] = offset
+        if viewport is not None:
+            viewports[tile] = viewport
+    
+    # Tiles sit on a virtual canvas that includes the bezels, so content stays continuous across them.
+    pitch = resolution // shape + bezel
+    origins = indices*pitch + offsets
+    canvas = np.max(origins + sizes, axis=0)
+    
+    lower = origins/canvas
+    upper = (origins + sizes)/canvas
+    
+    top = near*np.tan(np.radians(field_of_view)/2.0)
+    right = top*canvas[0]/canvas[1]
+    
+    projections = _frustums(
+        -right + 2.0*right*lower[:, 0], -right + 2.0*right*upper[:, 0],
+        -top + 2.0*top*lower[:, 1], -top + 2.0*top*upper[:, 1],
+        near, far)
+    
+    return Wall(
+        _readonly(shape.astype(np.int32)),
+        _readonly(canvas.astype(np.int32)),
+        _readonly(origins.astype(np.int32)),
+        _readonly(sizes.astype(np.int32)),
+        _readonly(viewports.astype(np.int32)),
+        _readonly(projections),
+        _readonly(_tex_coord_transforms(lower, upper - lower)),
+    )
+
+def _vector_key(value):
+    return None if value is None else tuple(int(x) for x in value)
+
+def solve(resolution, shape, bezel=(0, 0), tiles=(), near=DEFAULT_NEAR, far=DEFAULT_FAR, field_of_view=DEFAULT_FIELD_OF_VIEW):
+    tiles = tuple((_vector_key(tile.index), _vector_key(tile.resolution), _vector_key(tile.offset), _vector_key(tile.viewport)) for tile in tiles)
+    return _solve(_vector_key(resolution), _vector_key(shape), _vector_key(bezel), tiles, float(near), float(far), float(field_of_view))
+
+def from_configuration(video, near=DEFAULT_NEAR, far=DEFAULT_FAR, field_of_view=DEFAULT_FIELD_OF_VIEW):
+    return solve(video.global_.resolution, video.global_.shape, video.global_.bezel, video.global_.tiles, near=near, far=far, field_of_view=field_of_view)
@@ -12,9 +12,7 @@ from glue import gl, wgl
 from glue.gl import GL
 from glue.wgl import WGL
 
-import liblo
-
-from . import applications, renderers
+from . import applications, renderers, timers, transports
 
 _logger = logging.getLogger(__name__.split(".").pop())
 
@@ -66,7 +64,7 @@ class SceneWidget(QtWidgets.QOpenGLWidget):
         if self._active:
             self.heartbeat = QtCore.QTimer()
             self.heartbeat.timeout.connect(self.update)
-            self.heartbeat.start(60.0/1000)
+            self.heartbeat.start(int(1000.0/timers.DEFAULT_FRAMES_PER_SECOND))
     
     def initAudio(self):
         pass
@@ -92,22 +90,21 @@ class SceneWidget(QtWidgets.QOpenGLWidget):
         self.setFormat(format)
     
     def initNetwork(self):
-        def onPlay(path, args):
+        def onPlay(path, args, types, src):
             self.timer.start(args[0])
-        def onPause(path, args):
+        def onPause(path, args, types, src):
             self.timer.pause(args[0])
-        def onStop(path, args):
+        def onStop(path, args, types, src):
             self.timer.stop(args[0])
-        def onSeek(path, args):
+        def onSeek(path, args, types, src):
             self.timer.seek(args[0], args[1])
         
-        self.server = liblo.ServerThread(self.network.port, group="224.0.0.1")
-        self.server.add_method("/play", "t", onPlay)
-        self.server.add_method("/pause", "t", onPause)
-        self.server.add_method("/stop", "t", onStop)
-        self.server.add_method("/seek", "tt", onSeek)
-        #self.server.add_method(None, None, self.onMessageReceived)
-        self.server.start()
+        self._transport = transports.create(self.network)
+        self._transport.add_method("/play", "t", onPlay)
+        self._transport.add_method("/pause", "t", onPause)
+        self._transport.add_method("/stop", "t", onStop)
+        self._transport.add_method("/seek", "tt", onSeek)
+        self._transport.start()
     
     def initializeGL(self):
         debugLogInfo()
@@ -116,5 +113,7 @@ class SceneWidget(QtWidgets.QOpenGLWidget):
             self._renderer.create(self._scene)
     
     def paintGL(self):
+        self._transport.drain(self.timer._clock.time)
+        
         if self._renderer:
             self._renderer.update(self._scene)
@@ -1,5 +1,6 @@
 import logging
 
+import concurrent.futures
 import math
 
 from PyQt5 import QtCore, QtGui, QtNetwork
@@ -11,12 +12,15 @@ from glue import gl, wgl
 from glue.gl import GL
 from glue.wgl import WGL
 
-import liblo
-
-from . import applications, configurations, observables, renderers, timers
+from . import applications, barriers, configurations, launchers, metrics, observables, pacers, programs, renderers, sharing, synchronisers, timers, transports
 
 _logger = logging.getLogger(__name__.split(".").pop())
 
+DEFAULT_SYNCHRONISATION_INTERVAL = 250
+DEFAULT_COMMAND_FRAMES = 3
+DEFAULT_HEALTH_INTERVAL = 100
+DEFAULT_STATISTICS_INTERVAL = 1000
+
 """
 import OpenGL.WGL.ARB.extensions_string
 import OpenGL.WGL.EXT.extensions_string
@@ -122,6 +126,8 @@ class SceneWindow(QtGui.QOpenGLWindow):
         
         self._active = True
         self._extensions = None
+        self._barrier = None
+        self._pacer = None
         
         self._configuration = configuration
         self._scene = scene
@@ -133,9 +139,18 @@ class SceneWindow(QtGui.QOpenGLWindow):
         self.onMousePress = observables.Observable()
         self.onMouseRelease = observables.Observable()
         
+        self._reporter = launchers.reporter(self.network.node)
+        
+        # Stored program binaries, when enabled, are read while the window is still being set up.
+        programs.cache().enabled = self.video.binaries
+        programs.cache().warm()
+        
         self.initAudio()
         self.initVideo()
         self.initNetwork()
+        
+        if self._reporter:
+            self._reporter.report(launchers.CONFIG)
     
     def initAudio(self):
         pass
@@ -161,32 +176,103 @@ class SceneWindow(QtGui.QOpenGLWindow):
         self.setFormat(format)
     
     def initNetwork(self):
-        def onPlay(path, args):
+        def onPlay(path, args, types, src):
             self.timer.start(args[0])
-        def onPause(path, args):
+            if self._reporter:
+                self._reporter.finish()
+        def onPause(path, args, types, src):
             self.timer.pause(args[0])
-        def onStop(path, args):
+        def onStop(path, args, types, src):
             self.timer.stop(args[0])
-        def onSeek(path, args):
+        def onSeek(path, args, types, src):
             self.timer.seek(args[0], args[1])
         
-        self.server = liblo.ServerThread(self.network.port, group="224.0.0.1")
-        self.server.add_method("/play", "t", onPlay)
-        self.server.add_method("/pause", "t", onPause)
-        self.server.add_method("/stop", "t", onStop)
-        self.server.add_method("/seek", "tt", onSeek)
-        #self.server.add_method(None, None, self.onMessageReceived)
-        self.server.start()
-        
-        self._broadcast = liblo.Address("224.0.0.1", self.network.port, liblo.UDP)
-        self._broadcast.ttl = 1
+        def onLaunchPlay(path, args, types, src):
+            if self._reporter:
+                self._reporter.finish()
+            self.sendCommand("/play")
+        
+        def onSyncRequest(path, args, types, src):
+            # The real clock: with pacing on, the timer's clock holds the predicted present time.
+            t1 = self._now()
+            self._transport.send_to(src, "/sync/reply", ('h', args[0]), ('h', t1), ('h', self._now()))
+        def onSyncReply(path, args, types, src):
+            if self._synchroniser:
+                t3 = self._synchroniser.clock.clock.time_ns
+                self._synchroniser.add(args[0], args[1], args[2], t3)
+        
+        def onTime(path, args, types, src):
+            if args[2] != self.network.node:
+                self._monitor.received(args[2], args[3], args[1], timers.to_nanoseconds(args[0]), self._now())
+        def onHealth(path, args, types, src):
+            if args[0] != self.network.node:
+                self._monitor.received(args[0], args[1], args[2], args[3], self._now())
+        
+        def lead():
+            # Messages are queued by the network thread and handled at the start of each frame.
+            self._transport = transports.create(self.network)
+            self._transport.add_method("/play", "t", onPlay)
+            self._transport.add_method("/pause", "t", onPause)
+            self._transport.add_method("/stop", "t", onStop)
+            self._transport.add_method("/seek", "tt", onSeek)
+            if self.network.timeserver:
+                self._transport.add_method("/launch/play", "", onLaunchPlay)
+            # Synchronisation is timestamped on arrival rather than when the frame drains the queue.
+            if self.network.timeserver:
+                self._transport.add_method("/sync/request", "h", onSyncRequest, immediate=True)
+            self._transport.add_method("/sync/reply", "hhh", onSyncReply, immediate=True)
+            self._transport.add_method("/time", "thii", onTime, immediate=True)
+            self._transport.add_method("/health", "iihh", onHealth, immediate=True)
+            self._transport.start()
+        
+        self._synchroniser = None
+        self._monitor = metrics.Monitor()
+        self._transport = None
+        self._lead = lead
+        
+        # Other processes on this host follow the leader through shared memory instead of the network,
+        # and one of them takes its place should it be lost.
+        self._host = sharing.host(self.network.port)
+        if self._host.leader:
+            lead()
         
         def onTimeout():
-            value = self.timer._clock.time
-            liblo.send(self._broadcast, "/time", ('t', value))
+            value = timers.to_seconds(self._now())
+            self._transport.send("/time", ('t', value), ('h', self._monitor.sequence()), ('i', self.network.node), ('i', self._monitor.session))
         
         self._heartbeat = QtCore.QTimer()
         self._heartbeat.timeout.connect(onTimeout)
+        
+        def onHealthTimeout():
+            self._transport.send("/health", ('i', self.network.node), ('i', self._monitor.session), ('h', self._monitor.sequence()), ('h', self._now()))
+        
+        self._health = QtCore.QTimer()
+        self._health.timeout.connect(onHealthTimeout)
+        
+        def dump(path, stats):
+            try:
+                metrics.dump(path, stats)
+            except OSError as e:
+                _logger.warning("Failed to write statistics: %s", e)
+        
+        def onStatisticsTimeout():
+            # Snapshotted here but written on a worker, as replacing the file can take tens of
+            # milliseconds on some filesystems; a dump still in flight means this one is skipped.
+            if self._dump is not None and not self._dump.done():
+                return
+            self._dump = self._writer.submit(dump, self.network.statistics, self.stats())
+        
+        self._writer = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="Statistics")
+        self._dump = None
+        self._statistics = QtCore.QTimer()
+        self._statistics.timeout.connect(onStatisticsTimeout)
+        
+        def onSyncTimeout():
+            t0 = self._synchroniser.clock.clock.time_ns
+            self._transport.send("/sync/request", ('h', t0))
+        
+        self._synchronisation = QtCore.QTimer()
+        self._synchronisation.timeout.connect(onSyncTimeout)
     
     def enableFullscreen(self):
         QtGui.QGuiApplication.setOverrideCursor(Qt.BlankCursor)
@@ -196,9 +282,30 @@ class SceneWindow(QtGui.QOpenGLWindow):
         self.showNormal()
         QtGui.QGuiApplication.restoreOverrideCursor()
     
+    def enableSoftwareFramelock(self):
+        screen = QtGui.QGuiApplication.primaryScreen()
+        
+        self._barrier = barriers.FrameBarrier(self.network.node, self.network.nodes, master=self.network.timeserver, port=self.network.port + 1)
+        self.timer._clock = timers.BarrierClock(self._barrier, screen.refreshRate())
+        
+        _logger.info("Software framelock: node %d of %d", self.network.node, self.network.nodes)
+        
+        return True
+    
+    def disableSoftwareFramelock(self):
+        if not self._barrier:
+            return False
+        
+        self._barrier.close()
+        self._barrier = None
+        
+        self.timer._clock = timers.MonotonicClock()
+        
+        return True
+    
     def enableFramelock(self, group=1, barrier=1):
         if not self._extensions.WGL_NV_swap_group:
-            return False
+            return self.enableSoftwareFramelock()
         
         hdc = wgl.get_current_dc()
         
@@ -231,14 +338,36 @@ class SceneWindow(QtGui.QOpenGLWindow):
     
     def disableFramelock(self):
         if not self._extensions.WGL_NV_swap_group:
-            return False
+            return self.disableSoftwareFramelock()
         
         hdc = wgl.get_current_dc()
         
         if not wgl.join_swap_group(hdc, 0):
             return False
         
-        self.timer._clock = timers.SystemClock()
+        self.timer._clock = timers.MonotonicClock()
+        
+        return True
+    
+    def enablePacing(self):
+        if self._pacer or self._barrier:
+            return False
+        
+        screen = QtGui.QGuiApplication.primaryScreen()
+        
+        self._pacer = pacers.FramePacer(self.timer._clock, screen.refreshRate())
+        self.timer._clock = pacers.PacedClock(self._pacer)
+        self.frameSwapped.connect(self.onFrameSwapped)
+        
+        return True
+    
+    def disablePacing(self):
+        if not self._pacer:
+            return False
+        
+        self.frameSwapped.disconnect(self.onFrameSwapped)
+        self.timer._clock = self._pacer.clock
+        self._pacer = None
         
         return True
     
@@ -248,6 +377,85 @@ class SceneWindow(QtGui.QOpenGLWindow):
     def disableTimeserver(self):
         self._heartbeat.stop()
     
+    def sendCommand(self, path, *args, frames=DEFAULT_COMMAND_FRAMES):
+        # Scheduled a few frames ahead, so the bundle reaches every node (this one included, through
+        # multicast loopback) before the frame it is applied on.
+        timetag = self.timer._clock.time + frames / self.screen().refreshRate()
+        self._transport.send_bundle(timetag, (path,) + args + (('t', timetag),))
+    
+    def enableSynchronisation(self, interval=DEFAULT_SYNCHRONISATION_INTERVAL):
+        if not self._synchroniser:
+            clock = timers.SynchronisedClock(self.timer._clock)
+            self._synchroniser = synchronisers.ClockSynchroniser(clock)
+            self.timer._clock = clock
+        self._synchronisation.start(interval)
+    
+    def disableSynchronisation(self):
+        self._synchronisation.stop()
+    
+    def _now(self):
+        # The current time of the timer's clock, not a pacer's predicted present time.
+        clock = self._pacer.clock if self._pacer else self.timer._clock
+        return clock.time_ns
+    
+    def enableMonitoring(self, interval=DEFAULT_HEALTH_INTERVAL):
+        self._health.start(interval)
+        if self.network.statistics:
+            self._statistics.start(DEFAULT_STATISTICS_INTERVAL)
+    
+    def disableMonitoring(self):
+        self._health.stop()
+        self._statistics.stop()
+    
+    def stats(self):
+        result = {
+            "node": self.network.node,
+            "network": self._monitor.stats(),
+        }
+        if self._synchroniser:
+            result["synchronisation"] = {
+                "offset_ns": self._synchroniser.offset,
+                "drift": self._synchroniser.drift,
+                "delay_ns": self._synchroniser.delay,
+                "converged": self._synchroniser.converged,
+            }
+        if self._barrier:
+            result["barrier"] = self._barrier.stats()
+        if self._renderer:
+            result["render"] = self._renderer.stats()
+        return result
+    
+    def enableSharedClock(self):
+        self.timer._clock = timers.SharedClock(self._host)
+    
+    def enableLeadership(self):
+        # Taking over from a lost leader: the clock carries on from the shared one, so nothing on this
+        # host jumps, and the network is joined in its place.
+        pacing = self.disablePacing()
+        self.timer._clock = timers.MonotonicClock(self._host.offset_ns)
+        self._lead()
+        if self.network.timeserver:
+            self.enableTimeserver()
+        elif self.network.synchronise:
+            self.enableSynchronisation()
+        self.enableMonitoring()
+        if pacing:
+            self.enablePacing()
+    
+    def disableLeadership(self):
+        # Taken over from after stalling: the new leader now speaks for this host.
+        self.disableMonitoring()
+        self.disableTimeserver()
+        if self._synchroniser:
+            self.disableSynchronisation()
+            self._synchroniser = None
+        self._transport.stop()
+        self._transport = None
+        pacing = self.disablePacing()
+        self.enableSharedClock()
+        if pacing:
+            self.enablePacing()
+    
     def initializeGL(self):
         debugLogInfo()
         
@@ -259,19 +467,79 @@ class SceneWindow(QtGui.QOpenGLWindow):
         if self.video.framelock:
             self.enableFramelock()
         
-        if self.network.timeserver:
+        if not self._host.leader:
+            self.enableSharedClock()
+        elif self.network.timeserver:
             self.enableTimeserver()
+        elif self.network.synchronise:
+            self.enableSynchronisation()
+        
+        if self._host.leader:
+            self.enableMonitoring()
+        
+        if self.video.pacing:
+            self.enablePacing()
         
         if self._renderer:
             self._renderer.create(self._scene)
+        
+        if self._reporter:
+            self._reporter.report(launchers.SHADERS)
+    
+    def reportStartup(self):
+        # Ready once the synchronised clock has converged (or needs none), the leader's too when this
+        # process follows it, and the images requested while creating the scene are on the GPU.
+        if self._synchroniser and not self._synchroniser.converged:
+            return
+        if not self._host.converged:
+            return
+        if self._renderer and self._renderer.textures.pending:
+            return
+        self._reporter.report(launchers.CLOCK)
+        self._reporter.report(launchers.READY)
     
     def paintGL(self):
+        if self._pacer:
+            self._pacer.begin()
+        
+        if self._transport:
+            self._transport.drain(self.timer._clock.time)
+            converged = not self._synchroniser or self._synchroniser.converged
+            if not self._host.publish(self._pacer.clock if self._pacer else self.timer._clock, self.timer, converged):
+                self.disableLeadership()
+        else:
+            self._host.apply(self.timer)
+            if self._host.lost and self._host.takeover():
+                self.enableLeadership()
+        
         if self._renderer:
             self._renderer.update(self._scene)
         
+        if self._pacer:
+            self._pacer.end()
+        
+        if self._barrier:
+            self._barrier.synchronise()
+        
+        if self._reporter:
+            if not self._reporter.reported(launchers.READY):
+                self.reportStartup()
+            self._reporter.poll()
+        
         if self._active:
+            self.scheduleUpdate()
+    
+    def scheduleUpdate(self):
+        delay = self._pacer.delay() if self._pacer else 0
+        if delay >= 1000000:
+            QtCore.QTimer.singleShot(delay // 1000000, self.requestUpdate)
+        else:
             self.requestUpdate()
     
+    def onFrameSwapped(self):
+        if self._pacer:
+            self._pacer.presented()
+    
     def toggleFullscreen(self):
         self.video.fullscreen = not self.video.fullscreen
         if self.video.fullscreen:
@@ -290,10 +558,15 @@ class SceneWindow(QtGui.QOpenGLWindow):
         elif event.key() == Qt.Key_Return:
             if event.modifiers() & Qt.AltModifier:
                 self.toggleFullscreen()
+            elif self._transport and self.network.timeserver:
+                self.sendCommand("/stop")
             else:
                 self.timer.stop()
         elif event.key() == Qt.Key_Space:
-            self.timer.toggle()
+            if self._transport and self.network.timeserver:
+                self.sendCommand("/play" if not self.timer.started or self.timer.paused else "/pause")
+            else:
+                self.timer.toggle()
     
     def mousePressEvent(self, event):
         self.onMousePress(event)
@@ -14,4 +14,9 @@ setup(
         'ensemble',
         'ensemble.mathematics',
     ],
+    entry_points = {
+        'console_scripts': [
+            'ensemble-launch=ensemble.launchers:main',
+        ],
+    },
 )
\ No newline at end of file
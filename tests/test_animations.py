@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from ensemble import animations
+
+
+def _keyframes(rng, counts):
+    times = [np.sort(rng.uniform(0.0, 10.0, size=count)) for count in counts]
+    values = [rng.normal(size=count).astype(np.float32) for count in counts]
+    return times, values
+
+def _expected(times, values, t):
+    return np.array([np.interp(t, x, y) for x, y in zip(times, values)])
+
+def _check(tracks, times, values, ts):
+    for t in ts:
+        np.testing.assert_allclose(tracks.evaluate(t)[:, 0], _expected(times, values, t), rtol=1e-5, atol=1e-5, err_msg="t={}".format(t))
+
+
+def test_linear_matches_interp_in_sequence():
+    rng = np.random.default_rng(0)
+    times, values = _keyframes(rng, (1, 2, 3, 17, 64))
+    tracks = animations.Tracks(times, values)
+    # Playback, then the same frames backwards, as a scrubbing user would.
+    ts = np.linspace(-1.0, 11.0, 500)
+    _check(tracks, times, values, ts)
+    _check(tracks, times, values, ts[::-1])
+
+def test_linear_matches_interp_after_seeks():
+    rng = np.random.default_rng(1)
+    times, values = _keyframes(rng, (5, 33, 200))
+    tracks = animations.Tracks(times, values)
+    _check(tracks, times, values, rng.uniform(-2.0, 12.0, size=300))
+
+def test_keyframe_times_and_outside_the_range():
+    rng = np.random.default_rng(2)
+    times, values = _keyframes(rng, (4, 9))
+    tracks = animations.Tracks(times, values)
+    # Exactly on every keyframe, either side of each, and well before the first and after the last.
+    keys = np.concatenate(times)
+    ts = np.concatenate([keys, np.nextafter(keys, -np.inf), np.nextafter(keys, np.inf), [-1e9, -1.0, 11.0, 1e9]])
+    _check(tracks, times, values, ts)
+    _check(tracks, times, values, np.sort(ts))
+    
+    before = tracks.evaluate(-1.0)[:, 0]
+    after = tracks.evaluate(1e9)[:, 0]
+    np.testing.assert_array_equal(before, [v[0] for v in values])
+    np.testing.assert_array_equal(after, [v[-1] for v in values])
+
+@pytest.mark.parametrize("interpolation", [animations.STEP, animations.LINEAR, animations.CUBIC])
+def test_single_keyframe_is_constant(interpolation):
+    tracks = animations.Tracks([[2.0]], [[[1.0, 2.0, 3.0]]], interpolation=interpolation)
+    for t in (-5.0, 2.0, 2.5, 100.0, 0.0):
+        np.testing.assert_array_equal(tracks.evaluate(t), [[1.0, 2.0, 3.0]])
+
+def test_step_holds_the_last_keyframe_reached():
+    rng = np.random.default_rng(3)
+    times, values = _keyframes(rng, (1, 6, 20))
+    tracks = animations.Tracks(times, values, interpolation=animations.STEP)
+    for t in np.concatenate([np.linspace(-1.0, 11.0, 200), np.concatenate(times)]):
+        expected = [y[max(np.searchsorted(x, t, side="right") - 1, 0)] for x, y in zip(times, values)]
+        np.testing.assert_array_equal(tracks.evaluate(t)[:, 0], expected)
+
+def test_unsorted_or_empty_tracks_are_refused():
+    with pytest.raises(ValueError):
+        animations.Tracks([[1.0, 0.0]], [[0.0, 1.0]])
+    with pytest.raises(ValueError):
+        animations.Tracks([[]], [[]])
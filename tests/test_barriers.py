@@ -0,0 +1,137 @@
+"""Frame barriers over multicast loopback, with the nodes in threads and in separate processes."""
+
+import multiprocessing
+import random
+import socket
+import threading
+import time
+
+import pytest
+
+from ensemble import barriers, transports
+
+FRAMES = 200
+
+
+def _port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+class _LossySocket(object):
+    # Drops a share of the messages sent through it, as a congested network would.
+    def __init__(self, sock, loss, seed):
+        super().__init__()
+        
+        self._socket = sock
+        self._loss = loss
+        self._random = random.Random(seed)
+        self.dropped = 0
+    
+    def sendto(self, data, address):
+        if self._random.random() < self._loss:
+            self.dropped += 1
+            return len(data)
+        return self._socket.sendto(data, address)
+    
+    def recvfrom(self, size):
+        return self._socket.recvfrom(size)
+    
+    def fileno(self):
+        return self._socket.fileno()
+    
+    def close(self):
+        self._socket.close()
+
+
+def _barrier(node, nodes, port, loss=0.0):
+    try:
+        sock = transports.open_multicast_socket(transports.DEFAULT_GROUP, port)
+    except OSError as e:
+        pytest.skip("multicast is unavailable: {}".format(e))
+    if loss:
+        sock = _LossySocket(sock, loss, node)
+    # A generous timeout, so a loaded machine shows up as a slow test rather than a broken barrier.
+    return barriers.FrameBarrier(node, nodes, master=node == 0, port=port, timeout=2.0, sock=sock)
+
+def _run(barrier, frames):
+    # (frame, entered, left) per synchronise, in perf_counter_ns, which every process on the host shares.
+    spans = []
+    for _ in range(frames):
+        frame = barrier.frame
+        entered = time.perf_counter_ns()
+        barrier.synchronise()
+        spans.append((frame, entered, time.perf_counter_ns()))
+    return spans
+
+def _check(results, frames):
+    for spans, stats in results:
+        assert stats["timeouts"] == 0
+        assert [frame for frame, _, _ in spans] == list(range(frames))
+    # Lockstep: no node leaves a frame before every node has entered it.
+    for frame in range(frames):
+        entered = max(spans[frame][1] for spans, _ in results)
+        left = min(spans[frame][2] for spans, _ in results)
+        assert entered <= left, frame
+
+
+def _threads(nodes, frames, loss=0.0):
+    port = _port()
+    group = [_barrier(node, nodes, port, loss) for node in range(nodes)]
+    results = [None] * nodes
+    
+    def run(node):
+        results[node] = (_run(group[node], frames), group[node].stats())
+    
+    threads = [threading.Thread(target=run, args=(node,)) for node in range(nodes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30.0)
+    for barrier in group:
+        barrier.close()
+    return group, results
+
+def test_threads_stay_in_lockstep():
+    _, results = _threads(3, FRAMES)
+    _check(results, FRAMES)
+
+def test_lost_messages_are_resent():
+    # A fifth of all messages lost, so now and then every copy of a RELEASE is lost as well.
+    group, results = _threads(3, FRAMES, loss=0.2)
+    assert all(barrier._socket.dropped for barrier in group)
+    _check(results, FRAMES)
+
+
+def _process(node, nodes, port, ready, start, results):
+    barrier = _barrier(node, nodes, port)
+    ready.release()
+    start.wait(10.0)
+    results.put((node, _run(barrier, FRAMES), barrier.stats()))
+    barrier.close()
+
+def test_processes_stay_in_lockstep():
+    nodes, port = 3, _port()
+    # Skips here rather than in a child, should multicast be unavailable.
+    _barrier(0, nodes, port).close()
+    context = multiprocessing.get_context("fork")
+    ready = context.Semaphore(0)
+    start = context.Event()
+    results = context.Queue()
+    
+    processes = [context.Process(target=_process, args=(node, nodes, port, ready, start, results)) for node in range(nodes)]
+    for process in processes:
+        process.start()
+    # Every socket has joined the group before the first READY is sent.
+    for _ in processes:
+        assert ready.acquire(timeout=10.0)
+    start.set()
+    
+    collected = sorted(results.get(timeout=60.0) for _ in processes)
+    for process in processes:
+        process.join(5.0)
+    
+    _check([(spans, stats) for _, spans, stats in collected], FRAMES)
+    assert collected[0][2]["skew_ns"]["p50"] < 10000000
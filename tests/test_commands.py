@@ -0,0 +1,127 @@
+"""Replayed command buffers against the same commands issued directly, on the null backend."""
+
+import numpy as np
+
+from ensemble import commands, states, uniforms
+
+POINTS = 0
+BLEND = 0x0BE2
+
+# Stand-ins for the program and vertex array, shared so both call streams bind the same objects.
+PROGRAM = object()
+VERTEX_ARRAY = object()
+
+
+class _Uniforms(dict):
+    # A program's uniforms, recording the values that would be uploaded.
+    def __init__(self):
+        super().__init__()
+        
+        self.uploads = []
+    
+    def __setitem__(self, name, value):
+        self.uploads.append((name, states._key(value)))
+        super().__setitem__(name, value)
+
+
+class _Scene(object):
+    # The render sequence of the quad scene.
+    def __init__(self, buffer=None):
+        super().__init__()
+        
+        self.uploaded = _Uniforms()
+        self.uniforms = uniforms.UniformCache(self.uploaded)
+        self.commands = buffer
+        self.transform = np.eye(4, dtype=np.float32)
+    
+    def render(self, state, t):
+        self.uniforms.reset()
+        if self.commands is not None and self.commands.valid:
+            self.commands.replay(state, iTime=t)
+            return
+        if self.commands is not None:
+            self.commands.record(state)
+        
+        state.clear_color((0.1, 0.2, 0.3, 1.0))
+        state.clear()
+        state.use_program(PROGRAM)
+        state.bind_vertex_array(VERTEX_ARRAY)
+        state.set_uniform(self.uniforms, "iResolution", (1920.0, 1080.0, 1.0))
+        state.set_uniform(self.uniforms, "iTime", t)
+        if self.commands is not None:
+            self.commands.mark("iTime")
+        state.set_uniform(self.uniforms, "tex_coord_transform", self.transform)
+        state.enable(BLEND)
+        state.depth_mask(False)
+        state.draw_arrays(POINTS, 0, 1)
+        state.depth_mask(True)
+        
+        if self.commands is not None:
+            self.commands.end(state)
+
+
+class _Tracker(states.StateTracker):
+    # Counts the operations issued through the tracker rather than straight to the backend.
+    def __init__(self, backend):
+        super().__init__(backend)
+        
+        self.dispatched = 0
+    
+    def __getattribute__(self, name):
+        if name in states.OPERATIONS:
+            object.__setattr__(self, "dispatched", object.__getattribute__(self, "dispatched") + 1)
+        return super().__getattribute__(name)
+
+
+def _frames(scene, times, invalidate=()):
+    # Per frame: the calls that reached the backend, the uniform values uploaded and the tracker's counts.
+    state = states.StateTracker(states.NullBackend())
+    result = []
+    for frame, t in enumerate(times):
+        if frame in invalidate:
+            state.invalidate()
+        del state.backend.calls[:]
+        del scene.uploaded.uploads[:]
+        scene.render(state, t)
+        result.append((list(state.backend.calls), list(scene.uploaded.uploads), state.reset()))
+    return result
+
+
+def test_replay_matches_direct_calls():
+    times = [0.0, 0.0, 1 / 60, 2 / 60, 2 / 60, 3 / 60]
+    direct = _frames(_Scene(), times)
+    replayed = _frames(_Scene(commands.CommandBuffer()), times)
+    assert replayed == direct
+
+def test_unchanged_uniforms_are_not_uploaded():
+    times = [0.0, 1 / 60, 1 / 60]
+    frames = _frames(_Scene(commands.CommandBuffer()), times)
+    first, second, third = [[name for name, _ in uploads] for _, uploads, _ in frames]
+    assert first == ["iResolution", "iTime", "tex_coord_transform"]
+    assert second == ["iTime"]
+    assert third == []
+    # The tracker still passes every set_uniform on; the cache decides what reaches GL.
+    assert sum(call[0] == "set_uniform" for call in frames[2][0]) == 3
+
+def test_redundant_state_is_elided_after_the_first_frame():
+    frames = _frames(_Scene(commands.CommandBuffer()), [0.0, 1 / 60])
+    names = [call[0] for call in frames[1][0]]
+    assert names == ["clear", "set_uniform", "set_uniform", "set_uniform", "depth_mask", "draw_arrays", "depth_mask"]
+
+def test_replay_after_invalidate_restores_the_state():
+    times = [0.0, 1 / 60, 2 / 60, 3 / 60, 4 / 60]
+    direct = _frames(_Scene(), times, invalidate=(2,))
+    replayed = _frames(_Scene(commands.CommandBuffer()), times, invalidate=(2,))
+    assert replayed == direct
+    assert [call[0] for call in replayed[2][0]].count("bind") == 2
+
+def test_replay_calls_the_backend_directly():
+    scene = _Scene(commands.CommandBuffer())
+    state = _Tracker(states.NullBackend())
+    scene.render(state, 0.0)
+    recorded = state.dispatched
+    assert recorded > 0
+    state.dispatched = 0
+    scene.render(state, 1 / 60)
+    assert state.dispatched == 0
+    assert state.backend.calls[-4:] == [("set_uniform", "tex_coord_transform", states._key(scene.transform)), ("depth_mask", False), ("draw_arrays", POINTS, 0, 1), ("depth_mask", True)]
@@ -0,0 +1,42 @@
+import threading
+
+import numpy as np
+
+from ensemble import mathematics
+from ensemble.mathematics import contexts, matrices
+
+
+def test_configure_applies_to_the_calling_thread_only():
+    results = {}
+    barrier = threading.Barrier(2)
+    
+    def run(name, n, dtype):
+        mathematics.configure(n=n, dtype=dtype)
+        # Both threads have configured before either reads its context back.
+        barrier.wait()
+        results[name] = (contexts.current().n, contexts.current().dtype, matrices.identity().shape, contexts.current().workspace)
+    
+    threads = [
+        threading.Thread(target=run, args=("small", 4, np.float32)),
+        threading.Thread(target=run, args=("large", 7, np.float64)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert results["small"][:3] == (4, np.float32, (5, 5))
+    assert results["large"][:3] == (7, np.float64, (8, 8))
+    assert results["small"][3] is not results["large"][3]
+    # Nor did either change the context of the thread running the test.
+    assert contexts.current().n not in (4, 7)
+
+def test_pushed_context_overrides_the_configured_one():
+    configured = contexts.configure(n=5, dtype=np.float64)
+    try:
+        with contexts.Context(n=2, dtype=np.float32) as context:
+            assert contexts.current() is context
+            assert matrices.identity().shape == (3, 3)
+        assert contexts.current() is configured
+    finally:
+        contexts.configure()
@@ -0,0 +1,104 @@
+import numpy as np
+
+from ensemble import cues, timers
+
+
+def _cues(*starts):
+    clock = timers.VirtualClock()
+    timer = timers.Timer(clock)
+    result = cues.Cues(timer, cues.Timeline(starts))
+    # A frame drawn before play, as the render loop does.
+    result.poll()
+    return clock, timer, result
+
+
+def test_nothing_fires_before_play():
+    clock, timer, c = _cues(0.0, 0.5)
+    for t in (0.0, 1.0, 2.0):
+        clock.time = t
+        assert list(c.poll()) == []
+
+def test_cues_at_zero_fire_on_first_frame_after_play():
+    clock, timer, c = _cues(0.0, 0.5)
+    clock.time = 10.0
+    timer.start()
+    clock.time = 10.016
+    assert list(c.poll()) == [0]
+    clock.time = 10.6
+    assert list(c.poll()) == [1]
+    assert list(c.poll()) == []
+
+def test_stop_rearms_cues_at_zero():
+    clock, timer, c = _cues(0.0)
+    timer.start()
+    clock.time = 0.016
+    assert list(c.poll()) == [0]
+    timer.stop()
+    clock.time = 1.0
+    assert list(c.poll()) == []
+    timer.start()
+    clock.time = 1.016
+    assert list(c.poll()) == [0]
+
+def test_seek_skips_without_replaying():
+    clock, timer, c = _cues(0.0, 1.0, 2.0)
+    timer.start()
+    clock.time = 0.016
+    assert list(c.poll()) == [0]
+    timer.seek(2.0)
+    assert list(c.poll()) == [2]
+    clock.time = 0.5
+    assert list(c.poll()) == []
+
+def _timeline(count, duration, seed=0):
+    # Starts on whole milliseconds, so many cues share a start and seeks can land exactly on one.
+    rng = np.random.default_rng(seed)
+    milliseconds = rng.integers(0, int(duration * 1000), size=count)
+    milliseconds[:10] = 0
+    starts = milliseconds / 1000.0
+    # The order cues should fire in: by start, and by insertion order within a start.
+    return starts, np.argsort(starts, kind="stable")
+
+def test_large_timeline_fires_every_cue_once_in_order():
+    count, duration = 300000, 600.0
+    starts, order = _timeline(count, duration)
+    clock = timers.VirtualClock()
+    timer = timers.Timer(clock)
+    c = cues.Cues(timer, cues.Timeline(starts))
+    c.poll()
+    timer.start()
+    
+    fired = []
+    frame = timers.NANOSECONDS_PER_SECOND // 60
+    for _ in range(int(duration * 60) + 2):
+        clock.time_ns += frame
+        fired.append(c.poll())
+    fired = np.concatenate(fired)
+    
+    assert len(fired) == count
+    np.testing.assert_array_equal(fired, order)
+
+def test_large_timeline_seeks_land_on_the_right_cue():
+    count, duration = 300000, 600.0
+    starts, order = _timeline(count, duration, seed=1)
+    sorted_starts = starts[order]
+    clock = timers.VirtualClock()
+    timer = timers.Timer(clock)
+    c = cues.Cues(timer, cues.Timeline(starts))
+    c.poll()
+    timer.start()
+    clock.time = 0.016
+    c.poll()
+    
+    rng = np.random.default_rng(2)
+    # Onto cue starts, between them, and backwards as well as forwards.
+    targets = np.concatenate([rng.choice(starts, 50), rng.uniform(0.0, duration, 50)])
+    for target in rng.permutation(targets):
+        timer.seek(target)
+        # Only the cues exactly at the new position fire...
+        i, j = np.searchsorted(sorted_starts, target, side="left"), np.searchsorted(sorted_starts, target, side="right")
+        np.testing.assert_array_equal(c.poll(), order[i:j])
+        # ...and the next frame picks up from there.
+        clock.time_ns += timers.NANOSECONDS_PER_SECOND // 60
+        k = np.searchsorted(sorted_starts, timer.elapsed, side="right")
+        np.testing.assert_array_equal(c.poll(), order[j:k])
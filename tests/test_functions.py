@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from ensemble import functions
+from ensemble.mathematics import matrices
+
+
+def _affine(rng, n):
+    m = matrices.identity(n=n, dtype=np.float64)
+    m[:-1, :-1] = rng.normal(size=(n, n)) + 2 * np.identity(n)
+    m[-1, :-1] = rng.normal(size=n)
+    return functions.affine(m)
+
+
+def test_affine_maps_row_vectors():
+    m = matrices.product([matrices.scale((2.0, 3.0), n=2, dtype=np.float64), matrices.translate((1.0, -1.0), n=2, dtype=np.float64)])
+    f = functions.affine(m)
+    np.testing.assert_allclose(f(np.array([1.0, 1.0])), [3.0, 2.0])
+    np.testing.assert_allclose(f(np.array([[1.0, 1.0], [0.0, 0.0]])), [[3.0, 2.0], [1.0, -1.0]])
+    np.testing.assert_allclose(f.inv(f(np.array([0.5, 4.0]))), [0.5, 4.0])
+
+def test_scalar_affine_takes_any_shape():
+    f = functions.affine([[2.0, 0.0], [1.0, 1.0]], scalar=True)
+    np.testing.assert_allclose(f(np.arange(6.0).reshape(2, 3)), 2 * np.arange(6.0).reshape(2, 3) + 1)
+    assert f(0.5) == 2.0
+    with pytest.raises(ValueError):
+        functions.affine(np.identity(3), scalar=True)
+
+def test_adjacent_affines_fuse_into_one_stage():
+    rng = np.random.default_rng(0)
+    stages = [_affine(rng, 3) for _ in range(4)]
+    pipeline = functions.Pipeline(*stages)
+    assert len(pipeline) == 1
+    
+    x = rng.normal(size=(10, 3))
+    expected = x
+    for stage in stages:
+        expected = stage(expected)
+    np.testing.assert_allclose(pipeline(x), expected)
+    np.testing.assert_allclose(pipeline.inv(pipeline(x)), x)
+
+def test_incompatible_stages_do_not_fuse():
+    rng = np.random.default_rng(1)
+    scalar = functions.affine([[2.0, 0.0], [1.0, 1.0]], scalar=True)
+    pipeline = functions.Pipeline(_affine(rng, 2), np.tanh, _affine(rng, 2), _affine(rng, 3), scalar)
+    assert [type(stage) for stage in pipeline.stages] == [functions.Affine, type(np.tanh), functions.Affine, functions.Affine, functions.Affine]
+    assert len(pipeline) == 5
+
+def test_compose_returns_a_flat_pipeline():
+    rng = np.random.default_rng(2)
+    f, g, h = _affine(rng, 2), _affine(rng, 2), np.sin
+    composed = functions.compose(h, functions.compose(g, functions.identity, f))
+    assert isinstance(composed, functions.Pipeline)
+    # compose applies right to left; identity drops out and the two affines fuse.
+    assert len(composed) == 2
+    x = rng.normal(size=(4, 2))
+    np.testing.assert_allclose(composed(x), h(g(f(x))))
+
+def test_pipeline_inverse():
+    f = functions.invertible(lambda x: np.exp(x), lambda x: np.log(x))
+    g = functions.affine(matrices.scale((3.0,), n=1, dtype=np.float64), scalar=True)
+    pipeline = functions.compose(g, f)
+    x = np.linspace(-1.0, 1.0, 5)
+    np.testing.assert_allclose(pipeline.inv(pipeline(x)), x)
+    
+    with pytest.raises(AttributeError):
+        functions.compose(g, np.tanh).inv
+    
+    explicit = functions.compose(np.tanh, np.tanh)
+    explicit.inv = np.arctanh
+    assert explicit.inv is np.arctanh
+    # A pipeline with its own inverse is kept as one stage rather than flattened.
+    assert len(functions.Pipeline(explicit, g)) == 2
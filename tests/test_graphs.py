@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from ensemble import graphs
+from ensemble.mathematics import matrices
+
+
+def _graph():
+    # 0 -> 1 -> 2 and 0 -> 3, each node translated by its own index along x.
+    graph = graphs.SceneGraph(capacity=2, n=3, dtype=np.float64)
+    locals = np.array([matrices.translate((float(i), 0.0, 0.0), n=3, dtype=np.float64) for i in range(4)])
+    graph.extend([-1, 0, 1, 0], locals)
+    graph.update()
+    return graph
+
+
+def test_world_matrices_accumulate_down_the_tree():
+    graph = _graph()
+    assert graph.depths.tolist() == [0, 1, 2, 1]
+    assert graph.worlds[:, -1, 0].tolist() == [0.0, 1.0, 3.0, 3.0]
+    assert graph.update() == 0
+
+def test_reparent_moves_the_subtree():
+    graph = _graph()
+    graph.reparent(1, 3)
+    assert graph.parents.tolist() == [-1, 3, 1, 0]
+    assert graph.depths.tolist() == [0, 2, 3, 1]
+    assert graph.update() == 2
+    assert graph.worlds[:, -1, 0].tolist() == [0.0, 4.0, 6.0, 3.0]
+    
+    graph.reparent(2, -1)
+    assert graph.depths.tolist() == [0, 2, 0, 1]
+    graph.update()
+    assert graph.worlds[2, -1, 0] == 2.0
+
+@pytest.mark.parametrize("index, parent", [(0, 2), (1, 2), (1, 1)])
+def test_cyclic_reparent_changes_nothing(index, parent):
+    graph = _graph()
+    parents, depths, dirty = graph.parents.copy(), graph.depths.copy(), graph.dirty.copy()
+    with pytest.raises(ValueError):
+        graph.reparent(index, parent)
+    np.testing.assert_array_equal(graph.parents, parents)
+    np.testing.assert_array_equal(graph.depths, depths)
+    np.testing.assert_array_equal(graph.dirty, dirty)
+    # The graph is still usable afterwards.
+    graph.reparent(3, 2)
+    assert graph.depths.tolist() == [0, 1, 2, 3]
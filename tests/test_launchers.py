@@ -0,0 +1,136 @@
+import json
+import socket
+import time
+
+import pytest
+
+from ensemble import launchers
+
+
+class _Process(object):
+    def poll(self):
+        return None
+    
+    def terminate(self):
+        pass
+
+class _Spawner(object):
+    # Records what would be started instead of starting it.
+    def __init__(self):
+        super().__init__()
+        
+        self.spawned = []
+    
+    def spawn(self, host, command, environment):
+        self.spawned.append((host, command, environment))
+        return _Process()
+
+
+def _port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def _reporters(spawner, resend=launchers.DEFAULT_RESEND):
+    result = []
+    for _, _, environment in spawner.spawned:
+        node = json.loads(environment[launchers.CONFIG_VARIABLE])["network"]["node"]
+        host, port = environment[launchers.LAUNCHER_VARIABLE].rsplit(":", 1)
+        result.append(launchers.Reporter((host, int(port)), node, resend=resend))
+    return result
+
+
+def test_reports_are_keyed_by_configured_node_id():
+    wall = {
+        "command": ["ensemble"],
+        "nodes": [
+            {"config": {"network": {"node": 10}}},
+            {"config": {"network": {"node": 11}}},
+        ],
+    }
+    spawner = _Spawner()
+    launcher = launchers.Launcher(wall, spawner=spawner, port=_port())
+    launcher.spawn()
+    try:
+        for reporter in _reporters(spawner):
+            for phase in launchers.PHASES:
+                reporter.report(phase)
+            reporter.close()
+        assert launcher.wait(5.0)
+        assert sorted(launcher.report()) == [10, 11]
+        assert all(set(launchers.PHASES) <= set(timings) for timings in launcher.report().values())
+    finally:
+        launcher.close()
+
+def test_lost_reports_are_resent_until_acknowledged():
+    wall = {"command": ["ensemble"], "nodes": [{}, {}]}
+    spawner = _Spawner()
+    launcher = launchers.Launcher(wall, spawner=spawner, port=_port())
+    launcher.spawn()
+    reporters = _reporters(spawner, resend=0.05)
+    try:
+        for reporter in reporters:
+            for phase in launchers.PHASES:
+                reporter.report(phase)
+        # Every first report is lost.
+        launcher._socket.settimeout(0.5)
+        for _ in range(len(reporters) * len(launchers.PHASES)):
+            launcher._socket.recvfrom(65536)
+        assert not launcher.ready()
+        
+        deadline = time.perf_counter() + 5.0
+        while any(reporter.unacknowledged for reporter in reporters) and time.perf_counter() < deadline:
+            for reporter in reporters:
+                reporter.poll()
+            launcher._receive(0.01)
+        assert launcher.ready()
+        assert all(not reporter.unacknowledged for reporter in reporters)
+        assert sorted(launcher.report()) == [0, 1]
+    finally:
+        for reporter in reporters:
+            reporter.close()
+        launcher.close()
+
+def test_reports_stop_once_playing():
+    port = _port()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", port))
+    sock.settimeout(0.2)
+    reporter = launchers.Reporter(("127.0.0.1", port), 0, resend=0.0)
+    try:
+        reporter.report(launchers.CONFIG)
+        reporter.poll()
+        assert sock.recvfrom(65536)
+        assert sock.recvfrom(65536)
+        reporter.finish()
+        reporter.poll()
+        with pytest.raises(socket.timeout):
+            sock.recvfrom(65536)
+    finally:
+        reporter.close()
+        sock.close()
+
+def test_duplicate_node_ids_are_refused():
+    with pytest.raises(ValueError):
+        launchers.node_configs({"nodes": [{"config": {"network": {"node": 1}}}, {}]})
+    with pytest.raises(ValueError):
+        launchers.node_configs({"nodes": [{"config": {"network": {"node": 5}}}, {"config": {"network": {"node": 5}}}]})
+    assert [config["network"]["node"] for config in launchers.node_configs({"nodes": [{}, {}, {"config": {"network": {"node": 7}}}]})] == [0, 1, 7]
+
+def test_report_address_is_loopback_for_local_walls():
+    assert launchers.report_address(["localhost", "127.0.0.1"]) == "127.0.0.1"
+    assert launchers.report_address([]) == "127.0.0.1"
+
+def test_report_address_routes_to_remote_nodes():
+    # Whatever interface reaches a (non-loopback) node, it is not the 127.0.1.1 the hostname may resolve to.
+    address = launchers.report_address(["localhost", "192.0.2.1"])
+    assert not address.startswith("127.0.1.")
+    socket.inet_aton(address)
+
+def test_wall_launcher_address_takes_precedence():
+    wall = {"command": ["ensemble"], "launcher": "10.0.0.5", "nodes": [{"host": "192.0.2.1"}]}
+    launcher = launchers.Launcher(wall, spawner=_Spawner(), port=_port())
+    assert launcher.address[0] == "10.0.0.5"
+    launcher.close()
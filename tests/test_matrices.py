@@ -0,0 +1,126 @@
+import tracemalloc
+
+import numpy as np
+
+from ensemble.mathematics import kernels, matrices, workspaces
+
+
+def _traced(function, iterations, warmup=200):
+    # Memory still held after the loop, and the most held at once during it, relative to before it.
+    # The warm-up runs traced, so interpreter free lists it fills are not counted as growth.
+    function()
+    tracemalloc.start()
+    try:
+        for _ in range(warmup):
+            function()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        for _ in range(iterations):
+            function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current - base, peak - base
+
+def _frames(n, dtype):
+    rng = np.random.default_rng(n)
+    m = rng.normal(size=(n, n)).astype(dtype)
+    v = rng.normal(size=n).astype(dtype)
+    workspace = workspaces.Workspace(n=n, dtype=dtype)
+    out = np.empty((n+1, n+1), dtype=dtype)
+    
+    def frame():
+        matrices.rotate_euler_angles_vector(v, n=n, dtype=dtype, out=out, workspace=workspace)
+        matrices.rotate_euler_angles_matrix(m, n=n, dtype=dtype, out=out, workspace=workspace)
+        matrices.rotate_euler_angles_matrix_lower(m, n=n, dtype=dtype, out=out, workspace=workspace)
+        matrices.translate(v, n=n, dtype=dtype, out=out)
+        matrices.scale(v, n=n, dtype=dtype, out=out)
+    
+    return frame
+
+
+def test_generic_steady_state_allocates_nothing():
+    n = 64
+    current, peak = _traced(_frames(n, np.float64), 50, warmup=10)
+    # Anything allocated and kept per frame would add at least a byte per frame.
+    assert current < 50
+    # Any temporary the size of one angle matrix would exceed this.
+    assert peak < n * n * np.dtype(np.float64).itemsize // 2
+
+def test_kernel_steady_state_allocates_nothing():
+    for n in (4, kernels.MAX_N):
+        frame = _frames(n, np.float32)
+        current, short = _traced(frame, 250)
+        assert current < 250
+        # The unrolled code creates transient Python floats, but what it holds does not grow with frames.
+        current, long = _traced(frame, 1000)
+        assert current < 250
+        assert long <= short + 512
+
+def test_kernel_workspace_matches_allocating_path():
+    rng = np.random.default_rng(0)
+    for n in range(1, kernels.MAX_N + 1):
+        for dtype in (np.float32, np.float64):
+            m = rng.normal(size=(n, n)).astype(dtype)
+            v = rng.normal(size=n).astype(dtype)
+            workspace = workspaces.Workspace(n=n, dtype=dtype)
+            out = np.empty((n+1, n+1), dtype=dtype)
+            expected = matrices.rotate_euler_angles_matrix(m, n=n, dtype=dtype)
+            np.testing.assert_allclose(matrices.rotate_euler_angles_matrix(m, n=n, dtype=dtype, out=out, workspace=workspace), expected, atol=1e-5)
+            expected = matrices.rotate_euler_angles_vector(v, i=1 % n, n=n, dtype=dtype)
+            np.testing.assert_allclose(matrices.rotate_euler_angles_vector(v, i=1 % n, n=n, dtype=dtype, out=out, workspace=workspace), expected, atol=1e-5)
+
+def _rotations(angles, planes, n, dtype):
+    # The rotation as the product of one plane matrix per plane, in the order the planes are listed.
+    return matrices.product([matrices.rotate_a_i_j(angles[k], i, j, n=n, dtype=dtype) for i, j, k in planes])
+
+def test_rotations_match_plane_products():
+    # Small n runs the generated kernels, large n the in-place Givens updates.
+    rng = np.random.default_rng(1)
+    for n in (2, kernels.MAX_N, kernels.MAX_N + 1, 12):
+        m = rng.normal(size=(n, n))
+        v = rng.normal(size=n)
+        planes = [(i, j, (i, j)) for i in range(n) for j in range(i + 1, n)]
+        expected = _rotations(m, planes, n, np.float64)
+        np.testing.assert_allclose(matrices.rotate_euler_angles_matrix_upper(m, n=n, dtype=np.float64), expected, atol=1e-12)
+        for i in (0, n - 1):
+            planes = [(i, j, (j,)) for j in range(n) if j != i]
+            expected = _rotations(v, planes, n, np.float64)
+            np.testing.assert_allclose(matrices.rotate_euler_angles_vector(v, i=i, n=n, dtype=np.float64), expected, atol=1e-12)
+
+def test_batched_rotations_match_scalar():
+    rng = np.random.default_rng(2)
+    count = 5
+    for n in (3, kernels.MAX_N + 2):
+        ms = rng.normal(size=(count, n, n))
+        vs = rng.normal(size=(count, n))
+        for function in (matrices.rotate_euler_angles_matrix, matrices.rotate_euler_angles_matrix_upper, matrices.rotate_euler_angles_matrix_lower):
+            batched = function(ms, n=n, dtype=np.float64)
+            assert batched.shape == (count, n+1, n+1)
+            for k in range(count):
+                np.testing.assert_allclose(batched[k], function(ms[k], n=n, dtype=np.float64), atol=1e-12)
+        batched = matrices.rotate_euler_angles_vector(vs, i=1, n=n, dtype=np.float64)
+        for k in range(count):
+            np.testing.assert_allclose(batched[k], matrices.rotate_euler_angles_vector(vs[k], i=1, n=n, dtype=np.float64), atol=1e-12)
+
+def test_batched_builders_match_scalar():
+    rng = np.random.default_rng(3)
+    n, count = 4, 6
+    # Shorter vectors fill only their leading components; the rest stay identity.
+    for length in (n, n - 1):
+        vs = rng.normal(size=(count, length))
+        translated = matrices.translate_batch(vs, n=n, dtype=np.float64)
+        scaled = matrices.scale_batch(vs, n=n, dtype=np.float64)
+        for k in range(count):
+            np.testing.assert_array_equal(translated[k], matrices.translate(vs[k], n=n, dtype=np.float64))
+            np.testing.assert_array_equal(scaled[k], matrices.scale(vs[k], n=n, dtype=np.float64))
+    
+    a = rng.normal(size=count)
+    for i, j in ((0, 2), (3, 1), (2, 2)):
+        rotated = matrices.rotate_a_i_j_batch(a, i, j, n=n, dtype=np.float64)
+        for k in range(count):
+            np.testing.assert_array_equal(rotated[k], matrices.rotate_a_i_j(a[k], i, j, n=n, dtype=np.float64))
+    
+    out = np.empty((count, n+1, n+1))
+    assert matrices.identity_batch(count, n=n, dtype=np.float64, out=out) is out
+    np.testing.assert_array_equal(out, np.broadcast_to(np.identity(n+1), out.shape))
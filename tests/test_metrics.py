@@ -0,0 +1,48 @@
+from ensemble import metrics
+
+
+def _receive(monitor, peer, session, sequences):
+    for sequence in sequences:
+        monitor.received(peer, session, sequence, 1000 * sequence, 1000 * sequence + 150000)
+
+def test_restarted_peer_is_followed_from_its_first_message():
+    monitor = metrics.Monitor(window=16)
+    _receive(monitor, 3, 1, range(1, 101))
+    assert monitor.stats()["peers"]["3"]["sequence"] == 100
+    
+    # The restarted node numbers its messages from 1 again, under a new session.
+    _receive(monitor, 3, 2, range(1, 11))
+    stats = monitor.stats()["peers"]["3"]
+    assert stats["sequence"] == 10
+    assert stats["received"] == 10
+    assert stats["late"] == 0
+    assert stats["duplicates"] == 0
+    assert stats["loss"] == 0.0
+    assert stats["restarts"] == 1
+    assert stats["last_ns"] == 160000
+
+def test_late_and_duplicate_messages_within_a_session():
+    monitor = metrics.Monitor(window=16)
+    _receive(monitor, 0, 7, [1, 2, 4, 3, 3, 40, 5])
+    stats = monitor.stats()["peers"]["0"]
+    assert stats["sequence"] == 40
+    assert stats["received"] == 5
+    assert stats["late"] == 2
+    assert stats["duplicates"] == 1
+    assert stats["restarts"] == 0
+
+def test_peers_are_tracked_separately():
+    monitor = metrics.Monitor()
+    _receive(monitor, 1, 5, range(1, 4))
+    _receive(monitor, 2, 6, range(1, 3))
+    _receive(monitor, 1, 5, range(4, 6))
+    stats = monitor.stats()
+    assert sorted(stats["peers"]) == ["1", "2"]
+    assert stats["peers"]["1"]["received"] == 5
+    assert stats["peers"]["1"]["restarts"] == 0
+    assert 0 <= monitor.session < 2**31
+
+def test_percentiles():
+    assert metrics.percentiles([]) is None
+    assert metrics.percentiles(range(101)) == {"p50": 50.0, "p95": 95.0, "p99": 99.0, "max": 100.0}
+    assert metrics.percentiles([4, 2], (50, 100)) == {"p50": 3.0, "max": 4.0}
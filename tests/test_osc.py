@@ -0,0 +1,48 @@
+import pytest
+
+from ensemble import osc
+
+
+def test_message_round_trip():
+    args = [("i", -7), ("h", 2**40), ("f", 0.5), ("d", 1.0 / 3.0), ("s", "wall"), ("b", b"\x00\x01\x02"), ("t", 12.5), ("t", None), ("T", True), ("F", False), ("N", None)]
+    packet = osc.encode_message("/test", *args)
+    assert len(packet) % 4 == 0
+    path, types, decoded = osc.decode_message(packet)
+    assert path == "/test"
+    assert types == "".join(typetag for typetag, _ in args)
+    assert decoded == [value for _, value in args]
+
+def test_plain_values_infer_their_types():
+    path, types, args = osc.decode_message(osc.encode_message("/plain", 1, 2**33, 0.25, "x", b"y", True, None))
+    assert types == "ihfsbTN"
+    assert args == [1, 2**33, 0.25, "x", b"y", True, None]
+
+@pytest.mark.parametrize("value", [0.0, 1.0, 1234.5678, 3.9e9, 1 / 3])
+def test_timetags_keep_32_32_precision(value):
+    decoded = osc.decode_timetag(osc.encode_timetag(value))
+    assert abs(decoded - value) < 2.0**-32 * 2 * max(value, 1.0)
+    _, _, args = osc.decode_message(osc.encode_message("/time", ("t", value)))
+    assert args == [decoded]
+
+def test_nested_bundles_flatten_with_their_own_timetags():
+    inner = osc.encode_bundle(7.25, ("/inner", ("i", 1)), ("/inner", ("t", 9.5)))
+    immediate = osc.encode_bundle(None, ("/now", ("s", "go")))
+    packet = osc.encode_bundle(5.0, ("/outer", ("f", 1.5)), inner, osc.encode_bundle(6.0, immediate))
+    assert osc.decode_packet(packet) == [
+        (5.0, "/outer", "f", [1.5]),
+        (7.25, "/inner", "i", [1]),
+        (7.25, "/inner", "t", [9.5]),
+        (None, "/now", "s", ["go"]),
+    ]
+
+def test_plain_message_has_no_timetag():
+    assert osc.decode_packet(osc.encode_message("/stop")) == [(None, "/stop", "", [])]
+
+def test_malformed_packets_raise_decode_errors():
+    packet = osc.encode_bundle(1.0, ("/a", ("i", 1)))
+    with pytest.raises(osc.DecodeError):
+        osc.decode_packet(packet[:-2])
+    with pytest.raises(osc.DecodeError):
+        osc.decode_message(b"/a\0\0,x\0\0")
+    with pytest.raises(osc.DecodeError):
+        osc.decode_message(b"/a\0\0i\0\0\0")
@@ -0,0 +1,92 @@
+import pytest
+
+from ensemble import programs
+
+
+class _FailingBackend(programs.NullBackend):
+    # A backend whose binary path raises, as GLBackend would if glue's program objects differ.
+    def __init__(self, failing):
+        super().__init__()
+        
+        self._failing = failing
+    
+    def binary(self, program):
+        if self._failing == "binary":
+            raise AttributeError("handle")
+        return super().binary(program)
+    
+    def link(self, format, binary, uniforms):
+        if self._failing == "link":
+            raise TypeError("uniforms")
+        return super().link(format, binary, uniforms)
+
+class _StaleBackend(programs.NullBackend):
+    def binary(self, program):
+        format, binary = super().binary(program)
+        return format, b"stale" + binary[len(self.driver()):]
+
+
+@pytest.fixture
+def sources(tmp_path):
+    paths = []
+    for name in ("quad.vs", "quad.fs"):
+        path = tmp_path / name
+        path.write_text("void main() {{}} // {}\n".format(name))
+        paths.append(str(path))
+    return paths
+
+
+def test_binaries_are_stored_and_linked(tmp_path, sources):
+    first = programs.ProgramCache(str(tmp_path / "cache"), programs.NullBackend(), binaries=True)
+    assert first.load(sources)[0] == "compiled"
+    assert first.stats()["misses"] == 1
+    
+    second = programs.ProgramCache(str(tmp_path / "cache"), programs.NullBackend(), binaries=True)
+    assert second.load(sources)[0] == "linked"
+    assert second.stats()["hits"] == 1
+
+def test_rejected_binaries_are_replaced(tmp_path, sources):
+    # Stored by a driver reporting the same strings but producing binaries the next run refuses.
+    programs.ProgramCache(str(tmp_path / "cache"), _StaleBackend(), binaries=True).load(sources)
+    cache = programs.ProgramCache(str(tmp_path / "cache"), programs.NullBackend(), binaries=True)
+    assert cache.load(sources)[0] == "compiled"
+    assert cache.stats()["rejected"] == 1
+    assert cache.enabled
+    assert programs.ProgramCache(str(tmp_path / "cache"), programs.NullBackend(), binaries=True).load(sources)[0] == "linked"
+
+def test_failing_binary_retrieval_falls_back_to_source(tmp_path, sources):
+    backend = _FailingBackend("binary")
+    cache = programs.ProgramCache(str(tmp_path / "cache"), backend, binaries=True)
+    assert cache.load(sources)[0] == "compiled"
+    assert not cache.enabled
+    # Later loads no longer touch the binary path at all.
+    assert cache.load(sources)[0] == "compiled"
+    assert len(backend.compiled) == 2
+    assert not (tmp_path / "cache").exists()
+
+def test_failing_link_falls_back_to_source(tmp_path, sources):
+    programs.ProgramCache(str(tmp_path / "cache"), programs.NullBackend(), binaries=True).load(sources)
+    backend = _FailingBackend("link")
+    cache = programs.ProgramCache(str(tmp_path / "cache"), backend, binaries=True)
+    assert cache.load(sources)[0] == "compiled"
+    assert not cache.enabled
+    assert backend.linked == []
+
+def test_binaries_are_off_by_default(tmp_path, sources):
+    backend = programs.NullBackend()
+    cache = programs.ProgramCache(str(tmp_path / "cache"), backend)
+    assert not cache.enabled
+    assert cache.warm() is None
+    assert cache.load(sources)[0] == "compiled"
+    assert cache.load(sources)[0] == "compiled"
+    assert len(backend.compiled) == 2
+    assert not (tmp_path / "cache").exists()
+    
+    cache.enabled = True
+    assert cache.load(sources)[0] == "compiled"
+    assert programs.ProgramCache(str(tmp_path / "cache"), programs.NullBackend(), binaries=True).load(sources)[0] == "linked"
+
+def test_key_depends_on_sources_and_driver():
+    assert programs.key([b"a", b"b"], "x") == programs.key(["a", "b"], "x")
+    assert programs.key([b"a", b"b"], "x") != programs.key([b"ab"], "x")
+    assert programs.key([b"a"], "x") != programs.key([b"a"], "y")
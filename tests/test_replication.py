@@ -0,0 +1,153 @@
+import socket
+import time
+
+import numpy as np
+import pytest
+
+from ensemble import replication
+
+
+def _frames(encoder, count, rng):
+    packets = []
+    for _ in range(count):
+        encoder.state[rng.integers(len(encoder.state), size=8)] = rng.normal(size=8)
+        packets.append(encoder.encode())
+    return packets
+
+
+def test_deltas_apply_in_order_and_wait_for_a_keyframe_after_a_loss():
+    rng = np.random.default_rng(0)
+    source = np.zeros(1000, dtype=np.float32)
+    encoder = replication.Encoder(source, keyframe_interval=10)
+    decoder = replication.Decoder(np.zeros_like(source))
+    
+    packets = _frames(encoder, 25, rng)
+    for packet in packets[:5]:
+        assert decoder.decode(packet)
+    # Frame 6 is lost: deltas are refused until the keyframe at frame 10.
+    for packet in packets[6:9]:
+        assert not decoder.decode(packet)
+    assert decoder.missed == 3
+    for packet in packets[9:]:
+        assert decoder.decode(packet)
+    np.testing.assert_array_equal(decoder.state, source)
+
+def test_restarted_publisher_is_followed_from_its_first_keyframe():
+    rng = np.random.default_rng(0)
+    state = np.zeros(1000, dtype=np.float32)
+    decoder = replication.Decoder(np.zeros_like(state))
+    
+    old = replication.Encoder(state.copy())
+    for packet in _frames(old, 100, rng):
+        assert decoder.decode(packet)
+    
+    # The restarted publisher counts from frame 1 again; its keyframe and deltas are taken.
+    new = replication.Encoder(state.copy())
+    assert new.session != old.session
+    packets = _frames(new, 5, rng)
+    for packet in packets:
+        assert decoder.decode(packet)
+    assert decoder.frame == 5
+    np.testing.assert_array_equal(decoder.state, new.state)
+    
+    # Late packets of the old session no longer apply.
+    assert not decoder.decode(_frames(old, 1, rng)[0])
+    
+    # Joining a session mid-stream still waits for its keyframe.
+    late = replication.Decoder(np.zeros_like(state))
+    assert not late.decode(packets[-1])
+
+def test_subscriber_follows_a_restarted_publisher():
+    port = _port()
+    try:
+        subscriber = replication.Subscriber(np.zeros(100000, dtype=np.float32), port)
+    except OSError as e:
+        pytest.skip("multicast is unavailable: {}".format(e))
+    
+    rng = np.random.default_rng(0)
+    for _ in range(2):
+        state = rng.normal(size=100000).astype(np.float32)
+        publisher = replication.Publisher(state, port)
+        for _ in range(3):
+            state[rng.integers(len(state), size=64)] = rng.normal(size=64)
+            frame = publisher.publish()
+            deadline = time.perf_counter() + 2.0
+            while subscriber.frame != frame and time.perf_counter() < deadline:
+                subscriber.receive()
+                time.sleep(0.001)
+        publisher.close()
+        assert subscriber.frame == frame == 3
+        np.testing.assert_array_equal(subscriber.state, state)
+    subscriber.close()
+
+
+class _Socket(object):
+    # Datagrams sent through it, received back in whatever order the test hands them over.
+    def __init__(self):
+        super().__init__()
+        
+        self.sent = []
+        self.incoming = []
+    
+    def setsockopt(self, *args):
+        pass
+    
+    def sendto(self, data, address):
+        self.sent.append(bytes(data))
+        return len(data)
+    
+    def recvfrom(self, size):
+        if not self.incoming:
+            raise BlockingIOError()
+        return self.incoming.pop(0), ("127.0.0.1", 0)
+    
+    def close(self):
+        pass
+
+def _published(publisher, **kwargs):
+    sock = publisher._socket
+    del sock.sent[:]
+    publisher.publish(**kwargs)
+    return list(sock.sent)
+
+def test_late_fragments_of_the_previous_session_are_ignored():
+    rng = np.random.default_rng(0)
+    sock = _Socket()
+    subscriber = replication.Subscriber(np.zeros(10000, dtype=np.float32), 0, sock=sock)
+    old = replication.Publisher(rng.normal(size=10000).astype(np.float32), 0, sock=_Socket())
+    new = replication.Publisher(rng.normal(size=10000).astype(np.float32), 0, sock=_Socket())
+    
+    for _ in range(3):
+        sock.incoming.extend(_published(old))
+    subscriber.receive()
+    assert subscriber.frame == 3
+    
+    # The restarted publisher's keyframe, with old-session fragments arriving in the middle of it.
+    keyframe = _published(new)
+    assert len(keyframe) > 2
+    old.state[:10] = 1.0
+    late = _published(old, keyframe=True)
+    sock.incoming.extend(keyframe[:2] + late[:1] + keyframe[2:] + late[1:])
+    assert subscriber.receive() == 1
+    assert subscriber.frame == 1
+    np.testing.assert_array_equal(subscriber.state, new.state)
+    
+    # Even a complete frame of the old session no longer switches back.
+    sock.incoming.extend(_published(old, keyframe=True))
+    assert subscriber.receive() == 0
+    np.testing.assert_array_equal(subscriber.state, new.state)
+    
+    new.state[:10] = 2.0
+    sock.incoming.extend(_published(new))
+    assert subscriber.receive() == 1
+    assert subscriber.frame == 2
+    np.testing.assert_array_equal(subscriber.state, new.state)
+    assert subscriber.stats()["pending"] == 0
+
+
+def _port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
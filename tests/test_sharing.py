@@ -0,0 +1,164 @@
+"""Shared memory between the processes of one host: the seqlock, and the leader of a port being lost."""
+
+import multiprocessing
+import os
+import socket
+import time
+
+from multiprocessing import resource_tracker
+
+import numpy as np
+
+from ensemble import sharing, timers
+
+WRITES = 20000
+
+
+def _port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def _timer(start=None):
+    timer = timers.Timer(timers.VirtualClock())
+    timer._clock.time_ns = 5000000000
+    if start is not None:
+        timer.start(start)
+    return timer
+
+def _write(name, shape, writes):
+    lock = sharing.attach(name, np.int64, shape)
+    values = np.empty(shape, dtype=np.int64)
+    for i in range(1, writes + 1):
+        values.fill(i)
+        lock.write(values)
+    lock.close()
+
+def _lead(port, ready, publish, converged):
+    host = sharing.Host(port)
+    host.publish(timers.VirtualClock(), _timer(2.0), converged)
+    ready.set()
+    publish.wait(5.0)
+    host.publish(timers.VirtualClock(), _timer(3.0), True)
+    # Dies without closing, and without its resource tracker removing the block, as on a hard crash.
+    resource_tracker.unregister(host._lock._memory._name, "shared_memory")
+    os._exit(0)
+
+
+def test_reads_in_another_process_are_never_torn():
+    context = multiprocessing.get_context("fork")
+    name = sharing.name(_port(), "test")
+    shape = (256,)
+    lock = sharing.create(name, np.int64, shape)
+    out = np.empty(shape, dtype=np.int64)
+    writer = context.Process(target=_write, args=(name, shape, WRITES))
+    try:
+        writer.start()
+        reads = []
+        while writer.is_alive() or not reads:
+            sequence = lock.read(out)
+            if sequence is not None:
+                assert (out == out[0]).all()
+                reads.append((sequence, int(out[0])))
+        writer.join(10.0)
+        assert writer.exitcode == 0
+        
+        assert lock.read(out) == 2 * WRITES
+        assert (out == WRITES).all()
+        # Every consistent copy is of the write its (even) sequence ended, and both only ever grow.
+        assert all(sequence == 2 * value for sequence, value in reads)
+        assert reads == sorted(reads)
+    finally:
+        lock.close()
+
+def test_a_half_written_block_is_not_read():
+    name = sharing.name(_port(), "test")
+    lock = sharing.create(name, np.int64, (4,))
+    try:
+        lock.write(np.arange(4))
+        lock.begin()
+        assert lock.read(np.empty(4, dtype=np.int64), retries=10) is None
+        lock.end()
+        assert lock.read(np.empty(4, dtype=np.int64)) == 4
+    finally:
+        lock.close()
+
+def test_followers_take_over_from_a_leader_that_exited():
+    context = multiprocessing.get_context("fork")
+    port = _port()
+    ready = context.Event()
+    publish = context.Event()
+    leader = context.Process(target=_lead, args=(port, ready, publish, False))
+    leader.start()
+    assert ready.wait(10.0)
+    
+    first = sharing.Host(port)
+    second = sharing.Host(port)
+    hosts = [first, second]
+    try:
+        assert not first.leader and not second.leader
+        # Followers report their clock only once the leader's has converged.
+        assert not first.converged
+        publish.set()
+        leader.join(10.0)
+        assert first.converged
+        
+        timer = _timer()
+        assert first.apply(timer)
+        assert timer.state == (3000000000, None, 0)
+        offset = first.offset_ns
+        generation = first.generation
+        
+        assert first.lost and second.lost
+        assert first.takeover()
+        assert first.leader
+        assert first.generation == generation + 1
+        assert first.offset_ns == offset
+        
+        # The other follower lost the claim, and moves to the new leader's block.
+        assert not second.takeover()
+        assert not second.lost
+        assert second.generation == generation + 1
+        first.publish(timers.VirtualClock(), _timer(4.0))
+        assert second.apply(timer)
+        assert timer.state == (4000000000, None, 0)
+        
+        # A process starting now follows the new leader too.
+        hosts.append(sharing.Host(port))
+        assert not hosts[-1].leader and not hosts[-1].lost
+    finally:
+        for host in reversed(hosts):
+            host.close()
+
+def test_a_stalled_leader_is_taken_over_and_steps_down():
+    port = _port()
+    leader = sharing.Host(port, timeout=0.05)
+    follower = sharing.Host(port, timeout=0.05)
+    hosts = [follower, leader]
+    try:
+        assert leader.publish(timers.VirtualClock(), _timer(1.0))
+        assert not follower.lost
+        time.sleep(0.1)
+        assert follower.lost
+        assert follower.takeover()
+        
+        # Back from its stall, the old leader finds it was replaced and follows instead.
+        assert not leader.publish(timers.VirtualClock(), _timer(2.0))
+        assert not leader.leader
+        # Stepping down dropped the name from the resource tracker, which in separate processes would
+        # be the old leader's own; here both share one, so the new leader's record is restored.
+        resource_tracker.register(follower._lock._memory._name, "shared_memory")
+        assert follower.publish(timers.VirtualClock(), _timer(3.0))
+        timer = _timer()
+        assert leader.apply(timer)
+        assert timer.state == (3000000000, None, 0)
+        assert not leader.lost
+    finally:
+        for host in hosts:
+            host.close()
+    # The new leader removed its block; the old one left it alone rather than unlinking it twice.
+    host = sharing.Host(port)
+    assert host.leader
+    host.close()
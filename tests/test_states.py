@@ -0,0 +1,78 @@
+"""The tracker's counts against what a recording backend actually received."""
+
+from ensemble import states, uniforms
+
+BLEND = 0x0BE2
+POINTS = 0
+
+PROGRAM = object()
+
+
+class _Uniforms(dict):
+    # A program's uniforms, counting the values that would be uploaded.
+    def __init__(self):
+        super().__init__()
+        
+        self.uploads = 0
+    
+    def __setitem__(self, name, value):
+        self.uploads += 1
+        super().__setitem__(name, value)
+
+
+def _frame(state, cache, t):
+    state.use_program(PROGRAM)
+    state.enable(BLEND)
+    state.clear_color((0.0, 0.0, 0.0, 1.0))
+    state.clear()
+    state.set_uniform(cache, "iResolution", (1920.0, 1080.0, 1.0))
+    state.set_uniform(cache, "iTime", t)
+    state.draw_arrays(POINTS, 0, 1)
+    return 7
+
+
+def _reached(backend, uploaded):
+    # Everything but set_uniform reaches GL as recorded; uniforms reach it only as uploads.
+    return sum(call[0] != "set_uniform" for call in backend.calls) + uploaded.uploads
+
+
+def test_counts_match_what_reached_the_backend():
+    backend = states.NullBackend()
+    state = states.StateTracker(backend)
+    uploaded = _Uniforms()
+    cache = uniforms.UniformCache(uploaded)
+    
+    for t in (0.0, 0.0, 1 / 60, 2 / 60):
+        del backend.calls[:]
+        uploaded.uploads = 0
+        issued = _frame(state, cache, t)
+        calls, skipped = state.reset()
+        assert calls == _reached(backend, uploaded)
+        assert calls + skipped == issued
+        assert state.last == (calls, skipped)
+    
+    # A frame repeating the previous one exactly: only the clear and the draw get through.
+    state.reset()
+    del backend.calls[:]
+    uploaded.uploads = 0
+    _frame(state, cache, 2 / 60)
+    assert state.reset() == (2, 5)
+    assert _reached(backend, uploaded) == 2
+
+def test_uniforms_without_a_cache_always_count():
+    backend = states.NullBackend()
+    state = states.StateTracker(backend)
+    values = _Uniforms()
+    for _ in range(3):
+        state.set_uniform(values, "iTime", 1.0)
+    assert (state.calls, state.skipped) == (3, 0)
+    assert values.uploads == 3
+
+def test_last_frame_counts_survive_the_reset():
+    state = states.StateTracker(states.NullBackend())
+    assert state.last == (0, 0)
+    state.clear()
+    state.clear()
+    state.reset()
+    assert state.last == (2, 0)
+    assert (state.calls, state.skipped) == (0, 0)
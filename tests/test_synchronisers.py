@@ -0,0 +1,218 @@
+"""Clock synchronisation: a simulated exchange, and a loopback harness with one process per node.
+
+The harness can also be run on its own for a longer report of sync error percentiles:
+    
+    PYTHONPATH=. python tests/test_synchronisers.py [--nodes 4] [--duration 30]
+"""
+
+import argparse
+import multiprocessing
+import socket
+import time
+
+import numpy as np
+
+from ensemble import osc, synchronisers, timers
+
+MILLISECOND = 1000000
+
+
+class SkewedClock(object):
+    def __init__(self, offset, drift):
+        super().__init__()
+        
+        # perf_counter_ns is shared by every process on the host, so it serves as the true time.
+        self._offset = offset
+        self._drift = drift
+        self._origin = time.perf_counter_ns()
+    
+    @property
+    def time_ns(self):
+        now = time.perf_counter_ns()
+        return now + self._offset + int((now - self._origin) * self._drift)
+    
+    def tick(self):
+        pass
+
+
+def _simulate(offset, drift, interval, duration, delay=50000):
+    # Server time is the true time; the node's clock runs offset and drift away from it.
+    clock = timers.VirtualClock()
+    synchronised = timers.SynchronisedClock(clock)
+    synchroniser = synchronisers.ClockSynchroniser(synchronised)
+    
+    def local(t):
+        return t + offset + int(t * drift)
+    
+    errors = []
+    for t in range(0, duration, interval):
+        t0 = local(t)
+        t1 = t2 = t + delay
+        t3 = local(t + 2*delay)
+        clock.time_ns = t3
+        synchroniser.add(t0, t1, t2, t3)
+        clock.time_ns = local(t + interval // 2)
+        errors.append(synchronised.time_ns - (t + interval // 2))
+    return errors
+
+def test_first_estimate_is_stepped():
+    errors = _simulate(80 * MILLISECOND, 0.0, 250 * MILLISECOND, 60000 * MILLISECOND)
+    assert abs(errors[0]) < MILLISECOND // 10
+    assert max(abs(e) for e in errors) < MILLISECOND // 10
+
+def test_drift_is_tracked():
+    errors = _simulate(-30 * MILLISECOND, 5e-5, 250 * MILLISECOND, 60000 * MILLISECOND)
+    assert max(abs(e) for e in errors[8:]) < MILLISECOND // 10
+
+def test_later_corrections_are_slewed():
+    clock = timers.VirtualClock()
+    synchronised = timers.SynchronisedClock(clock)
+    synchronised.adjust(10 * MILLISECOND, step=True)
+    synchronised.adjust(11 * MILLISECOND)
+    assert synchronised.delta_ns == 10 * MILLISECOND
+    assert synchronised.residual_ns == MILLISECOND
+    clock.time_ns += 1000 * MILLISECOND
+    assert synchronised.delta_ns == 10 * MILLISECOND + MILLISECOND // 2
+    clock.time_ns += 1000 * MILLISECOND
+    assert synchronised.delta_ns == 11 * MILLISECOND
+    assert synchronised.residual_ns == 0
+
+def test_converged_once_the_window_has_filled_and_settled():
+    clock = timers.VirtualClock()
+    synchronised = timers.SynchronisedClock(clock)
+    synchroniser = synchronisers.ClockSynchroniser(synchronised)
+    delay = 50000
+    
+    def exchange(t, offset, delay=delay):
+        clock.time_ns = t + 2*delay
+        synchroniser.add(t, t + delay + offset, t + delay + offset, t + 2*delay)
+    
+    for k in range(16):
+        assert synchroniser.converged == (k > synchronisers.DEFAULT_WINDOW - 1)
+        exchange(k * 250 * MILLISECOND, -80 * MILLISECOND)
+    assert synchroniser.converged
+    
+    # A correction beyond the threshold (from a sample with a shorter round trip, so it is taken)
+    # is not converged until it has been slewed in.
+    exchange(16 * 250 * MILLISECOND, -82 * MILLISECOND, delay // 2)
+    assert not synchroniser.converged
+    clock.time_ns += 4000 * MILLISECOND
+    assert abs(synchronised.residual_ns) < synchronisers.DEFAULT_CONVERGENCE
+    exchange(clock.time_ns, -82 * MILLISECOND, delay // 2)
+    assert synchroniser.converged
+
+
+def _server(address, ready, duration):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(address)
+    sock.settimeout(0.1)
+    ready.set()
+    deadline = time.perf_counter() + duration + 1.0
+    while time.perf_counter() < deadline:
+        try:
+            data, src = sock.recvfrom(1024)
+        except socket.timeout:
+            continue
+        t1 = time.perf_counter_ns()
+        path, types, args = osc.decode_message(data)
+        if path == "/sync/request":
+            sock.sendto(osc.encode_message("/sync/reply", ('h', args[0]), ('h', t1), ('h', time.perf_counter_ns())), src)
+    sock.close()
+
+def _node(address, offset, drift, interval, duration, results):
+    # The request/reply exchange of SceneWindow, over plain loopback UDP; errors are sampled
+    # against the true time between exchanges.
+    clock = SkewedClock(offset, drift)
+    synchronised = timers.SynchronisedClock(clock)
+    synchroniser = synchronisers.ClockSynchroniser(synchronised)
+    
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    
+    start = time.perf_counter_ns()
+    deadline = start + int(duration * 1e9)
+    request = start
+    errors = []
+    while time.perf_counter_ns() < deadline:
+        now = time.perf_counter_ns()
+        if now >= request:
+            sock.sendto(osc.encode_message("/sync/request", ('h', clock.time_ns)), address)
+            request += int(interval * 1e9)
+        sock.settimeout(0.01)
+        try:
+            data, _ = sock.recvfrom(1024)
+            t3 = clock.time_ns
+            path, types, args = osc.decode_message(data)
+            synchroniser.add(args[0], args[1], args[2], t3)
+        except socket.timeout:
+            pass
+        if synchroniser.offset is not None:
+            # Bracketed by two reads of the true time; samples where the process was preempted
+            # in between would measure the scheduler rather than the clock.
+            before = time.perf_counter_ns()
+            value = synchronised.time_ns
+            after = time.perf_counter_ns()
+            if after - before < 20000:
+                errors.append((before - start, value - (before + after) // 2))
+    sock.close()
+    results.put((offset, drift, errors))
+
+def run(nodes=3, duration=4.0, interval=0.25, seed=0):
+    # Returns, per node, its offset, drift and (time since start, sync error) samples, in nanoseconds.
+    rng = np.random.default_rng(seed)
+    context = multiprocessing.get_context("fork")
+    ready = context.Event()
+    results = context.Queue()
+    
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    address = sock.getsockname()
+    sock.close()
+    
+    server = context.Process(target=_server, args=(address, ready, duration))
+    server.start()
+    ready.wait(5.0)
+    
+    processes = []
+    for _ in range(nodes):
+        offset = int(rng.uniform(-300, 300) * MILLISECOND)
+        drift = float(rng.uniform(-5e-5, 5e-5))
+        process = context.Process(target=_node, args=(address, offset, drift, interval, duration, results))
+        process.start()
+        processes.append(process)
+    
+    collected = [results.get(timeout=duration + 10.0) for _ in processes]
+    for process in processes + [server]:
+        process.join(5.0)
+    return collected
+
+def percentiles(errors, settle=1.0):
+    values = np.abs([error for elapsed, error in errors if elapsed >= settle * 1e9])
+    return {p: float(np.percentile(values, p)) for p in (50, 90, 99, 100)}
+
+def test_loopback_nodes_converge():
+    for offset, drift, errors in run(nodes=3, duration=3.0):
+        assert errors
+        assert percentiles(errors)[99] < MILLISECOND
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Loopback clock synchronisation harness.")
+    parser.add_argument("-n", "--nodes", type=int, default=4, help="synchronising processes")
+    parser.add_argument("-d", "--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("-i", "--interval", type=float, default=0.25, help="seconds between requests")
+    parser.add_argument("-s", "--settle", type=float, default=1.0, help="seconds excluded from the percentiles")
+    options = parser.parse_args(argv)
+    
+    print("{:>4} {:>12} {:>10} {:>10} {:>10} {:>10} {:>10}".format("node", "offset ms", "drift ppm", "p50 us", "p90 us", "p99 us", "max us"))
+    everything = []
+    for node, (offset, drift, errors) in enumerate(run(options.nodes, options.duration, options.interval)):
+        everything.extend(errors)
+        values = percentiles(errors, options.settle)
+        print("{:>4} {:>12.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}".format(node, offset / 1e6, drift * 1e6, *(values[p] / 1e3 for p in (50, 90, 99, 100))))
+    values = percentiles(everything, options.settle)
+    print("{:>4} {:>12} {:>10} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}".format("all", "", "", *(values[p] / 1e3 for p in (50, 90, 99, 100))))
+
+
+if __name__ == "__main__":
+    main()
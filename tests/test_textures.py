@@ -0,0 +1,157 @@
+import time
+
+import numpy as np
+import pytest
+
+from ensemble import textures
+
+
+def _decode(path):
+    # Images stored as arrays, so the tests need no image library.
+    return np.load(path)
+
+def _image(tmp_path, name, width, height=1):
+    path = str(tmp_path / "{}.npy".format(name))
+    np.save(path, np.zeros((height, width, 4), dtype=np.uint8))
+    return path
+
+def _cache(**kwargs):
+    return textures.TextureCache(backend=textures.NullBackend(), decoder=_decode, workers=2, **kwargs)
+
+def _decoded(cache, timeout=5.0):
+    # Waits until every requested image has been decoded (or failed to), without uploading any.
+    deadline = time.monotonic() + timeout
+    while len(cache._decoded) < cache.pending:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_uploads_stop_at_the_frame_budget(tmp_path):
+    # 1 kB per image, 2.5 kB per frame: three uploads cross the budget, the next image waits.
+    cache = _cache(budget=2500)
+    entries = [cache.acquire(_image(tmp_path, i, 256)) for i in range(5)]
+    assert not any(entry.ready for entry in entries)
+    assert entries[0].texture is cache.placeholder
+    _decoded(cache)
+    assert cache.update() == 3
+    assert cache.pending == 2
+    assert cache.update() == 2
+    assert all(entry.ready for entry in entries)
+    assert cache.size == 5 * 1024
+    cache.close()
+
+def test_one_image_larger_than_the_budget_still_uploads(tmp_path):
+    cache = _cache(budget=100)
+    entries = [cache.acquire(_image(tmp_path, i, 256)) for i in range(2)]
+    _decoded(cache)
+    assert cache.update() == 1
+    assert cache.update() == 1
+    assert all(entry.ready for entry in entries)
+    cache.close()
+
+def test_unused_textures_are_evicted_least_recently_used_first(tmp_path):
+    # Room for three 1 kB images.
+    cache = _cache(capacity=3 * 1024)
+    paths = [_image(tmp_path, i, 256) for i in range(4)]
+    entries = [cache.acquire(path) for path in paths[:3]]
+    _decoded(cache)
+    cache.update()
+    
+    # Released in the order 1, 0, 2, so 1 is the least recently used.
+    evicted = entries[1].texture
+    for index in (1, 0, 2):
+        entries[index].release()
+    assert cache.stats()["evictions"] == 0
+    # Acquiring 2 again takes it off the unused list.
+    assert cache.acquire(paths[2]) is entries[2]
+    
+    fourth = cache.acquire(paths[3])
+    _decoded(cache)
+    cache.update()
+    assert fourth.ready
+    assert cache.stats()["evictions"] == 1
+    assert not entries[1].ready
+    assert entries[0].ready and entries[2].ready
+    assert cache.backend.deleted == [evicted]
+    assert cache.size == 3 * 1024
+    
+    # Textures in use are never evicted, even over capacity.
+    entries = [cache.acquire(_image(tmp_path, 10 + i, 256)) for i in range(2)]
+    _decoded(cache)
+    cache.update()
+    assert cache.stats()["evictions"] == 2
+    assert cache.size == 4 * 1024
+    assert all(entry.ready for entry in entries)
+    cache.close()
+
+def test_release_more_than_acquired_is_an_error(tmp_path):
+    cache = _cache()
+    entry = cache.acquire(_image(tmp_path, 0, 1))
+    entry.release()
+    with pytest.raises(ValueError):
+        entry.release()
+    cache.close()
+
+def test_failed_decodes_are_retried_with_backoff(tmp_path):
+    path = str(tmp_path / "late.npy")
+    cache = _cache(retry=0.05, max_retry=0.1)
+    entry = cache.acquire(path)
+    _decoded(cache)
+    assert cache.update() == 0
+    assert entry.failed and not entry.ready
+    assert entry.texture is cache.placeholder
+    assert cache.stats()["failed"] == 1
+    assert cache.pending == 0
+    
+    # Not retried before the delay has passed...
+    cache.update()
+    assert cache.pending == 0
+    # ...then retried, failing again and backing off further.
+    time.sleep(0.06)
+    cache.update()
+    assert cache.pending == 1
+    _decoded(cache)
+    cache.update()
+    assert entry.failed
+    assert entry._retry - time.monotonic() > 0.06
+    
+    # The file turns up, and the next retry loads it.
+    np.save(path, np.zeros((2, 2, 4), dtype=np.uint8))
+    time.sleep(0.11)
+    cache.update()
+    _decoded(cache)
+    assert cache.update() == 1
+    assert entry.ready and not entry.failed
+    assert cache.stats()["failed"] == 0
+    cache.close()
+
+def test_unused_failed_images_are_not_retried(tmp_path):
+    cache = _cache(retry=0.0)
+    entry = cache.acquire(str(tmp_path / "missing.npy"))
+    _decoded(cache)
+    cache.update()
+    entry.release()
+    cache.update()
+    assert cache.pending == 0
+    # Acquired again, it is retried on the next frame.
+    cache.acquire(entry.path)
+    cache.update()
+    assert cache.pending == 1
+    cache.close()
+
+def test_clear_deletes_every_texture(tmp_path):
+    cache = _cache()
+    entries = [cache.acquire(_image(tmp_path, i, 4)) for i in range(3)]
+    placeholder = cache.placeholder
+    _decoded(cache)
+    cache.update()
+    cache.clear()
+    assert cache.size == 0
+    assert sorted(texture.handle for texture in cache.backend.deleted) == sorted([placeholder.handle] + [texture.handle for texture in cache.backend.created if texture is not placeholder])
+    assert not any(entry.ready for entry in entries)
+    # Acquiring again loads the image anew.
+    entry = cache.acquire(entries[0].path)
+    assert entry is not entries[0]
+    _decoded(cache)
+    assert cache.update() == 1
+    cache.close()